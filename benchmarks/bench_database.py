@@ -0,0 +1,142 @@
+"""
+Mede o custo das consultas quentes da tabela de boletos antes e depois das migrações
+de índice/WAL, numa base sintética com dezenas de milhares de linhas:
+
+- duplicidade: a consulta de duplicatas (pix OU linha OU origem+mês)
+- id por pix: a busca do id para o botão de callback
+- pendentes: a listagem "🧾 Boletos Pendentes" (pago = 0)
+- inserção: gravação de boletos um a um com commit (DELETE/FULL x WAL/NORMAL)
+- lote: um ciclo de boletos salvo com SELECT + INSERT + commit por boleto x
+  INSERT ... ON CONFLICT DO NOTHING numa única transação
+
+Uso: python -m benchmarks.bench_database [--linhas 50000] [--consultas 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.corpus import gerar_linha_bancaria, gerar_pix
+from core.database import aplicar_migracoes, configurar_conexao
+
+ORIGENS = ["Finances/CPFL", "Finances/Claro", "Finances/Comgás", "Finances/SEMAE", "Finances/Condomínio (LLZ)"]
+
+
+def _popular(conn, linhas, rng):
+    registros = []
+    for i in range(linhas):
+        valor = rng.randint(3000, 90000)
+        # Origem + mês únicos por linha (como na base real): i determina o par sem colisões
+        origem = f"{ORIGENS[(i // 300) % len(ORIGENS)]} #{i // 1500}"
+        mes = f"{i % 12 + 1:02d}/{2000 + (i // 12) % 25}"
+        registros.append((
+            origem, f"Fatura {i}", gerar_linha_bancaria(rng, valor),
+            gerar_pix(rng, valor) if rng.random() < 0.5 else None, f"{valor // 100},{valor % 100:02d}",
+            1 if rng.random() < 0.97 else 0, mes,
+        ))
+    conn.executemany(
+        "INSERT INTO boletos (origem, titulo, linha_digitavel, pix, valor, pago, mes_referencia) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", registros)
+    conn.commit()
+    return registros
+
+
+def _medir(rotulo, consultas, executar):
+    inicio = time.perf_counter()
+    for argumentos in consultas:
+        executar(*argumentos)
+    decorrido = time.perf_counter() - inicio
+    print(f"  {rotulo:<14} {decorrido / len(consultas) * 1e6:>10.1f} µs/op")
+
+
+def _consultas(conn, registros, quantidade, rng):
+    amostra = [rng.choice(registros) for _ in range(quantidade)]
+    _medir("duplicidade", [(r[3], r[2], r[0], r[6]) for r in amostra], lambda pix, linha, origem, mes: conn.execute(
+        "SELECT id FROM boletos WHERE (pix IS NOT NULL AND pix = ?) OR "
+        "(linha_digitavel IS NOT NULL AND linha_digitavel = ?) OR (origem = ? AND mes_referencia = ?)",
+        (pix, linha, origem, mes)).fetchone())
+    _medir("id por pix", [(r[3], r[2]) for r in amostra], lambda pix, linha: conn.execute(
+        "SELECT id FROM boletos WHERE (pix = ?) OR (linha_digitavel = ?)", (pix, linha)).fetchone())
+    _medir("pendentes", [()] * max(1, quantidade // 20), lambda: conn.execute(
+        "SELECT * FROM boletos WHERE pago = 0").fetchall())
+
+
+def _insercoes(caminho, journal, synchronous, quantidade, rng):
+    conn = sqlite3.connect(caminho)
+    conn.execute(f"PRAGMA journal_mode = {journal}")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        conn.execute("INSERT INTO boletos (origem, titulo, linha_digitavel) VALUES (?, ?, ?)",
+                     (rng.choice(ORIGENS), f"Nova {i}", gerar_linha_bancaria(rng, 1000)))
+        conn.commit()
+    decorrido = time.perf_counter() - inicio
+    conn.close()
+    print(f"  {journal + '/' + synchronous:<14} {decorrido / quantidade * 1e6:>10.1f} µs/op")
+
+
+def _lote(caminho, tamanho_lote, lotes, rng):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    ciclos = [[(rng.choice(ORIGENS), f"Ciclo {c}", gerar_linha_bancaria(rng, 1000), f"{c:02d}/{i}")
+               for i in range(tamanho_lote)] for c in range(lotes)]
+
+    inicio = time.perf_counter()
+    for ciclo in ciclos[:lotes // 2]:
+        for origem, titulo, linha, mes in ciclo:
+            existe = conn.execute(
+                "SELECT id FROM boletos WHERE (linha_digitavel IS NOT NULL AND linha_digitavel = ?) OR "
+                "(origem = ? AND mes_referencia = ?)", (linha, origem, mes)).fetchone()
+            if not existe:
+                conn.execute("INSERT INTO boletos (origem, titulo, linha_digitavel, mes_referencia) "
+                             "VALUES (?, ?, ?, ?)", (origem, titulo, linha, mes))
+                conn.commit()
+    por_boleto = (time.perf_counter() - inicio) / (lotes // 2)
+
+    inicio = time.perf_counter()
+    for ciclo in ciclos[lotes // 2:]:
+        with conn:
+            for origem, titulo, linha, mes in ciclo:
+                conn.execute("INSERT INTO boletos (origem, titulo, linha_digitavel, mes_referencia) "
+                             "VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING", (origem, titulo, linha, mes))
+    em_lote = (time.perf_counter() - inicio) / (lotes - lotes // 2)
+    conn.close()
+    print(f"  {'um a um':<14} {por_boleto * 1000:>10.2f} ms/ciclo de {tamanho_lote}")
+    print(f"  {'em lote':<14} {em_lote * 1000:>10.2f} ms/ciclo de {tamanho_lote}")
+
+
+def executar(linhas=50000, consultas=2000):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        conn = sqlite3.connect(caminho)
+        # Schema original (versão 1): valor em texto e nenhum índice
+        aplicar_migracoes(conn, ate=1)
+        registros = _popular(conn, linhas, rng)
+        print(f"Base sintética: {linhas} boletos, {consultas} consultas por cenário\n")
+
+        print("Schema original (sem índices):")
+        _consultas(conn, registros, consultas, rng)
+
+        versao = aplicar_migracoes(configurar_conexao(conn))
+        restantes = conn.execute("SELECT COUNT(*) FROM boletos").fetchone()[0]
+        print(f"\nSchema atual (versão {versao}, com índices, {restantes} boletos):")
+        _consultas(conn, registros, consultas, rng)
+        conn.close()
+
+        print("\nInserção com commit por boleto:")
+        _insercoes(caminho, "DELETE", "FULL", 300, rng)
+        _insercoes(caminho, "WAL", "NORMAL", 300, rng)
+
+        print("\nCiclo de coleta salvo no banco (WAL):")
+        _lote(caminho, 30, 20, rng)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=50000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    args = parser.parse_args()
+    executar(args.linhas, args.consultas)
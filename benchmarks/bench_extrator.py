@@ -0,0 +1,79 @@
+"""
+Compara o extrator de texto atual com a implementação original em e-mails HTML grandes:
+
+- legado: três regex recompiladas a cada chamada, aceita qualquer sequência de 47/48 dígitos
+- atual: varredura única pré-compilada, com validação dos DVs (FEBRABAN) e do CRC do PIX
+
+Mede acurácia (linha, pix, valor) e vazão em MB/s sobre o mesmo corpus.
+
+Uso: python -m benchmarks.bench_extrator [--emails 200] [--repeticoes 3]
+"""
+import argparse
+import re
+import time
+
+from benchmarks.corpus import gerar_corpus_emails
+from utils.extractor import extrair_dados_de_texto
+
+
+def _valor_da_linha_legado(linha):
+    if not linha or len(linha) < 44:
+        return None
+    valor = int(linha[12:16] if linha.startswith('8') else linha[-10:]) / 100.0
+    return "{:.2f}".format(valor).replace('.', ',') if valor > 0 else None
+
+
+def _legado(texto):
+    """Implementação original de extrair_dados_de_texto, para referência."""
+    regex_ld = r'(\d{5}[\.\s]?\d{5}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d[\.\s]?\d{14})|(\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d)'
+    regex_pix = r'000201[\s\S]*?6304[A-Fa-f0-9]{4}'
+    regex_valor_rs = r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})'
+
+    res = {"linha": None, "pix": None, "valor": None}
+    m_ld = re.search(regex_ld, texto)
+    if m_ld:
+        res["linha"] = re.sub(r'\D', '', m_ld.group(0))
+        res["valor"] = _valor_da_linha_legado(res["linha"])
+    m_pix = re.search(regex_pix, texto)
+    if m_pix:
+        res["pix"] = re.sub(r'\s+', '', m_pix.group(0))
+    if not res["valor"]:
+        valores = re.findall(regex_valor_rs, texto)
+        if valores:
+            res["valor"] = valores[-1].replace('.', '')
+    return res
+
+
+ESTRATEGIAS = {
+    "legado": _legado,
+    "atual": extrair_dados_de_texto,
+}
+
+
+def executar(emails=200, repeticoes=3):
+    corpus = gerar_corpus_emails(emails)
+    megabytes = sum(len(html) for html, _ in corpus) / (1024 * 1024)
+    print(f"Corpus: {len(corpus)} e-mails, {megabytes:.1f} MB, {repeticoes} repetição(ões)\n")
+    print(f"{'estratégia':<10} {'ms/e-mail':>10} {'MB/s':>7} {'linha ok':>9} {'pix ok':>7} {'valor ok':>9}")
+
+    for nome, estrategia in ESTRATEGIAS.items():
+        acertos = {"linha": 0, "pix": 0, "valor": 0}
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for html, esperado in corpus:
+                dados = estrategia(html)
+                for campo in acertos:
+                    acertos[campo] += dados[campo] == esperado[campo]
+        decorrido = time.perf_counter() - inicio
+        total = len(corpus) * repeticoes
+
+        print(f"{nome:<10} {decorrido / total * 1000:>10.2f} {megabytes * repeticoes / decorrido:>7.1f} "
+              f"{acertos['linha'] / total:>9.0%} {acertos['pix'] / total:>7.0%} {acertos['valor'] / total:>9.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+    executar(args.emails, args.repeticoes)
@@ -0,0 +1,71 @@
+"""
+Compara as estratégias de leitura de PDF em contas de consumo de várias páginas:
+
+- legado: pdfplumber, extract_text() duas vezes por página, texto inteiro e só então as regex
+- pdfplumber: leitura página a página com parada antecipada
+- pdfium: leitura página a página com parada antecipada via PDFium
+
+Uso: python -m benchmarks.bench_pdf [--arquivos 20] [--repeticoes 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pdfplumber
+
+from benchmarks.corpus import gerar_corpus_pdfs
+from utils.extractor import extrair_dados_de_texto
+from utils.parser_pdf import _paginas_pdfium, _paginas_pdfplumber, _varrer_paginas
+
+
+def _legado(caminho):
+    """Implementação original de extrair_dados_pdf, para referência."""
+    with pdfplumber.open(caminho) as pdf:
+        texto_completo = "".join([p.extract_text() for p in pdf.pages if p.extract_text()])
+        return extrair_dados_de_texto(texto_completo)
+
+
+ESTRATEGIAS = {
+    "legado": _legado,
+    "pdfplumber": lambda caminho: _varrer_paginas(_paginas_pdfplumber(caminho)),
+    "pdfium": lambda caminho: _varrer_paginas(_paginas_pdfium(caminho)),
+}
+
+
+def executar(arquivos=20, repeticoes=3):
+    corpus = gerar_corpus_pdfs(arquivos)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = []
+        for nome, pdf, esperado in corpus:
+            caminho = os.path.join(pasta, nome)
+            with open(caminho, "wb") as f:
+                f.write(pdf)
+            caminhos.append((caminho, esperado))
+
+        # Nomes no formato <prefixo>_<n>_<páginas>p.pdf (veja gerar_corpus_pdfs)
+        paginas = sum(int(nome.rsplit("_", 1)[1].removesuffix("p.pdf")) for nome, _, _ in corpus)
+        print(f"Corpus: {len(corpus)} PDFs, {paginas} páginas, {repeticoes} repetição(ões)\n")
+        print(f"{'estratégia':<12} {'ms/arquivo':>11} {'arquivos/s':>11} {'linha ok':>9} {'pix ok':>7}")
+
+        for nome, estrategia in ESTRATEGIAS.items():
+            acertos_linha = acertos_pix = 0
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                for caminho, esperado in caminhos:
+                    dados = estrategia(caminho)
+                    acertos_linha += dados["linha"] == esperado["linha"]
+                    acertos_pix += dados["pix"] == esperado["pix"]
+            decorrido = time.perf_counter() - inicio
+            total = len(caminhos) * repeticoes
+
+            print(f"{nome:<12} {decorrido / total * 1000:>11.1f} {total / decorrido:>11.1f} "
+                  f"{acertos_linha / total:>9.0%} {acertos_pix / total:>7.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arquivos", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+    executar(args.arquivos, args.repeticoes)
@@ -0,0 +1,344 @@
+"""
+Gerador de corpus sintético para os benchmarks: linhas digitáveis válidas
+(bancárias e de arrecadação), payloads PIX com CRC e PDFs de várias páginas
+(inclusive protegidos por senha, como os da Comgás).
+Tudo é determinístico a partir da semente para os números serem comparáveis.
+"""
+import hashlib
+import random
+import struct
+import zlib
+
+
+# --- LINHAS DIGITÁVEIS ---
+def _mod10(numero):
+    soma, peso = 0, 2
+    for digito in reversed(numero):
+        produto = int(digito) * peso
+        soma += produto // 10 + produto % 10
+        peso = 1 if peso == 2 else 2
+    return str((10 - soma % 10) % 10)
+
+
+def _mod11_bancario(numero):
+    soma, peso = 0, 2
+    for digito in reversed(numero):
+        soma += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    dv = 11 - soma % 11
+    return "1" if dv in (0, 10, 11) else str(dv)
+
+
+def _mod11_arrecadacao(numero):
+    soma, peso = 0, 2
+    for digito in reversed(numero):
+        soma += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    resto = soma % 11
+    return "0" if resto in (0, 1) else str(11 - resto)
+
+
+def gerar_linha_bancaria(rng, valor_centavos, fator=None):
+    """Linha digitável de 47 dígitos (boleto bancário) com todos os DVs corretos."""
+    banco = rng.choice(["001", "033", "104", "237", "341", "756"])
+    fator = fator if fator is not None else rng.randint(1000, 9999)
+    livre = "".join(rng.choice("0123456789") for _ in range(25))
+    sem_dv = f"{banco}9{fator:04d}{valor_centavos:010d}{livre}"
+    dv_geral = _mod11_bancario(sem_dv)
+    barras = sem_dv[:4] + dv_geral + sem_dv[4:]
+
+    campo1 = barras[0:4] + livre[0:5]
+    campo2 = livre[5:15]
+    campo3 = livre[15:25]
+    return (campo1 + _mod10(campo1) + campo2 + _mod10(campo2) + campo3 + _mod10(campo3)
+            + dv_geral + barras[5:19])
+
+
+def gerar_linha_arrecadacao(rng, valor_centavos, identificador="6"):
+    """Linha digitável de 48 dígitos (concessionária, começa com 8) com DVs corretos."""
+    segmento = rng.choice("12345")
+    resto = "".join(rng.choice("0123456789") for _ in range(29))
+    sem_dv = f"8{segmento}{identificador}{valor_centavos:011d}{resto}"
+    calcular = _mod10 if identificador in "67" else _mod11_arrecadacao
+    barras = sem_dv[:3] + calcular(sem_dv) + sem_dv[3:]
+
+    blocos = [barras[i:i + 11] for i in range(0, 44, 11)]
+    return "".join(b + calcular(b) for b in blocos)
+
+
+def formatar_linha(linha):
+    """Aplica a pontuação usual (5.5 5.6 5.6 1 14 ou 4 blocos de 12) como aparece nos PDFs."""
+    if len(linha) == 47:
+        return (f"{linha[0:5]}.{linha[5:10]} {linha[10:15]}.{linha[15:21]} "
+                f"{linha[21:26]}.{linha[26:32]} {linha[32]} {linha[33:]}")
+    return " ".join(f"{linha[i:i + 11]}-{linha[i + 11]}" for i in range(0, 48, 12))
+
+
+# --- PIX ---
+def _crc16(payload):
+    crc = 0xFFFF
+    for byte in payload.encode("utf-8"):
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return f"{crc:04X}"
+
+
+def _campo(identificador, valor):
+    return f"{identificador}{len(valor):02d}{valor}"
+
+
+def gerar_pix(rng, valor_centavos):
+    """Payload PIX copia-e-cola (BR Code) com CRC16 válido."""
+    chave = f"{rng.randint(10 ** 10, 10 ** 11 - 1)}"
+    conta = _campo("00", "br.gov.bcb.pix") + _campo("01", chave)
+    payload = ("000201" + _campo("26", conta) + "52040000" + "5303986"
+               + _campo("54", f"{valor_centavos / 100:.2f}") + "5802BR"
+               + _campo("59", "CONCESSIONARIA SA") + _campo("60", "PIRACICABA")
+               + _campo("62", _campo("05", "***")) + "6304")
+    return payload + _crc16(payload)
+
+
+# --- PDF ---
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Criptografia padrão do PDF (RC4 128 bits, revisão 3), a mesma das faturas protegidas por CPF
+_PADDING_SENHA = bytes.fromhex("28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A")
+_PERMISSOES = -3904
+
+
+def _rc4(chave, dados):
+    estado = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + estado[i] + chave[i % len(chave)]) % 256
+        estado[i], estado[j] = estado[j], estado[i]
+    saida = bytearray(len(dados))
+    i = j = 0
+    for n, byte in enumerate(dados):
+        i = (i + 1) % 256
+        j = (j + estado[i]) % 256
+        estado[i], estado[j] = estado[j], estado[i]
+        saida[n] = byte ^ estado[(estado[i] + estado[j]) % 256]
+    return bytes(saida)
+
+
+def _rc4_20_voltas(chave, dados):
+    for i in range(20):
+        dados = _rc4(bytes(b ^ i for b in chave), dados)
+    return dados
+
+
+def _md5_50_voltas(dados):
+    resumo = hashlib.md5(dados).digest()
+    for _ in range(50):
+        resumo = hashlib.md5(resumo).digest()
+    return resumo
+
+
+def _chaves_pdf(senha, id_documento):
+    """Retorna (chave do documento, /O, /U) do Standard Security Handler para a senha."""
+    senha_pad = (senha.encode("latin-1") + _PADDING_SENHA)[:32]
+    valor_o = _rc4_20_voltas(_md5_50_voltas(senha_pad), senha_pad)
+    chave = _md5_50_voltas(senha_pad + valor_o + struct.pack("<i", _PERMISSOES) + id_documento)
+    valor_u = _rc4_20_voltas(chave, hashlib.md5(_PADDING_SENHA + id_documento).digest()) + bytes(16)
+    return chave, valor_o, valor_u
+
+
+def _cifrar_objeto(chave, numero, dados):
+    chave_objeto = hashlib.md5(chave + numero.to_bytes(3, "little") + b"\x00\x00").digest()
+    return _rc4(chave_objeto, dados)
+
+
+def gerar_pdf(paginas, senha=None):
+    """
+    Monta um PDF mínimo (Helvetica, WinAnsi) com uma lista de linhas por página.
+    Suficiente para os extratores de texto; não depende de bibliotecas de escrita.
+    Com `senha`, os fluxos são cifrados e a senha passa a ser exigida para abrir o arquivo.
+    """
+    objetos = {}
+    id_documento = hashlib.md5(repr(paginas).encode()).digest()
+    cripto = _chaves_pdf(senha, id_documento) if senha is not None else None
+    n_paginas = len(paginas)
+    ids_paginas = [4 + 2 * i for i in range(n_paginas)]
+
+    objetos[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas)
+    objetos[2] = f"<< /Type /Pages /Kids [{kids}] /Count {n_paginas} >>".encode()
+    objetos[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+
+    for id_pagina, linhas in zip(ids_paginas, paginas):
+        comandos = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for linha in linhas:
+            comandos.append(f"({_escapar(linha)}) Tj T*")
+        comandos.append("ET")
+        fluxo = zlib.compress("\n".join(comandos).encode("latin-1", errors="replace"))
+        if cripto:
+            fluxo = _cifrar_objeto(cripto[0], id_pagina + 1, fluxo)
+        objetos[id_pagina] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                              f"/Resources << /Font << /F1 3 0 R >> >> /Contents {id_pagina + 1} 0 R >>").encode()
+        objetos[id_pagina + 1] = (f"<< /Length {len(fluxo)} /Filter /FlateDecode >>\nstream\n".encode()
+                                  + fluxo + b"\nendstream")
+
+    trailer = f"/Size {max(objetos) + 1} /Root 1 0 R"
+    if cripto:
+        _, valor_o, valor_u = cripto
+        numero_cripto = max(objetos) + 1
+        objetos[numero_cripto] = (f"<< /Filter /Standard /V 2 /R 3 /Length 128 /P {_PERMISSOES} "
+                                  f"/O <{valor_o.hex()}> /U <{valor_u.hex()}> >>").encode()
+        trailer = (f"/Size {numero_cripto + 1} /Root 1 0 R /Encrypt {numero_cripto} 0 R "
+                   f"/ID [<{id_documento.hex()}> <{id_documento.hex()}>]")
+
+    saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posicoes = {}
+    for numero in sorted(objetos):
+        posicoes[numero] = len(saida)
+        saida += f"{numero} 0 obj\n".encode() + objetos[numero] + b"\nendobj\n"
+
+    inicio_xref = len(saida)
+    total = max(objetos) + 1
+    saida += f"xref\n0 {total}\n0000000000 65535 f \n".encode()
+    for numero in range(1, total):
+        saida += f"{posicoes[numero]:010d} 00000 n \n".encode()
+    saida += f"trailer\n<< {trailer} >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+    return bytes(saida)
+
+
+def _linhas_consumo(rng, quantidade):
+    """Texto de enchimento típico de contas de consumo (histórico, tributos, avisos)."""
+    meses = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+    linhas = []
+    for _ in range(quantidade):
+        tipo = rng.random()
+        if tipo < 0.4:
+            linhas.append(f"{rng.choice(meses)}/2025  Consumo {rng.randint(80, 400)} kWh  "
+                          f"Leitura {rng.randint(10000, 99999)}  Dias {rng.randint(28, 33)}")
+        elif tipo < 0.7:
+            linhas.append(f"ICMS {rng.randint(1, 30)},{rng.randint(0, 99):02d}%  PIS {rng.random():.4f}  "
+                          f"COFINS {rng.random():.4f}  Base R$ {rng.randint(10, 900)},{rng.randint(0, 99):02d}")
+        else:
+            linhas.append(f"Protocolo {rng.randint(10 ** 9, 10 ** 10 - 1)} - Instalação {rng.randint(10 ** 6, 10 ** 7)}"
+                          f" - Atendimento 0800 {rng.randint(100, 999)} {rng.randint(1000, 9999)}")
+    return linhas
+
+
+def gerar_conta_consumo(rng, n_paginas=6, com_pix=True, pagina_boleto=0, senha=None):
+    """
+    Conta de consumo de várias páginas (estilo CPFL/Comgás). Retorna (pdf_bytes, esperado),
+    onde esperado é o dicionário {linha, pix, valor} que o extrator deve produzir.
+    `senha` protege o PDF (a Comgás usa o início do CPF do titular).
+    """
+    valor = rng.randint(3000, 90000)
+    linha = gerar_linha_arrecadacao(rng, valor)
+    pix = gerar_pix(rng, valor) if com_pix else None
+    valor_fmt = f"{valor // 100},{valor % 100:02d}"
+
+    paginas = []
+    for i in range(n_paginas):
+        linhas = _linhas_consumo(rng, 60)
+        if i == pagina_boleto:
+            linhas[10:10] = [
+                f"TOTAL A PAGAR R$ {valor_fmt}",
+                f"Vencimento {rng.randint(1, 28):02d}/11/2025",
+                "Linha digitável:",
+                formatar_linha(linha),
+            ]
+            if pix:
+                # PDFs quebram o PIX em várias linhas
+                linhas[20:20] = ["Pague com PIX copia e cola:"] + [pix[j:j + 60] for j in range(0, len(pix), 60)]
+        paginas.append(linhas)
+
+    return gerar_pdf(paginas, senha=senha), {"linha": linha, "pix": pix, "valor": valor_fmt}
+
+
+def gerar_corpus_pdfs(quantidade=20, semente=42, senha=None):
+    """
+    Lista de (nome, pdf_bytes, esperado) com contas de 2 a 12 páginas.
+    Com `senha`, todas saem protegidas (estilo Comgás) e o nome começa com "comgas".
+    """
+    rng = random.Random(semente)
+    prefixo = "comgas" if senha is not None else "conta"
+    corpus = []
+    for i in range(quantidade):
+        n_paginas = rng.randint(2, 12)
+        pdf, esperado = gerar_conta_consumo(rng, n_paginas=n_paginas, com_pix=rng.random() < 0.6,
+                                            pagina_boleto=rng.choice([0, 0, 0, n_paginas - 1]), senha=senha)
+        corpus.append((f"{prefixo}_{i:02d}_{n_paginas}p.pdf", pdf, esperado))
+    return corpus
+
+
+# --- E-MAILS HTML ---
+_CSS = ("<style>body{font-family:Arial,sans-serif;color:#333}.tabela td{padding:4px 8px;"
+        "border-bottom:1px solid #eee}.rodape{font-size:10px;color:#999}</style>")
+
+
+def _linhas_html(rng, quantidade):
+    """Enchimento de e-mails de cobrança: tabelas de histórico, links de rastreio e rodapé legal."""
+    partes = []
+    for _ in range(quantidade):
+        tipo = rng.random()
+        if tipo < 0.5:
+            partes.append(f"<tr class=\"tabela\"><td>{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025</td>"
+                          f"<td>Consumo {rng.randint(5, 60)} m³</td><td>R$ {rng.randint(10, 400)},"
+                          f"{rng.randint(0, 99):02d}</td></tr>")
+        elif tipo < 0.8:
+            rastreio = "".join(rng.choice("0123456789abcdef") for _ in range(40))
+            partes.append(f"<tr><td><a href=\"https://click.exemplo.com.br/t/{rastreio}?u={rng.randint(10 ** 8, 10 ** 9)}\">"
+                          f"Acesse sua conta</a></td></tr>")
+        else:
+            partes.append(f"<tr><td class=\"rodape\">Protocolo {rng.randint(10 ** 11, 10 ** 12 - 1)}. "
+                          f"CNPJ {rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-"
+                          f"{rng.randint(10, 99)}. Não responda este e-mail.</td></tr>")
+    return partes
+
+
+def gerar_linha_invalida(rng, tamanho):
+    """Sequência com cara de linha digitável mas DVs errados (números de contrato, códigos antigos)."""
+    while True:
+        numero = ("8" if tamanho == 48 else "") + "".join(rng.choice("0123456789") for _ in range(tamanho - (tamanho == 48)))
+        if tamanho == 47:
+            # Garante ao menos um DV de campo errado
+            if _mod10(numero[0:9]) != numero[9]:
+                return numero
+        elif _mod10(numero[0:11]) != numero[11] and _mod11_arrecadacao(numero[0:11]) != numero[11]:
+            return numero
+
+
+def gerar_email_html(rng, linhas_enchimento=400, com_pix=True, com_isca=True):
+    """
+    E-mail HTML de cobrança grande (tabelas, CSS, links). Retorna (html, esperado).
+    Com `com_isca`, uma sequência de 47/48 dígitos inválida aparece antes da linha real.
+    """
+    valor = rng.randint(3000, 90000)
+    if rng.random() < 0.5:
+        linha = gerar_linha_bancaria(rng, valor)
+    else:
+        linha = gerar_linha_arrecadacao(rng, valor)
+    pix = gerar_pix(rng, valor) if com_pix else None
+    valor_fmt = f"{valor // 100},{valor % 100:02d}"
+
+    corpo = _linhas_html(rng, linhas_enchimento)
+    meio = len(corpo) // 2
+    bloco = [f"<tr><td><b>Total a pagar: R$ {valor_fmt}</b></td></tr>",
+             f"<tr><td>Linha digitável:<br><span style=\"font-family:monospace\">{formatar_linha(linha)}</span></td></tr>"]
+    if pix:
+        bloco.append(f"<tr><td>PIX copia e cola:<br><code>{pix}</code></td></tr>")
+    corpo[meio:meio] = bloco
+    if com_isca:
+        isca = formatar_linha(gerar_linha_invalida(rng, rng.choice([47, 48])))
+        corpo[meio // 2:meio // 2] = [f"<tr><td class=\"rodape\">Referência do contrato: {isca}</td></tr>"]
+
+    html = (f"<html><head>{_CSS}</head><body><table width=\"600\">" + "".join(corpo)
+            + "</table></body></html>")
+    return html, {"linha": linha, "pix": pix, "valor": valor_fmt}
+
+
+def gerar_corpus_emails(quantidade=200, semente=42):
+    """Lista de (html, esperado); cerca de um terço dos e-mails traz uma isca inválida."""
+    rng = random.Random(semente)
+    return [gerar_email_html(rng, linhas_enchimento=rng.randint(100, 800), com_pix=rng.random() < 0.5,
+                             com_isca=rng.random() < 0.35)
+            for _ in range(quantidade)]
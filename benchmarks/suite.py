@@ -0,0 +1,251 @@
+"""
+Suíte de micro-benchmarks dos caminhos quentes, com vazão e percentis de latência
+por chamada e comparação com uma linha de base salva:
+
+- texto/emails: extrair_dados_de_texto em e-mails HTML de cobrança (boleto/PIX, com iscas)
+- pdf/frio: extrair_dados_pdf com o cache vazio (leitura real, isolada conforme a Config)
+- pdf/comgas: o mesmo em PDFs protegidos por senha (estilo Comgás)
+- pdf/cache: extrair_dados_pdf de arquivos já vistos (SHA-256 + consulta ao cache)
+- db/salvar: salvar_boleto_db de boletos inéditos numa base com N boletos
+- db/duplicata: salvar_boleto_db de boletos que já estão na base (caminho do ON CONFLICT)
+- db/pendentes: listar_pendentes_pagina, a página da listagem "🧾 Boletos Pendentes"
+
+Tudo roda numa base SQLite temporária; o boletos.db do bot não é tocado.
+
+Uso: python -m benchmarks.suite [--linhas 10000] [--emails 200] [--pdfs 20] [--repeticoes 3]
+                                [--salvar base.json] [--comparar base.json] [--tolerancia 10]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import core.database as database
+from benchmarks.bench_database import ORIGENS
+from benchmarks.corpus import gerar_corpus_emails, gerar_corpus_pdfs, gerar_linha_bancaria, gerar_pix
+from core.config import Config
+from core.models import Boleto
+from utils.extractor import extrair_dados_de_texto
+from utils.parser_pdf import extrair_dados_pdf
+
+SENHA_COMGAS = "12345"
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def _resumir(latencias, acertos=None):
+    """Transforma as latências (s) de um cenário em ops/s e percentis em ms."""
+    ordenadas = sorted(latencias)
+    resumo = {
+        "n": len(ordenadas),
+        "ops_s": len(ordenadas) / sum(ordenadas) if sum(ordenadas) else 0.0,
+        "p50_ms": _percentil(ordenadas, 50) * 1000,
+        "p95_ms": _percentil(ordenadas, 95) * 1000,
+        "p99_ms": _percentil(ordenadas, 99) * 1000,
+    }
+    if acertos is not None:
+        resumo["acerto"] = acertos / len(ordenadas)
+    return resumo
+
+
+def _medir(funcao, entradas, repeticoes=1, verificar=None):
+    """Chama `funcao(*entrada)` para cada entrada, `repeticoes` vezes, cronometrando cada chamada."""
+    latencias = []
+    acertos = 0
+    for _ in range(repeticoes):
+        for entrada, esperado in entradas:
+            inicio = time.perf_counter()
+            resultado = funcao(*entrada)
+            latencias.append(time.perf_counter() - inicio)
+            if verificar:
+                acertos += verificar(resultado, esperado)
+    return _resumir(latencias, acertos if verificar else None)
+
+
+def _linha_ok(dados, esperado):
+    return dados["linha"] == esperado["linha"]
+
+
+def _popular_boletos(linhas, rng):
+    """Enche a base temporária com `linhas` boletos (~3% pendentes), como um histórico de anos."""
+    registros = []
+    for i in range(linhas):
+        valor = rng.randint(3000, 90000)
+        # Origem + mês únicos por linha, como exige o índice de digitais
+        origem = f"{ORIGENS[(i // 300) % len(ORIGENS)]} #{i // 1500}"
+        mes = f"{i % 12 + 1:02d}/{2000 + (i // 12) % 25}"
+        registros.append((
+            origem, f"Fatura {i}", gerar_linha_bancaria(rng, valor),
+            gerar_pix(rng, valor) if rng.random() < 0.5 else None, valor,
+            0 if rng.random() < 0.03 else 1, mes,
+        ))
+    with database.get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO boletos (origem, titulo, linha_digitavel, pix, valor_centavos, pago, mes_referencia) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", registros)
+        conn.execute("ANALYZE")
+    return registros
+
+
+def _gerar_boletos(quantidade, rng):
+    """Boletos inéditos de um ciclo de coleta (origens e meses fora do histórico)."""
+    boletos = []
+    for i in range(quantidade):
+        valor = rng.randint(3000, 90000)
+        boletos.append(Boleto(
+            origem=f"{rng.choice(ORIGENS)} (novo {i})", titulo=f"Fatura nova {i}",
+            valor=f"{valor // 100},{valor % 100:02d}", linha_digitavel=gerar_linha_bancaria(rng, valor),
+            mes_referencia="12/2099", pix=gerar_pix(rng, valor) if rng.random() < 0.5 else None,
+        ))
+    return boletos
+
+
+def _cenarios_texto(emails, repeticoes):
+    corpus = gerar_corpus_emails(emails)
+    return {"texto/emails": _medir(extrair_dados_de_texto, [((html,), esperado) for html, esperado in corpus],
+                                   repeticoes, _linha_ok)}
+
+
+def _cenarios_pdf(pasta, pdfs, repeticoes):
+    entradas, protegidas = [], []
+    for corpus, destino, senha in ((gerar_corpus_pdfs(pdfs), entradas, None),
+                                   (gerar_corpus_pdfs(pdfs, semente=7, senha=SENHA_COMGAS), protegidas,
+                                    SENHA_COMGAS)):
+        for nome, pdf, esperado in corpus:
+            caminho = os.path.join(pasta, nome)
+            with open(caminho, "wb") as f:
+                f.write(pdf)
+            destino.append(((caminho, senha), esperado))
+
+    # Aquece o processo isolado de leitura com um PDF fora dos conjuntos (a partida não entra na conta)
+    nome, pdf, _ = gerar_corpus_pdfs(1, semente=99)[0]
+    with open(os.path.join(pasta, f"aquecimento_{nome}"), "wb") as f:
+        f.write(pdf)
+    extrair_dados_pdf(f.name)
+
+    # A primeira passada de cada conjunto encontra o cache vazio; as seguintes, só acertos
+    return {
+        "pdf/frio": _medir(extrair_dados_pdf, entradas, 1, _linha_ok),
+        "pdf/comgas": _medir(extrair_dados_pdf, protegidas, 1, _linha_ok),
+        "pdf/cache": _medir(extrair_dados_pdf, entradas + protegidas, repeticoes, _linha_ok),
+    }
+
+
+def _cenarios_db(linhas, consultas, rng):
+    historico = _popular_boletos(linhas, rng)
+    novos = _gerar_boletos(consultas, rng)
+    # Reenvia boletos do histórico (mesma linha digitável), como um e-mail lido de novo
+    repetidos = [Boleto(origem=origem, titulo=titulo, linha_digitavel=linha, pix=pix, mes_referencia=mes)
+                 for origem, titulo, linha, pix, _, _, mes in rng.sample(historico, min(consultas, len(historico)))]
+
+    with database.get_db_connection() as conn:
+        ids_pendentes = [r[0] for r in conn.execute("SELECT id FROM boletos WHERE pago = 0")]
+    # Metade das consultas abre a primeira página; a outra navega a partir de um pendente qualquer
+    paginas = [((Config.PAGINA_PENDENTES, None if i % 2 == 0 or not ids_pendentes else rng.choice(ids_pendentes)),
+                None) for i in range(consultas)]
+
+    return {
+        "db/salvar": _medir(database.salvar_boleto_db, [((b,), True) for b in novos], 1, lambda r, e: r == e),
+        "db/duplicata": _medir(database.salvar_boleto_db, [((b,), False) for b in repetidos], 1,
+                               lambda r, e: r == e),
+        "db/pendentes": _medir(database.listar_pendentes_pagina, paginas),
+    }
+
+
+def executar(linhas=10000, emails=200, pdfs=20, repeticoes=3, consultas=2000, semente=42):
+    """Roda todos os cenários numa base temporária e retorna {cenário: métricas}."""
+    resultados = {}
+    resultados.update(_cenarios_texto(emails, repeticoes))
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        # O pool abre conexões sob demanda lendo DB_PATH: fecha as atuais e aponta para a base temporária
+        database.fechar_db()
+        database.DB_PATH = os.path.join(pasta, "bench.db")
+        try:
+            database.inicializar_db()
+            resultados.update(_cenarios_pdf(pasta, pdfs, repeticoes))
+            inicio = time.perf_counter()
+            resultados.update(_cenarios_db(linhas, consultas, random.Random(semente)))
+            print(f"Base: {linhas} boletos; carga e cenários de banco em {time.perf_counter() - inicio:.1f}s\n")
+        finally:
+            database.fechar_db()
+            database.DB_PATH = caminho_original
+    return resultados
+
+
+def _variacao(atual, base):
+    return (atual - base) / base * 100 if base else 0.0
+
+
+def comparar(resultados, base, tolerancia=10.0):
+    """
+    Imprime a tabela de resultados e, havendo linha de base, a variação de ops/s e p95.
+    Retorna os cenários que pioraram além da tolerância (%) em qualquer das duas.
+    """
+    cenarios_base = base.get("cenarios", {}) if base else {}
+    cabecalho = f"{'cenário':<14} {'n':>6} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'acerto':>7}"
+    if cenarios_base:
+        cabecalho += f" {'Δ ops/s':>9} {'Δ p95':>8}"
+    print(cabecalho)
+
+    regressoes = []
+    for nome, m in resultados.items():
+        acerto = f"{m['acerto']:.0%}" if "acerto" in m else "-"
+        linha = (f"{nome:<14} {m['n']:>6} {m['ops_s']:>10.1f} {m['p50_ms']:>8.2f} {m['p95_ms']:>8.2f} "
+                 f"{m['p99_ms']:>8.2f} {acerto:>7}")
+        anterior = cenarios_base.get(nome)
+        if anterior:
+            delta_ops = _variacao(m["ops_s"], anterior["ops_s"])
+            delta_p95 = _variacao(m["p95_ms"], anterior["p95_ms"])
+            piorou = delta_ops < -tolerancia or delta_p95 > tolerancia
+            linha += f" {delta_ops:>+8.1f}% {delta_p95:>+7.1f}%" + (" ⚠️" if piorou else "")
+            if piorou:
+                regressoes.append(nome)
+        elif cenarios_base:
+            linha += f" {'novo':>9}"
+        print(linha)
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10000, help="boletos na base (10k a 100k)")
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--pdfs", type=int, default=20, help="PDFs por conjunto (comuns e protegidos)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--consultas", type=int, default=2000, help="chamadas por cenário de banco")
+    parser.add_argument("--salvar", help="grava os resultados como nova linha de base (JSON)")
+    parser.add_argument("--comparar", help="linha de base (JSON) para comparação")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="piora aceita antes de acusar regressão (%%)")
+    args = parser.parse_args()
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("parametros") != {"linhas": args.linhas, "emails": args.emails, "pdfs": args.pdfs}:
+            print(f"⚠️ Linha de base gerada com outros parâmetros: {base.get('parametros')}")
+
+    resultados = executar(args.linhas, args.emails, args.pdfs, args.repeticoes, args.consultas)
+    regressoes = comparar(resultados, base, args.tolerancia)
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump({
+                "gerado_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "parametros": {"linhas": args.linhas, "emails": args.emails, "pdfs": args.pdfs},
+                "cenarios": resultados,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Linha de base salva em {args.salvar}")
+
+    if regressoes:
+        print(f"\n⚠️ Regressão acima de {args.tolerancia:.0f}% em: {', '.join(regressoes)}")
+        sys.exit(1)
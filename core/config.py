@@ -11,11 +11,31 @@ class Config:
     GMAIL_PASS = os.getenv('GMAIL_APP_PASSWORD')
     raw_labels = os.getenv("LABELS_INTERESSE", "")
     LABELS_INTERESSE = [l.strip() for l in raw_labels.split(",") if l.strip()]
+    # incremental: só UIDs novos por label | completo: varre toda a janela de datas a cada ciclo
+    GMAIL_MODO_SYNC = os.getenv("GMAIL_MODO_SYNC", "incremental").lower()
 
     # --- SEGURANÇA E DIRETÓRIOS ---
     CPF_SENHA = os.getenv("CPF_SENHA")
     ANTICAPTCHA_KEY = os.getenv("ANTICAPTCHA_KEY")
     TEMP_DIR = '/tmp/boleto_bot'
+    # Máximo de resultados de extração de PDF guardados no cache (SQLite)
+    CACHE_PDF_MAX_ENTRADAS = int(os.getenv("CACHE_PDF_MAX_ENTRADAS", "500"))
+    # Leitura de PDFs: pdfium (rápido), pdfplumber (layout) ou auto (pdfium com fallback)
+    PDF_BACKEND = os.getenv("PDF_BACKEND", "auto").lower()
+    # Páginas extras lidas após achar só a linha ou só o PIX, em busca do outro
+    PDF_PAGINAS_APOS_ACHADO = int(os.getenv("PDF_PAGINAS_APOS_ACHADO", "1"))
+    # Leitura de PDFs em processos separados: um PDF patológico não derruba o bot
+    PDF_PROCESSO_ISOLADO = os.getenv("PDF_PROCESSO_ISOLADO", "true").lower() in ("1", "true", "sim")
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+    PDF_TIMEOUT_SEGUNDOS = float(os.getenv("PDF_TIMEOUT_SEGUNDOS", "60"))
+    # Recicla o processo após N PDFs ou quando o RSS passa do limite
+    PDF_WORKER_MAX_TAREFAS = int(os.getenv("PDF_WORKER_MAX_TAREFAS", "20"))
+    PDF_WORKER_LIMITE_RSS_MB = float(os.getenv("PDF_WORKER_LIMITE_RSS_MB", "200"))
+    # Teto rígido de memória virtual por processo (0 desativa)
+    PDF_WORKER_LIMITE_MEMORIA_MB = float(os.getenv("PDF_WORKER_LIMITE_MEMORIA_MB", "512"))
+    # Conexões SQLite reaproveitadas (pool) e tempo máximo esperando uma livre
+    DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "4"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
 
     # --- CREDENCIAIS DE PORTAIS (SCRAPERS) ---
     SEMAE_USER = os.getenv("SEMAE_USUARIO")
@@ -23,10 +43,62 @@ class Config:
     SEMAE_PASS = os.getenv("SEMAE_SENHA")
     LLZ_USER = os.getenv("LLZ_USER")
     LLZ_PASS = os.getenv("LLZ_PASS")
+    # API (XHR) usada pelo portal LLZ no modo HTTP; rotas ainda não confirmadas (aponte para um stub nos testes)
+    LLZ_API_URL = os.getenv("LLZ_API_URL", "https://api.llzgarantidora.com.br")
+    LLZ_ROTA_LOGIN = os.getenv("LLZ_ROTA_LOGIN", "/auth/login")
+    LLZ_ROTA_BOLETOS = os.getenv("LLZ_ROTA_BOLETOS", "/boletos")
 
     # Lista de funções de scrapers ativos (ex: scrap_semae_piracicaba, scrap_llz_condominio)
     raw_scrapers = os.getenv("SCRAPERS_ATIVOS", "")
     LISTA_FUNCOES_SCRAPERS = [s.strip() for s in raw_scrapers.split(",") if s.strip()]
+    # Modo de cada scraper: selenium (padrão), http (só API) ou auto (API com fallback para o navegador)
+    # ex: scrap_llz_condominio:auto — só depois de confirmar as rotas LLZ_API_URL/LLZ_ROTA_* acima
+    raw_modos = os.getenv("MODOS_SCRAPERS", "")
+    MODOS_SCRAPERS = {k.strip(): v.strip().lower() for k, v in
+                      [item.split(':', 1) for item in raw_modos.split(",") if ':' in item]}
+
+    # --- CICLO DE COLETA (EXECUÇÃO CONCORRENTE) ---
+    # Quantas fontes (labels do Gmail + scrapers) rodam ao mesmo tempo
+    MAX_WORKERS_COLETA = int(os.getenv("MAX_WORKERS_COLETA", "4"))
+    # Fontes que abrem navegador são limitadas à parte (VM de 512 MB)
+    MAX_FONTES_PESADAS = int(os.getenv("MAX_FONTES_PESADAS", "1"))
+    # Prazo (segundos) de cada fonte, contado a partir do início da sua execução
+    TIMEOUT_FONTE_PADRAO = float(os.getenv("TIMEOUT_FONTE_PADRAO", "180"))
+    # Prazos específicos por fonte (ex: scrap_semae_piracicaba:300,Finances/Claro:60)
+    raw_timeouts = os.getenv("TIMEOUTS_FONTES", "")
+    TIMEOUTS_FONTES = {k.strip(): float(v) for k, v in
+                       [item.rsplit(':', 1) for item in raw_timeouts.split(",") if ':' in item]}
+    # Prazo total do ciclo: o que não terminou até aqui é cancelado
+    TIMEOUT_CICLO = float(os.getenv("TIMEOUT_CICLO", "900"))
+
+    # --- AGENDADOR DE COLETA ---
+    # Desligado por padrão: os ciclos agendados notificam todos os ALLOWED_USERS sem ninguém pedir
+    AGENDADOR_ATIVO = os.getenv("AGENDADOR_ATIVO", "false").lower() in ("1", "true", "sim")
+    # Intervalo padrão (segundos) entre execuções de cada fonte, e específicos por fonte
+    AGENDA_INTERVALO_PADRAO = float(os.getenv("AGENDA_INTERVALO_PADRAO", "21600"))
+    raw_intervalos = os.getenv("AGENDA_INTERVALOS", "")
+    AGENDA_INTERVALOS = {k.strip(): float(v) for k, v in
+                         [item.rsplit(':', 1) for item in raw_intervalos.split(",") if ':' in item]}
+    # Perto do dia esperado da conta (± dias) a fonte roda com mais frequência
+    AGENDA_JANELA_DIAS = int(os.getenv("AGENDA_JANELA_DIAS", "3"))
+    AGENDA_INTERVALO_JANELA = float(os.getenv("AGENDA_INTERVALO_JANELA", "3600"))
+    # Conta do mês já entregue: fontes baratas passam a rodar só uma vez por dia
+    AGENDA_INTERVALO_ENTREGUE = float(os.getenv("AGENDA_INTERVALO_ENTREGUE", "86400"))
+    # Variação aleatória (fração) aplicada a cada intervalo, para as fontes não baterem juntas
+    AGENDA_JITTER = float(os.getenv("AGENDA_JITTER", "0.1"))
+    # De quanto em quanto tempo o agendador confere se há fontes vencidas
+    AGENDA_VERIFICACAO = float(os.getenv("AGENDA_VERIFICACAO", "60"))
+
+    # --- POOL DE NAVEGADORES (SCRAPERS SELENIUM) ---
+    # Navegadores mantidos aquecidos entre execuções dos scrapers
+    NAVEGADORES_POOL = int(os.getenv("NAVEGADORES_POOL", "1"))
+    # Recicla o navegador após N empréstimos ou quando o RSS (Chromium + filhos) passa do limite
+    NAVEGADOR_MAX_USOS = int(os.getenv("NAVEGADOR_MAX_USOS", "10"))
+    NAVEGADOR_LIMITE_RSS_MB = float(os.getenv("NAVEGADOR_LIMITE_RSS_MB", "350"))
+    # Encerra o navegador após esse tempo sem uso (libera memória entre ciclos)
+    NAVEGADOR_OCIOSO_SEGUNDOS = float(os.getenv("NAVEGADOR_OCIOSO_SEGUNDOS", "300"))
+    # Tempo máximo aguardando um navegador livre no pool
+    NAVEGADOR_TIMEOUT_ESPERA = float(os.getenv("NAVEGADOR_TIMEOUT_ESPERA", "120"))
 
     # --- TELEGRAM ---
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "user_id:bot_token")
@@ -37,9 +109,48 @@ class Config:
     # IDs específicos para identificação de rateio
     ID_NEKO = os.getenv("ID_NEKO")
     ID_BAKA = os.getenv("ID_BAKA")
+    # Boletos novos do ciclo: agrupado (uma mensagem por destinatário ao fim do ciclo) ou individual
+    NOTIFICACAO_MODO = os.getenv("NOTIFICACAO_MODO", "agrupado").lower()
+    # Fila de saída para o Telegram: threads de envio, mensagens/s no total e por chat
+    # (com rajada curta) e tentativas em falhas transitórias
+    ENVIO_WORKERS = int(os.getenv("ENVIO_WORKERS", "2"))
+    ENVIO_TAXA_GLOBAL = float(os.getenv("ENVIO_TAXA_GLOBAL", "30"))
+    ENVIO_TAXA_CHAT = float(os.getenv("ENVIO_TAXA_CHAT", "1"))
+    ENVIO_RAJADA_CHAT = int(os.getenv("ENVIO_RAJADA_CHAT", "3"))
+    ENVIO_MAX_TENTATIVAS = int(os.getenv("ENVIO_MAX_TENTATIVAS", "5"))
+    # Listas paginadas (pendentes, detalhes do mês): itens por página, validade e tamanho do cache
+    PAGINA_PENDENTES = int(os.getenv("PAGINA_PENDENTES", "5"))
+    PAGINAS_TTL = int(os.getenv("PAGINAS_TTL", "120"))
+    PAGINAS_CACHE_MAX = int(os.getenv("PAGINAS_CACHE_MAX", "200"))
+    # Conversas guiadas (lançamento manual): validade de cada passo e quantas ficam em memória
+    CONVERSA_TTL = int(os.getenv("CONVERSA_TTL", "1800"))
+    CONVERSAS_EM_MEMORIA = int(os.getenv("CONVERSAS_EM_MEMORIA", "256"))
+    # Tarefas longas (busca manual, leituras da planilha) rodam fora dos handlers
+    TAREFAS_WORKERS = int(os.getenv("TAREFAS_WORKERS", "3"))
+    # Recebimento de updates: polling (padrão) ou webhook (servidor HTTP embutido)
+    BOT_MODO = os.getenv("BOT_MODO", "polling").lower()
+    # URL pública do app (ex: https://boletos-bot.fly.dev); vazio sobe o servidor sem registrar
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PORTA = int(os.getenv("WEBHOOK_PORTA", "8080"))
+    WEBHOOK_CAMINHO = os.getenv("WEBHOOK_CAMINHO", "/telegram")
+    # Conferido no cabeçalho X-Telegram-Bot-Api-Secret-Token; vazio deriva um do token do bot
+    WEBHOOK_SEGREDO = os.getenv("WEBHOOK_SEGREDO", "")
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
 
     # --- GOOGLE SHEETS E FINANCEIRO ---
     SHEET_NAME = os.getenv("SHEET_NAME", "Contas - Casa")
+    # Opcional: abrir pela chave evita a busca por nome no Drive
+    SHEET_ID = os.getenv("SHEET_ID")
+    # Por quanto tempo os handles das abas mensais ficam em cache
+    SHEETS_TTL_ABAS = int(os.getenv("SHEETS_TTL_ABAS", "600"))
+    # Validade do resumo/detalhes do mês em cache (escritas do próprio bot invalidam antes)
+    SHEETS_TTL_LEITURA = int(os.getenv("SHEETS_TTL_LEITURA", "120"))
+    # Validade do índice local de linhas (item/categoria -> linha) de cada aba
+    SHEETS_TTL_INDICE = int(os.getenv("SHEETS_TTL_INDICE", "600"))
+    # Fila persistente de escritas: intervalo da varredura, itens por rodada e tentativas até desistir
+    FILA_PLANILHA_INTERVALO = float(os.getenv("FILA_PLANILHA_INTERVALO", "5"))
+    FILA_PLANILHA_LOTE = int(os.getenv("FILA_PLANILHA_LOTE", "20"))
+    FILA_PLANILHA_MAX_TENTATIVAS = int(os.getenv("FILA_PLANILHA_MAX_TENTATIVAS", "8"))
     MAPA_CATEGORIAS = os.getenv("MAPA_CATEGORIAS")
 
     # Taxas de Rateio
@@ -1,5 +1,12 @@
+import json
 import sqlite3
 import os
+import time
+
+from core.config import Config
+from core.logger import logger
+from core.pool_db import criar_pool
+from utils.helpers import valor_para_centavos
 
 if os.path.exists("/data"):
     DB_PATH = "/data/boletos.db"
@@ -7,56 +14,561 @@ else:
     DB_PATH = os.path.join(os.getcwd(), "boletos.db")
 
 
-def get_db_connection():
-    """Estabelece conexão com o SQLite e configura o retorno como dicionário."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+# Pragmas aplicados a cada conexão: WAL permite leitura enquanto a fila/coleta escrevem;
+# synchronous=NORMAL é seguro com WAL (pode perder só a última transação numa queda de energia)
+PRAGMAS_CONEXAO = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",  # ~8 MB de cache de páginas
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+def configurar_conexao(conn):
+    """Aplica as pragmas de desempenho/concorrência numa conexão recém-aberta."""
+    for pragma in PRAGMAS_CONEXAO:
+        conn.execute(pragma)
     return conn
 
 
-def inicializar_db():
-    """Cria a tabela de boletos caso ela ainda não exista."""
-    with get_db_connection() as conn:
-        conn.execute("""
-                     CREATE TABLE IF NOT EXISTS boletos
-                     (
-                         id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         origem TEXT,
-                         titulo TEXT,
-                         linha_digitavel TEXT,
-                         pix TEXT,
-                         valor TEXT,
-                         pago INTEGER DEFAULT 0,
-                         mes_referencia TEXT,
-                         data_identificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                     )
+def _abrir_conexao():
+    """Abre uma conexão configurada (retorno como dicionário); usada só pelo pool."""
+    # check_same_thread=False: a conexão muda de thread entre empréstimos, nunca durante
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    return configurar_conexao(conn)
+
+
+_pool = criar_pool(_abrir_conexao, tamanho=Config.DB_POOL_TAMANHO, timeout_espera=Config.DB_POOL_TIMEOUT)
+
+
+def get_db_connection():
+    """
+    Empresta uma conexão do pool. Use sempre com `with`: commit ao sair do bloco,
+    rollback em exceção e a conexão volta para o pool (não é fechada).
+    """
+    return _pool.conexao()
+
+
+def transacao():
+    """Como get_db_connection, mas com BEGIN IMMEDIATE: para ler e escrever de forma atômica."""
+    return _pool.conexao(imediata=True)
+
+
+def estatisticas_db():
+    """Métricas do pool de conexões (abertas, em uso, empréstimos, latências em ms)."""
+    return _pool.estatisticas()
+
+
+def fechar_db():
+    """Fecha as conexões do pool (também é chamado automaticamente na saída)."""
+    _pool.fechar()
+
+
+# --- MIGRAÇÕES ---
+def _migracao_estrutura_inicial(conn):
+    """Tabelas existentes antes do controle de versão (idempotente para bases antigas)."""
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS boletos
+                 (
+                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     origem TEXT,
+                     titulo TEXT,
+                     linha_digitavel TEXT,
+                     pix TEXT,
+                     valor TEXT,
+                     pago INTEGER DEFAULT 0,
+                     mes_referencia TEXT,
+                     data_identificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+    # Marca d'água por label: UIDVALIDITY da pasta e último UID já processado
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS gmail_sync
+                 (
+                     label TEXT PRIMARY KEY,
+                     uidvalidity INTEGER,
+                     ultimo_uid INTEGER,
+                     atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+    # Índice de Message-ID: um e-mail em duas labels é processado uma vez só
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS mensagens_processadas
+                 (
+                     message_id TEXT PRIMARY KEY,
+                     label TEXT,
+                     uid INTEGER,
+                     processado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+    # Resultados de extração de PDF endereçados pelo SHA-256 do arquivo
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS cache_pdf
+                 (
+                     sha256 TEXT,
+                     versao TEXT,
+                     linha TEXT,
+                     pix TEXT,
+                     valor TEXT,
+                     ultimo_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     PRIMARY KEY (sha256, versao)
+                 )
+                 """)
+    # Fila persistente de escritas na planilha (write-behind): sobrevive a reinícios
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS fila_escrita
+                 (
+                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     tipo TEXT,
+                     chave TEXT,
+                     mes_referencia TEXT,
+                     dados TEXT,
+                     chat_id INTEGER,
+                     message_id INTEGER,
+                     status TEXT DEFAULT 'pendente',
+                     tentativas INTEGER DEFAULT 0,
+                     proxima_tentativa REAL DEFAULT 0,
+                     ultimo_erro TEXT,
+                     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+
+
+def _migracao_valor_em_centavos(conn):
+    """Reconstrói `boletos` guardando o valor como inteiro em centavos (valor_centavos)."""
+    conn.create_function("centavos", 1, valor_para_centavos, deterministic=True)
+    conn.execute("""
+                 CREATE TABLE boletos_nova
+                 (
+                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     origem TEXT,
+                     titulo TEXT,
+                     linha_digitavel TEXT,
+                     pix TEXT,
+                     valor_centavos INTEGER,
+                     pago INTEGER DEFAULT 0,
+                     mes_referencia TEXT,
+                     data_identificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+    conn.execute("""
+                 INSERT INTO boletos_nova (id, origem, titulo, linha_digitavel, pix, valor_centavos, pago,
+                                           mes_referencia, data_identificacao)
+                 SELECT id, origem, titulo, linha_digitavel, pix, centavos(valor), pago,
+                        mes_referencia, data_identificacao
+                 FROM boletos
+                 """)
+    conn.execute("DROP TABLE boletos")
+    conn.execute("ALTER TABLE boletos_nova RENAME TO boletos")
+
+
+def _migracao_indices(conn):
+    """Índices para as consultas quentes (duplicidade, pendentes, fila e LRU do cache)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boletos_pix ON boletos (pix)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boletos_linha ON boletos (linha_digitavel)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boletos_origem_mes ON boletos (origem, mes_referencia)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boletos_pago ON boletos (pago, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fila_status ON fila_escrita (status, proxima_tentativa)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_pdf_acesso ON cache_pdf (ultimo_acesso)")
+
+
+# Impressões digitais de um boleto: qualquer uma repetida indica duplicata
+DIGITAIS_BOLETO = (
+    ("ux_boletos_pix", "pix", "pix IS NOT NULL"),
+    ("ux_boletos_linha", "linha_digitavel", "linha_digitavel IS NOT NULL"),
+    ("ux_boletos_origem_mes", "origem, mes_referencia", "origem IS NOT NULL AND mes_referencia IS NOT NULL"),
+)
+
+
+def _migracao_digitais_unicas(conn):
+    """
+    Troca os índices de duplicidade por índices UNIQUE parciais. Duplicatas antigas
+    saem de boletos mantendo o registro mais antigo (que herda o 'pago' das cópias);
+    as cópias vão para boletos_duplicados, com o id mantido e a digital que as acusou.
+    """
+    colunas_boleto = [c[1] for c in conn.execute("PRAGMA table_info(boletos)")]
+    lista = ", ".join(colunas_boleto)
+    conn.execute(f"CREATE TABLE boletos_duplicados AS SELECT {lista}, 0 AS id_mantido, '' AS digital "
+                 f"FROM boletos WHERE 0")
+
+    for nome, colunas, condicao in DIGITAIS_BOLETO:
+        conn.execute(f"""
+                     UPDATE boletos SET pago = 1
+                     WHERE pago = 0 AND id IN (SELECT MIN(id) FROM boletos WHERE {condicao}
+                                               GROUP BY {colunas} HAVING MAX(pago) = 1)
                      """)
-        conn.commit()
+        iguais = " AND ".join(f"b.{c} = g.{c}" for c in colunas.split(", "))
+        copiadas = conn.execute(f"""
+                                INSERT INTO boletos_duplicados ({lista}, id_mantido, digital)
+                                SELECT {", ".join(f"b.{c}" for c in colunas_boleto)}, g.mantido, '{colunas}'
+                                FROM boletos b
+                                JOIN (SELECT {colunas}, MIN(id) AS mantido FROM boletos WHERE {condicao}
+                                      GROUP BY {colunas}) g ON {iguais}
+                                WHERE b.id <> g.mantido
+                                """).rowcount
+        if copiadas:
+            logger.warning(f"🗂️ {copiadas} boleto(s) com {colunas} repetido(s) movido(s) para boletos_duplicados.")
+        conn.execute(f"""
+                     DELETE FROM boletos
+                     WHERE {condicao} AND id NOT IN (SELECT MIN(id) FROM boletos WHERE {condicao}
+                                                     GROUP BY {colunas})
+                     """)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {nome} ON boletos ({colunas}) WHERE {condicao}")
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_pix")
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_linha")
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_origem_mes")
+
+
+def _migracao_agenda_coleta(conn):
+    """Estado do agendador (próxima execução e falhas por fonte) e índice do histórico de entregas."""
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS agenda_coleta
+                 (
+                     fonte TEXT PRIMARY KEY,
+                     proxima_execucao REAL,
+                     ultima_execucao REAL,
+                     ultimo_status TEXT,
+                     falhas_seguidas INTEGER DEFAULT 0,
+                     motivo TEXT
+                 )
+                 """)
+    # Histórico de entregas por origem (dia esperado de cada conta)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boletos_origem_data ON boletos (origem, data_identificacao)")
+
+
+def _migracao_conversas(conn):
+    """Estado das conversas guiadas (ex: lançamento manual), com expiração."""
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS conversas
+                 (
+                     chave TEXT PRIMARY KEY,
+                     estado TEXT,
+                     dados TEXT,
+                     expira_em REAL
+                 )
+                 """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversas_expira ON conversas (expira_em)")
+
+
+# Ordem importa: cada migração roda uma única vez, numa transação própria
+MIGRACOES = [
+    (1, "estrutura inicial", _migracao_estrutura_inicial),
+    (2, "valor dos boletos em centavos", _migracao_valor_em_centavos),
+    (3, "índices de consulta", _migracao_indices),
+    (4, "impressões digitais únicas de boletos", _migracao_digitais_unicas),
+    (5, "agenda de coleta por fonte", _migracao_agenda_coleta),
+    (6, "estado das conversas", _migracao_conversas),
+]
+
+
+def versao_schema(conn):
+    """Versão atual do schema (0 para uma base sem controle de versão)."""
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS schema_version
+                 (
+                     versao INTEGER PRIMARY KEY,
+                     descricao TEXT,
+                     aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                 )
+                 """)
+    return conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_version").fetchone()[0]
+
+
+def aplicar_migracoes(conn, ate=None):
+    """
+    Aplica, em ordem, as migrações pendentes até a versão `ate` (todas por padrão).
+    Cada uma roda em BEGIN IMMEDIATE: outra thread/processo que chegue junto espera e
+    depois encontra a versão já atualizada. Retorna a versão final.
+    """
+    alvo = MIGRACOES[-1][0] if ate is None else ate
+    if versao_schema(conn) >= alvo:
+        return versao_schema(conn)
+
+    nivel_anterior = conn.isolation_level
+    conn.isolation_level = None  # Controle manual: DDL também entra na transação
+    try:
+        for versao, descricao, migrar in MIGRACOES:
+            if ate is not None and versao > ate:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if versao_schema(conn) >= versao:
+                    conn.execute("ROLLBACK")
+                    continue
+                migrar(conn)
+                conn.execute("INSERT INTO schema_version (versao, descricao) VALUES (?, ?)", (versao, descricao))
+                conn.execute("COMMIT")
+                logger.info(f"🧱 Migração {versao} aplicada: {descricao}")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return versao_schema(conn)
+    finally:
+        conn.isolation_level = nivel_anterior
+
+
+def inicializar_db():
+    """Coloca a base em WAL e aplica as migrações pendentes (boletos, Gmail, cache de PDFs, fila)."""
+    with get_db_connection() as conn:
+        # journal_mode é persistente no arquivo: basta ativar uma vez
+        conn.execute("PRAGMA journal_mode = WAL")
+        aplicar_migracoes(conn)
+
+
+def salvar_boletos_em_lote(boletos):
+    """
+    Salva uma lista de boletos numa única transação, ignorando os que já existem
+    (mesmo PIX, mesma linha digitável ou mesma origem + mês de referência; veja DIGITAIS_BOLETO).
+    Preenche `boleto.id` dos inéditos e retorna a lista deles, na ordem recebida.
+    """
+    novos = []
+    if not boletos:
+        return novos
+
+    with transacao() as conn:
+        for boleto in boletos:
+            # RETURNING só existe a partir do SQLite 3.35 (a imagem bullseye traz a 3.34):
+            # dentro da mesma transação, rowcount/lastrowid por linha dão o mesmo resultado
+            cur = conn.execute(
+                "INSERT INTO boletos (origem, titulo, linha_digitavel, pix, valor_centavos, mes_referencia) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                (boleto.origem, boleto.titulo, boleto.linha_digitavel, boleto.pix,
+                 valor_para_centavos(boleto.valor), boleto.mes_referencia)
+            )
+            if cur.rowcount == 1:
+                boleto.id = cur.lastrowid
+                novos.append(boleto)
+    return novos
 
 
 def salvar_boleto_db(boleto):
+    """Salva o boleto no banco apenas se ele for inédito. Retorna True se foi inserido."""
+    return bool(salvar_boletos_em_lote([boleto]))
+
+
+def listar_pendentes_pagina(limite, apos_id=None, antes_id=None):
     """
-    Salva o boleto no banco apenas se ele for inédito.
-    Verifica duplicidade pela Linha Digitável ou pelo PIX.
+    Página de boletos pendentes por keyset (usa idx_boletos_pago): os `limite` seguintes
+    a `apos_id` ou os anteriores a `antes_id`, sempre em ordem de id.
+    Retorna (rows, ha_anterior, ha_proxima, total_pendentes).
     """
     with get_db_connection() as conn:
-        # Busca por duplicatas existentes
-        existe = conn.execute(
-            "SELECT id FROM boletos WHERE "
-            "(pix IS NOT NULL AND pix = ?) OR "
-            "(linha_digitavel IS NOT NULL AND linha_digitavel = ?) OR"
-            "(origem = ? AND mes_referencia = ?)",
-            (boleto.pix, boleto.linha_digitavel, boleto.origem, boleto.mes_referencia)
+        if antes_id is not None:
+            rows = conn.execute("SELECT * FROM boletos WHERE pago = 0 AND id < ? ORDER BY id DESC LIMIT ?",
+                                (antes_id, limite)).fetchall()[::-1]
+        else:
+            rows = conn.execute("SELECT * FROM boletos WHERE pago = 0 AND id > ? ORDER BY id LIMIT ?",
+                                (apos_id or 0, limite)).fetchall()
+        total = conn.execute("SELECT COUNT(*) FROM boletos WHERE pago = 0").fetchone()[0]
+        if not rows:
+            return [], False, False, total
+        ha_anterior = conn.execute("SELECT EXISTS (SELECT 1 FROM boletos WHERE pago = 0 AND id < ?)",
+                                   (rows[0]['id'],)).fetchone()[0]
+        ha_proxima = conn.execute("SELECT EXISTS (SELECT 1 FROM boletos WHERE pago = 0 AND id > ?)",
+                                  (rows[-1]['id'],)).fetchone()[0]
+    return rows, bool(ha_anterior), bool(ha_proxima), total
+
+
+def obter_sync_label(label):
+    """Retorna (uidvalidity, ultimo_uid) da label ou None se ela nunca foi sincronizada."""
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT uidvalidity, ultimo_uid FROM gmail_sync WHERE label = ?", (label,)
         ).fetchone()
-        # existe = False
+    return (row['uidvalidity'], row['ultimo_uid']) if row else None
+
+
+def mensagem_processada(message_id):
+    """True se o Message-ID já foi processado e confirmado por algum ciclo anterior."""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT 1 FROM mensagens_processadas WHERE message_id = ?", (message_id,)).fetchone()
+    return row is not None
+
+
+def confirmar_sync_label(label, uidvalidity, ultimo_uid, mensagens):
+    """
+    Grava, numa única transação, a marca d'água da label e os Message-IDs processados
+    (lista de (message_id, uid)). Só deve ser chamada depois que os boletos da varredura
+    foram salvos: assim nenhum e-mail é dado como lido sem ter virado boleto.
+    """
+    with transacao() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO mensagens_processadas (message_id, label, uid) VALUES (?, ?, ?)",
+            [(message_id, label, uid) for message_id, uid in mensagens]
+        )
+        conn.execute(
+            "INSERT INTO gmail_sync (label, uidvalidity, ultimo_uid, atualizado_em) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(label) DO UPDATE SET uidvalidity = excluded.uidvalidity, "
+            "ultimo_uid = excluded.ultimo_uid, atualizado_em = excluded.atualizado_em",
+            (label, uidvalidity, ultimo_uid)
+        )
 
-        if not existe:
+
+def limpar_estado_sync():
+    """Esquece marcas d'água e Message-IDs: o próximo ciclo volta a varrer a janela completa."""
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM gmail_sync")
+        conn.execute("DELETE FROM mensagens_processadas")
+
+
+def buscar_cache_pdf(sha256, versao):
+    """Retorna o dicionário {linha, pix, valor} em cache para o PDF, ou None."""
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT linha, pix, valor FROM cache_pdf WHERE sha256 = ? AND versao = ?", (sha256, versao)
+        ).fetchone()
+        if row:
             conn.execute(
-                "INSERT INTO boletos (origem, titulo, linha_digitavel, pix, valor, mes_referencia) "
-                "VALUES (?, ?, ?, ?, ?, ?)",
-                (boleto.origem, boleto.titulo, boleto.linha_digitavel, boleto.pix, boleto.valor, boleto.mes_referencia)
+                "UPDATE cache_pdf SET ultimo_acesso = CURRENT_TIMESTAMP WHERE sha256 = ? AND versao = ?",
+                (sha256, versao)
             )
-            conn.commit()
-            return True
+    return {"linha": row['linha'], "pix": row['pix'], "valor": row['valor']} if row else None
+
+
+def salvar_cache_pdf(sha256, versao, dados, max_entradas):
+    """
+    Guarda o resultado da extração e aplica o limite de tamanho do cache:
+    descarta entradas de versões antigas do extrator e as menos usadas recentemente.
+    """
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_pdf (sha256, versao, linha, pix, valor) VALUES (?, ?, ?, ?, ?)",
+            (sha256, versao, dados["linha"], dados["pix"], dados["valor"])
+        )
+        conn.execute("DELETE FROM cache_pdf WHERE versao != ?", (versao,))
+        conn.execute(
+            "DELETE FROM cache_pdf WHERE rowid NOT IN "
+            "(SELECT rowid FROM cache_pdf ORDER BY ultimo_acesso DESC, rowid DESC LIMIT ?)",
+            (max_entradas,)
+        )
+
+
+def contar_cache_pdf():
+    """Quantidade de entradas atualmente no cache de PDFs."""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM cache_pdf").fetchone()[0]
+
+
+def enfileirar_escrita(tipo, chave, mes_referencia, dados, chat_id=None, message_id=None):
+    """
+    Registra uma escrita pendente na planilha e retorna o id do item.
+    `dados` é serializado em JSON; itens com a mesma `chave` são coalescidos no envio.
+    """
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            "INSERT INTO fila_escrita (tipo, chave, mes_referencia, dados, chat_id, message_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (tipo, chave, mes_referencia, json.dumps(dados, ensure_ascii=False), chat_id, message_id)
+        )
+        return cur.lastrowid
+
+
+def reservar_escritas(limite):
+    """
+    Marca como 'enviando' e devolve (em ordem de chegada) até `limite` itens prontos para envio.
+    """
+    with transacao() as conn:
+        rows = conn.execute(
+            "SELECT * FROM fila_escrita WHERE status = 'pendente' AND proxima_tentativa <= ? "
+            "ORDER BY id LIMIT ?", (time.time(), limite)
+        ).fetchall()
+        conn.executemany("UPDATE fila_escrita SET status = 'enviando' WHERE id = ?", [(r['id'],) for r in rows])
+    itens = []
+    for row in rows:
+        item = dict(row)
+        item['dados'] = json.loads(item['dados'])
+        itens.append(item)
+    return itens
 
-        return False
\ No newline at end of file
+
+def concluir_escritas(ids, status='concluido', erro=None):
+    """Finaliza itens da fila ('concluido' ou 'falhou')."""
+    with get_db_connection() as conn:
+        conn.executemany("UPDATE fila_escrita SET status = ?, ultimo_erro = ? WHERE id = ?",
+                         [(status, erro, i) for i in ids])
+
+
+def reagendar_escrita(id_item, erro, atraso_segundos):
+    """Devolve o item para a fila com mais uma tentativa registrada."""
+    with get_db_connection() as conn:
+        conn.execute(
+            "UPDATE fila_escrita SET status = 'pendente', tentativas = tentativas + 1, "
+            "proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+            (time.time() + atraso_segundos, erro, id_item)
+        )
+
+
+def recuperar_fila_escrita(dias_historico=7):
+    """
+    Na subida do bot: itens que ficaram 'enviando' (processo morreu no meio) voltam a
+    'pendente', e itens finalizados há mais de `dias_historico` dias são descartados.
+    Retorna quantos itens aguardam envio.
+    """
+    with get_db_connection() as conn:
+        conn.execute("UPDATE fila_escrita SET status = 'pendente' WHERE status = 'enviando'")
+        conn.execute(
+            "DELETE FROM fila_escrita WHERE status IN ('concluido', 'falhou') AND criado_em < datetime('now', ?)",
+            (f"-{int(dias_historico)} days",)
+        )
+        return conn.execute("SELECT COUNT(*) FROM fila_escrita WHERE status = 'pendente'").fetchone()[0]
+
+
+def obter_agenda_coleta():
+    """Agenda de todas as fontes: {fonte: row}."""
+    with get_db_connection() as conn:
+        return {r['fonte']: r for r in conn.execute("SELECT * FROM agenda_coleta").fetchall()}
+
+
+def salvar_agenda_coleta(fonte, proxima_execucao, ultimo_status=None, falhas_seguidas=0, motivo=None,
+                         executou=True):
+    """Grava a próxima execução da fonte (e, se `executou`, o resultado da execução atual)."""
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO agenda_coleta (fonte, proxima_execucao, ultima_execucao, ultimo_status, "
+            "falhas_seguidas, motivo) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (fonte) DO UPDATE SET proxima_execucao = excluded.proxima_execucao, "
+            "ultima_execucao = COALESCE(excluded.ultima_execucao, ultima_execucao), "
+            "ultimo_status = COALESCE(excluded.ultimo_status, ultimo_status), "
+            "falhas_seguidas = excluded.falhas_seguidas, motivo = excluded.motivo",
+            (fonte, proxima_execucao, time.time() if executou else None, ultimo_status, falhas_seguidas, motivo)
+        )
+
+
+def historico_entregas(origem, limite=6):
+    """
+    Últimas entregas de boletos da origem, da mais recente para a mais antiga:
+    lista de (data_identificacao 'AAAA-MM-DD ...', mes_referencia 'MM/AAAA').
+    """
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT data_identificacao, mes_referencia FROM boletos WHERE origem = ? "
+            "ORDER BY data_identificacao DESC LIMIT ?", (origem, limite)
+        ).fetchall()
+    return [(r['data_identificacao'], r['mes_referencia']) for r in rows]
+
+
+def obter_conversa(chave):
+    """(estado, dados, expira_em) da conversa ainda válida, ou None."""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT estado, dados, expira_em FROM conversas WHERE chave = ? AND expira_em > ?",
+                           (chave, time.time())).fetchone()
+    return (row['estado'], json.loads(row['dados']), row['expira_em']) if row else None
+
+
+def salvar_conversa(chave, estado, dados, expira_em):
+    """Grava o passo atual da conversa e descarta as que já expiraram."""
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO conversas (chave, estado, dados, expira_em) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (chave) DO UPDATE SET estado = excluded.estado, dados = excluded.dados, "
+            "expira_em = excluded.expira_em",
+            (chave, estado, json.dumps(dados, ensure_ascii=False), expira_em)
+        )
+        conn.execute("DELETE FROM conversas WHERE expira_em <= ?", (time.time(),))
+
+
+def apagar_conversa(chave):
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM conversas WHERE chave = ?", (chave,))
@@ -16,6 +16,7 @@ class Boleto:
     pix: Optional[str] = None
     arquivo_path: Optional[str] = None
     link_externo: Optional[str] = None
+    id: Optional[int] = None  # Preenchido ao salvar no banco (usado nos botões do Telegram)
 
     def __post_init__(self):
         """
@@ -0,0 +1,151 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from core.logger import logger
+
+
+class PoolConexoes:
+    """
+    Conexões SQLite reaproveitadas entre chamadas, com no máximo `tamanho` abertas.
+
+    Cada empréstimo é um context manager: commit ao sair, rollback em exceção. Blocos
+    aninhados na mesma thread recebem a mesma conexão (e a mesma transação), então uma
+    função do banco pode chamar outra sem esgotar o pool; o bloco aninhado vira um
+    SAVEPOINT, desfeito sozinho em exceção. Commit e rollback são só do pool: as funções
+    do banco nunca chamam conn.commit(), senão encerrariam a transação do bloco externo.
+    Manter as conexões abertas também preserva o cache de statements preparados do sqlite3.
+    """
+
+    def __init__(self, abrir, tamanho=4, timeout_espera=30):
+        self._abrir = abrir
+        self.timeout_espera = timeout_espera
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(max(1, tamanho))
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._fechado = False
+        self._stats = {"abertas": 0, "em_uso": 0, "pico_em_uso": 0, "emprestimos": 0,
+                       "espera_total": 0.0, "uso_total": 0.0, "uso_max": 0.0}
+
+    def _pegar(self):
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.timeout_espera):
+            raise TimeoutError(f"Nenhuma conexão SQLite livre em {self.timeout_espera:.0f}s")
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._abrir()
+            except BaseException:
+                self._vagas.release()
+                raise
+            with self._trava:
+                self._stats["abertas"] += 1
+
+        with self._trava:
+            self._stats["emprestimos"] += 1
+            self._stats["espera_total"] += time.monotonic() - inicio
+            self._stats["em_uso"] += 1
+            self._stats["pico_em_uso"] = max(self._stats["pico_em_uso"], self._stats["em_uso"])
+        return conn
+
+    def _devolver(self, conn, uso):
+        with self._trava:
+            self._stats["em_uso"] -= 1
+            self._stats["uso_total"] += uso
+            self._stats["uso_max"] = max(self._stats["uso_max"], uso)
+            fechar = self._fechado
+            if fechar:
+                self._stats["abertas"] -= 1
+        if fechar:
+            conn.close()
+        else:
+            self._livres.put(conn)
+        self._vagas.release()
+
+    @contextmanager
+    def conexao(self, imediata=False):
+        """
+        Empresta uma conexão. Com `imediata`, abre a transação com BEGIN IMMEDIATE
+        (trava de escrita desde o início, para leitura seguida de escrita atômica).
+        """
+        atual = getattr(self._local, "conn", None)
+        if atual is not None:
+            # Reentrante: o bloco externo é quem faz commit/rollback; este escopo é um SAVEPOINT
+            if imediata and not atual.in_transaction:
+                atual.execute("BEGIN IMMEDIATE")
+            profundidade = getattr(self._local, "profundidade", 0) + 1
+            self._local.profundidade = profundidade
+            nome = f"aninhado_{profundidade}"
+            atual.execute(f"SAVEPOINT {nome}")
+            try:
+                yield atual
+            except BaseException:
+                # Alguns erros do SQLite já desfazem a transação inteira (e o savepoint junto)
+                if atual.in_transaction:
+                    atual.execute(f"ROLLBACK TO {nome}")
+                    atual.execute(f"RELEASE {nome}")
+                raise
+            else:
+                atual.execute(f"RELEASE {nome}")
+            finally:
+                self._local.profundidade = profundidade - 1
+            return
+
+        conn = self._pegar()
+        self._local.conn = conn
+        inicio = time.monotonic()
+        try:
+            if imediata:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._devolver(conn, time.monotonic() - inicio)
+
+    def estatisticas(self):
+        """Conexões abertas/em uso, empréstimos e latências médias (ms)."""
+        with self._trava:
+            s = dict(self._stats)
+        emprestimos = max(1, s["emprestimos"])
+        return {
+            "abertas": s["abertas"],
+            "em_uso": s["em_uso"],
+            "pico_em_uso": s["pico_em_uso"],
+            "emprestimos": s["emprestimos"],
+            "espera_media_ms": s["espera_total"] / emprestimos * 1000,
+            "uso_medio_ms": s["uso_total"] / emprestimos * 1000,
+            "uso_max_ms": s["uso_max"] * 1000,
+        }
+
+    def fechar(self):
+        """Fecha as conexões ociosas; as emprestadas são fechadas ao voltar."""
+        with self._trava:
+            self._fechado = True
+        fechadas = 0
+        while True:
+            try:
+                self._livres.get_nowait().close()
+                fechadas += 1
+            except queue.Empty:
+                break
+        with self._trava:
+            self._stats["abertas"] -= fechadas
+        if fechadas:
+            logger.info(f"🔒 {fechadas} conexão(ões) SQLite fechada(s).")
+
+
+def criar_pool(abrir, **kwargs):
+    """Cria o pool de conexões e garante o fechamento na saída do processo."""
+    pool = PoolConexoes(abrir, **kwargs)
+    atexit.register(pool.fechar)
+    return pool
@@ -1,67 +1,141 @@
+import threading
 import time
+from contextlib import closing
 
-import services.scrapers as scrapers_module
 from core.config import Config
-from core.database import inicializar_db, salvar_boleto_db
-from services.gmail_service import buscar_faturas_email
-from services.notification_service import enviar_notificacao_fatura, bot
+from core.database import inicializar_db, salvar_boletos_em_lote, estatisticas_db
+from services.agendador_service import iniciar_agendador, registrar_execucoes
+from services.coleta_service import coletar_em_paralelo, montar_fontes, registrar_relatorio
+from services.fila_planilha_service import iniciar_fila_planilha
+from services.notification_service import enviar_notificacao_fatura, enviar_boletos_agrupados, fila_envio, bot
+from services.paginacao_service import invalidar_paginas
 from utils.helpers import exibir_resultado_extracao, logger
+from utils.parser_pdf import estatisticas_cache_pdf
 
+_trava_ciclo = threading.Lock()
 
-def executar_ciclo_coleta(solicitante_id=None):
+
+def executar_ciclo_coleta(solicitante_id=None, fontes=None, progresso=None):
     """
-    Orquestra a busca de boletos: varre Gmail, executa scrapers web,
-    salva no banco de dados e notifica o usuário no Telegram.
+    Orquestra a busca de boletos: varre as labels do Gmail e os scrapers web
+    em paralelo, salva no banco de dados e notifica o usuário no Telegram
+    à medida que cada fonte termina.
+
+    `fontes` permite restringir o ciclo a um subconjunto (nomes de labels/scrapers).
+    `progresso` (services.tarefas_service.Progresso) recebe uma etapa por fonte concluída.
+    Retorna os ResultadoFonte do ciclo (lista vazia se ele falhar).
     """
+    # Busca manual e agendador não rodam ciclos ao mesmo tempo (mesmas fontes, mesmo navegador)
+    with _trava_ciclo:
+        return _executar_ciclo(solicitante_id, fontes, progresso)
+
+
+def _executar_ciclo(solicitante_id, fontes, progresso):
+    # No modo agrupado os boletos novos são enviados juntos ao fim do ciclo (mesmo se ele falhar)
+    agrupar = Config.NOTIFICACAO_MODO == "agrupado"
+    novos_ciclo = []
     try:
         # 1. Garante que o banco de dados e tabelas existam
         inicializar_db()
         logger.info("🚀 Iniciando ciclo de coleta de faturas...")
+        inicio = time.monotonic()
+        resultados = []
+        total_novos = 0
+        lista_fontes = montar_fontes(fontes)
+
+        # 2. Gmail (uma fonte por label) e scrapers rodam num pool limitado,
+        #    cada um com seu próprio prazo; os resultados chegam conforme terminam
+        # closing: se o ciclo falhar no meio, o coletor descarta as pendências das fontes restantes
+        with closing(coletar_em_paralelo(lista_fontes)) as coleta:
+            for resultado in coleta:
+                resultados.append(resultado)
 
-        # 2. Busca faturas no Gmail (PDFs e links)
-        lista_faturas = buscar_faturas_email()
-        # lista_faturas = []
+                # 3. Processamento dos resultados parciais da fonte
+                for fatura in resultado.boletos:
+                    # Exibe no console/logs para monitoramento
+                    exibir_resultado_extracao(fatura)
 
-        # 3. Executa Scrapers Web configurados no .env
-        if Config.LISTA_FUNCOES_SCRAPERS:
-            for nome_funcao in Config.LISTA_FUNCOES_SCRAPERS:
+                # Salva os boletos da fonte numa única transação; só os inéditos recebem id.
+                # A marca d'água/Message-IDs da fonte só são confirmados depois de salvos.
                 try:
-                    funcao_alvo = getattr(scrapers_module, nome_funcao, None)
-                    if funcao_alvo and callable(funcao_alvo):
-                        logger.info(f"🔎 Rodando scraper: {nome_funcao}")
-                        resultado = funcao_alvo()
-                        if resultado:
-                            lista_faturas.append(resultado)
-                except Exception as e:
-                    logger.error(f"❌ Erro ao executar scraper {nome_funcao}: {e}")
-
-        # 4. Processamento de Resultados
-        if not lista_faturas:
-            logger.info("Empty: Nenhum boleto novo encontrado.")
-        else:
-            for fatura in lista_faturas:
-                # Exibe no console/logs para monitoramento
-                exibir_resultado_extracao(fatura)
+                    novos = {id(b) for b in salvar_boletos_em_lote(resultado.boletos)}
+                except Exception:
+                    if resultado.pendencia:
+                        resultado.pendencia.descartar()
+                    raise
+                if resultado.pendencia:
+                    resultado.pendencia.confirmar()
+                if novos:
+                    invalidar_paginas("pendentes")
+                for fatura in resultado.boletos:
+                    if id(fatura) in novos and agrupar:
+                        novos_ciclo.append(fatura)
+                    elif id(fatura) in novos:
+                        enviar_notificacao_fatura(fatura, target_user=solicitante_id)
+                    else:
+                        logger.info(f"⏭️ Ignorando duplicata: {fatura.titulo}")
 
-                # Salva no banco (retorna True se for um boleto novo/inédito)
-                if salvar_boleto_db(fatura):
-                    enviar_notificacao_fatura(fatura, target_user=solicitante_id)
-                else:
-                    logger.info(f"⏭️ Ignorando duplicata: {fatura.titulo}")
+                total_novos += len(novos)
+                if progresso:
+                    icone = "✅" if resultado.status == "ok" else ("⏰" if resultado.status == "timeout" else "❌")
+                    progresso.etapa(f"{icone} {resultado.nome}: {len(novos)} novo(s) "
+                                    f"({len(resultados)}/{len(lista_fontes)})")
 
+        if not any(r.boletos for r in resultados):
+            logger.info("Empty: Nenhum boleto novo encontrado.")
+
+        enviar_boletos_agrupados(novos_ciclo, target_user=solicitante_id)
+        novos_ciclo = []
+        registrar_relatorio(resultados, time.monotonic() - inicio)
+        registrar_execucoes(resultados)
+        cache = estatisticas_cache_pdf()
+        logger.info(f"🗂️ Cache de PDFs: {cache['acertos']} acerto(s), {cache['falhas']} falha(s), "
+                    f"{cache['entradas']} entrada(s).")
+        db = estatisticas_db()
+        logger.info(f"🗄️ SQLite: {db['abertas']} conexão(ões) aberta(s) (pico {db['pico_em_uso']} em uso), "
+                    f"{db['emprestimos']} empréstimo(s), espera média {db['espera_media_ms']:.1f} ms, "
+                    f"uso médio {db['uso_medio_ms']:.1f} ms.")
+        envio = fila_envio.metricas()
+        logger.info(f"📤 Fila do Telegram: {envio['profundidade']} pendente(s), p95 {envio['p95_ms']:.0f} ms, "
+                    f"{envio['limitados_429']} 429, {envio['falhas']} falha(s).")
         logger.info("✅ Ciclo de coleta finalizado.")
+        if progresso:
+            progresso.concluir(
+                rodape=f"✅ Busca finalizada: {total_novos} boleto(s) novo(s) em {time.monotonic() - inicio:.0f}s.")
+        return resultados
 
     except Exception as e:
         logger.error(f"💥 Erro crítico no ciclo de coleta: {e}")
+        enviar_boletos_agrupados(novos_ciclo, target_user=solicitante_id)
+        if progresso:
+            progresso.falhar("❌ Erro ao realizar busca.")
+        return []
 
 
 if __name__ == "__main__":
     inicializar_db()
+    # Escritas na planilha pendentes (inclusive de antes de um reinício) seguem em segundo plano
+    iniciar_fila_planilha()
+    if Config.AGENDADOR_ATIVO:
+        iniciar_agendador()
     logger.info("🤖 BoletoBot Online e aguardando comandos...")
 
+    if Config.BOT_MODO == "webhook":
+        # Bloqueia enquanto o servidor estiver no ar; se não subir, cai no polling
+        from services.webhook_service import iniciar_webhook
+        if iniciar_webhook():
+            raise SystemExit(0)
+        logger.warning("⚠️ Webhook indisponível; seguindo com polling.")
+
+    # getUpdates é recusado enquanto houver webhook registrado (ex: troca de modo)
+    try:
+        bot.remove_webhook()
+    except Exception as e:
+        logger.warning(f"⚠️ Não foi possível remover o webhook: {e}")
+
     while True:
         try:
             bot.polling(non_stop=True, interval=2, timeout=60)
         except Exception as e:
             logger.error(f"⚠️ Erro no polling detectado: {e}. Tentando reconectar em 15s...")
-            time.sleep(15)
\ No newline at end of file
+            time.sleep(15)
@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from statistics import median
+
+from core.config import Config
+from core.database import obter_agenda_coleta, salvar_agenda_coleta, historico_entregas
+from core.logger import logger
+from services.coleta_service import montar_fontes
+
+# Primeira nova tentativa após falha; dobra a cada falha seguida até o intervalo da fonte
+ATRASO_FALHA = 600
+ATRASO_MINIMO = 60
+
+_trava = threading.Lock()
+_estado = {"thread": None}
+
+
+def _intervalo_base(nome):
+    return Config.AGENDA_INTERVALOS.get(nome, Config.AGENDA_INTERVALO_PADRAO)
+
+
+def _com_jitter(segundos):
+    return segundos * random.uniform(1 - Config.AGENDA_JITTER, 1 + Config.AGENDA_JITTER)
+
+
+def _mes_seguinte(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def _janela(ano, mes, dia):
+    """(início, fim) da janela em torno do dia esperado no mês informado."""
+    centro = datetime(ano, mes, min(dia, monthrange(ano, mes)[1]))
+    folga = timedelta(days=Config.AGENDA_JANELA_DIAS)
+    return centro - folga, centro + folga + timedelta(days=1)
+
+
+def expectativa_entrega(origem, hoje=None):
+    """
+    Lê o histórico de boletos da origem e devolve (dia_esperado, entregue_no_mes):
+    - dia_esperado: mediana do dia do mês em que os boletos chegaram (None com menos de 2 entregas);
+    - entregue_no_mes: já chegou boleto neste mês (pela data de identificação ou pelo mês de referência).
+    """
+    if not origem:
+        return None, False
+    hoje = hoje or date.today()
+    mes_atual = hoje.strftime("%m/%Y")
+
+    dias, entregue = [], False
+    for data_identificacao, mes_referencia in historico_entregas(origem):
+        try:
+            quando = datetime.strptime(str(data_identificacao)[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        dias.append(quando.day)
+        if (quando.year, quando.month) == (hoje.year, hoje.month) or mes_referencia == mes_atual:
+            entregue = True
+
+    dia = int(median(dias)) if len(dias) >= 2 else None
+    return dia, entregue
+
+
+def calcular_proxima(fonte, status="ok", falhas=0, agora=None):
+    """
+    Decide quando a fonte roda de novo. Retorna (timestamp, motivo).
+
+    - falhou: nova tentativa com backoff (10 min, 20 min, ...) até o intervalo da fonte;
+    - conta do mês já entregue: fontes baratas rodam uma vez por dia, as caras só na
+      janela do mês seguinte;
+    - dentro da janela do dia esperado: AGENDA_INTERVALO_JANELA;
+    - fora dela: o intervalo da fonte, sem passar do início da próxima janela
+      (fontes caras simplesmente esperam a janela);
+    - sem histórico: o intervalo da fonte.
+    """
+    agora = agora or datetime.now()
+    base = _intervalo_base(fonte.nome)
+
+    if status != "ok" and falhas:
+        atraso = min(base, ATRASO_FALHA * 2 ** (falhas - 1))
+        motivo = f"{falhas} falha(s) seguida(s)"
+    else:
+        dia, entregue = expectativa_entrega(fonte.origem, agora.date())
+        atual = _janela(agora.year, agora.month, dia) if dia else None
+        seguinte = _janela(*_mes_seguinte(agora.year, agora.month), dia) if dia else None
+
+        if entregue:
+            atraso = max(base, Config.AGENDA_INTERVALO_ENTREGUE)
+            motivo = "conta do mês já entregue"
+            if fonte.cara and seguinte and seguinte[0] > agora:
+                atraso = (seguinte[0] - agora).total_seconds()
+                motivo += f"; volta na janela do dia {dia}"
+        elif dia and any(inicio <= agora < fim for inicio, fim in (atual, seguinte)):
+            atraso = Config.AGENDA_INTERVALO_JANELA
+            motivo = f"janela do dia {dia}"
+        elif dia:
+            inicio = atual[0] if atual[0] > agora else seguinte[0]
+            espera = (inicio - agora).total_seconds()
+            atraso = espera if fonte.cara else min(base, espera)
+            motivo = f"fora da janela do dia {dia}"
+        else:
+            atraso = base
+            motivo = "sem histórico de entregas"
+
+    return time.time() + max(ATRASO_MINIMO, _com_jitter(atraso)), motivo
+
+
+def registrar_execucoes(resultados):
+    """Reagenda as fontes que acabaram de rodar (chamado ao fim de todo ciclo, manual ou agendado)."""
+    fontes = {f.nome: f for f in montar_fontes()}
+    agenda = obter_agenda_coleta()
+
+    for resultado in resultados:
+        fonte = fontes.get(resultado.nome)
+        if not fonte:
+            continue
+        anterior = agenda.get(fonte.nome)
+        falhas = 0 if resultado.status == "ok" else (anterior['falhas_seguidas'] if anterior else 0) + 1
+        proxima, motivo = calcular_proxima(fonte, resultado.status, falhas)
+        salvar_agenda_coleta(fonte.nome, proxima, resultado.status, falhas, motivo)
+        logger.info(f"🗓️ {fonte.nome}: próxima execução em {(proxima - time.time()) / 3600:.1f}h ({motivo}).")
+
+
+def executar_agenda():
+    """Roda um ciclo com as fontes vencidas. Retorna os nomes executados."""
+    agora = time.time()
+    agenda = obter_agenda_coleta()
+    vencidas = []
+
+    for fonte in montar_fontes():
+        registro = agenda.get(fonte.nome)
+        if registro is None and fonte.cara:
+            # Fonte cara ainda sem agenda: não gasta captcha na subida, entra direto no calendário
+            proxima, motivo = calcular_proxima(fonte)
+            salvar_agenda_coleta(fonte.nome, proxima, motivo=motivo, executou=False)
+            continue
+        if registro is None or registro['proxima_execucao'] <= agora:
+            vencidas.append(fonte.nome)
+            # Reserva provisória: se o ciclo cair no meio, a fonte não volta a cada verificação
+            falhas = registro['falhas_seguidas'] if registro else 0
+            salvar_agenda_coleta(fonte.nome, agora + Config.AGENDA_INTERVALO_JANELA, falhas_seguidas=falhas,
+                                 motivo="em execução", executou=False)
+
+    if vencidas:
+        logger.info(f"⏰ Agendador: {len(vencidas)} fonte(s) vencida(s): {', '.join(vencidas)}")
+        # Import local para evitar Circular Import
+        from main import executar_ciclo_coleta
+        executar_ciclo_coleta(fontes=vencidas)
+    return vencidas
+
+
+def _loop_agendador():
+    while True:
+        try:
+            executar_agenda()
+        except Exception as e:
+            logger.error(f"💥 Erro no agendador de coleta: {e}")
+        time.sleep(Config.AGENDA_VERIFICACAO)
+
+
+def iniciar_agendador():
+    """Sobe a thread do agendador (uma por processo)."""
+    with _trava:
+        if _estado["thread"] is not None:
+            return
+        _estado["thread"] = threading.Thread(target=_loop_agendador, name="agendador", daemon=True)
+        _estado["thread"].start()
+        logger.info("🗓️ Agendador de coleta ativo.")
@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import services.scrapers as scrapers_module
+from core.config import Config
+from core.logger import logger
+from services.gmail_service import buscar_faturas_label
+
+
+@dataclass
+class Fonte:
+    """
+    Uma origem de boletos (label do Gmail ou scraper) executável pelo coletor.
+    `executar` retorna (boletos, pendencia); a pendência (ou None) tem confirmar()/descartar()
+    e só é confirmada depois que os boletos forem salvos.
+    """
+    nome: str
+    executar: Callable[[threading.Event], tuple]
+    timeout: float
+    pesada: bool = False  # Abre navegador: limitada por Config.MAX_FONTES_PESADAS
+    origem: Optional[str] = None  # Valor de `origem` nos boletos que a fonte produz
+    cara: bool = False  # Custa dinheiro por execução (captcha): o agendador só roda quando há conta esperada
+
+
+@dataclass
+class ResultadoFonte:
+    """Resultado parcial de uma fonte, entregue assim que ela termina (ou estoura o prazo)."""
+    nome: str
+    status: str  # "ok", "erro" ou "timeout"
+    boletos: List = field(default_factory=list)
+    duracao: float = 0.0
+    erro: Optional[str] = None
+    pendencia: Optional[object] = None  # ex: services.gmail_service.SincronizacaoLabel
+
+
+def _timeout_da_fonte(nome):
+    return Config.TIMEOUTS_FONTES.get(nome, Config.TIMEOUT_FONTE_PADRAO)
+
+
+def _fonte_gmail(label):
+    return Fonte(
+        nome=label,
+        executar=lambda cancelamento: buscar_faturas_label(label, cancelamento=cancelamento),
+        timeout=_timeout_da_fonte(label),
+        origem=label,
+    )
+
+
+def _fonte_scraper(nome_funcao, funcao_alvo):
+    def executar(cancelamento):
+        resultado = funcao_alvo()
+        return ([resultado] if resultado else []), None
+
+    # Só conta como "pesada" quem sempre abre navegador; no modo auto o pool de navegadores
+    # já limita o fallback
+    pesada = scrapers_module.modo_scraper(nome_funcao) == "selenium"
+    return Fonte(nome=nome_funcao, executar=executar, timeout=_timeout_da_fonte(nome_funcao), pesada=pesada,
+                 origem=scrapers_module.ORIGENS_SCRAPERS.get(nome_funcao),
+                 cara=nome_funcao in scrapers_module.SCRAPERS_COM_CAPTCHA)
+
+
+def montar_fontes(nomes=None):
+    """
+    Monta a lista de fontes a partir do .env (labels + scrapers ativos).
+    Se `nomes` for informado, mantém apenas as fontes com esses nomes.
+    """
+    fontes = [_fonte_gmail(label) for label in Config.LABELS_INTERESSE]
+
+    for nome_funcao in Config.LISTA_FUNCOES_SCRAPERS:
+        funcao_alvo = getattr(scrapers_module, nome_funcao, None)
+        if funcao_alvo and callable(funcao_alvo):
+            fontes.append(_fonte_scraper(nome_funcao, funcao_alvo))
+        else:
+            logger.warning(f"⚠️ Scraper '{nome_funcao}' não encontrado em services.scrapers.")
+
+    if nomes is not None:
+        fontes = [f for f in fontes if f.nome in nomes]
+    return fontes
+
+
+def _descartar_pendencia(futuro):
+    """Callback de fontes abandonadas: libera a pendência que elas devolverem ao terminar."""
+    if futuro.cancelled() or futuro.exception() is not None:
+        return
+    _, pendencia = futuro.result()
+    if pendencia is not None:
+        pendencia.descartar()
+
+
+def coletar_em_paralelo(fontes, max_workers=None):
+    """
+    Executa as fontes num pool limitado de threads e entrega (yield) cada
+    ResultadoFonte assim que a fonte termina.
+
+    Cada fonte tem seu próprio prazo, contado a partir do momento em que começa
+    a rodar. Ao estourar, o evento de cancelamento da fonte é disparado (as fontes
+    cooperativas param sozinhas) e o ciclo segue sem esperar por ela; a pendência
+    que ela devolver depois é descartada, para nada ser dado como processado sem ter
+    sido salvo.
+    """
+    if not fontes:
+        return
+
+    max_workers = max_workers or Config.MAX_WORKERS_COLETA
+    semaforo_pesadas = threading.Semaphore(Config.MAX_FONTES_PESADAS)
+    cancelamentos = {f.nome: threading.Event() for f in fontes}
+    inicios = {}
+
+    def _rodar(fonte):
+        cancelamento = cancelamentos[fonte.nome]
+        with semaforo_pesadas if fonte.pesada else nullcontext():
+            if cancelamento.is_set():
+                return [], None
+            inicios[fonte.nome] = time.monotonic()
+            return fonte.executar(cancelamento)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coleta")
+    futuros = {executor.submit(_rodar, f): f for f in fontes}
+    limite_ciclo = time.monotonic() + Config.TIMEOUT_CICLO
+
+    try:
+        while futuros:
+            prontos, _ = wait(futuros, timeout=0.5, return_when=FIRST_COMPLETED)
+            agora = time.monotonic()
+
+            for futuro in prontos:
+                fonte = futuros.pop(futuro)
+                duracao = agora - inicios.get(fonte.nome, agora)
+                try:
+                    boletos, pendencia = futuro.result()
+                except Exception as e:
+                    logger.error(f"❌ Erro na fonte {fonte.nome}: {e}")
+                    yield ResultadoFonte(fonte.nome, "erro", duracao=duracao, erro=str(e))
+                else:
+                    yield ResultadoFonte(fonte.nome, "ok", boletos or [], duracao, pendencia=pendencia)
+
+            for futuro, fonte in list(futuros.items()):
+                inicio = inicios.get(fonte.nome)
+                estourou_fonte = inicio is not None and agora - inicio > fonte.timeout
+                if estourou_fonte or agora > limite_ciclo:
+                    cancelamentos[fonte.nome].set()
+                    if not futuro.cancel():
+                        # Ainda rodando: o que ela entregar depois é descartado, nunca confirmado
+                        futuro.add_done_callback(_descartar_pendencia)
+                    del futuros[futuro]
+                    motivo = "prazo da fonte" if estourou_fonte else "prazo do ciclo"
+                    logger.warning(f"⏰ Fonte {fonte.nome} cancelada ({motivo}).")
+                    yield ResultadoFonte(fonte.nome, "timeout", duracao=agora - (inicio or agora), erro=motivo)
+    finally:
+        # Sinaliza qualquer fonte remanescente e libera o ciclo sem aguardar threads presas
+        for cancelamento in cancelamentos.values():
+            cancelamento.set()
+        for futuro in futuros:
+            futuro.add_done_callback(_descartar_pendencia)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def registrar_relatorio(resultados, duracao_total):
+    """Loga o tempo de cada fonte ao final do ciclo, da mais lenta para a mais rápida."""
+    logger.info(f"⏱️ Relatório do ciclo ({duracao_total:.1f}s no total):")
+    for r in sorted(resultados, key=lambda r: r.duracao, reverse=True):
+        icone = {"ok": "✅", "erro": "❌", "timeout": "⏰"}.get(r.status, "•")
+        detalhe = f" ({r.erro})" if r.erro else ""
+        logger.info(f"   {icone} {r.nome:<35} {r.duracao:7.1f}s  {len(r.boletos)} boleto(s){detalhe}")
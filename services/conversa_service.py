@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+from core.config import Config
+from core.database import obter_conversa, salvar_conversa, apagar_conversa
+
+# Marca no LRU para "sabidamente sem conversa": evita ir ao SQLite a cada mensagem comum
+_SEM_CONVERSA = object()
+
+
+class EstadoConversas:
+    """
+    Estado das conversas guiadas por (chat, usuário), gravado no SQLite (sobrevive a
+    reinícios) com um LRU limitado na frente. Cada passo renova a validade; conversas
+    abandonadas expiram após `ttl` segundos.
+    """
+
+    def __init__(self, ttl, max_em_memoria):
+        self.ttl = ttl
+        self.max_em_memoria = max_em_memoria
+        self._lru = OrderedDict()
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def _chave(chat_id, user_id):
+        return f"{chat_id}:{user_id}"
+
+    def _lembrar(self, chave, valor):
+        with self._trava:
+            self._lru[chave] = valor
+            self._lru.move_to_end(chave)
+            while len(self._lru) > self.max_em_memoria:
+                self._lru.popitem(last=False)
+
+    def obter(self, chat_id, user_id):
+        """(estado, dados) da conversa ativa, ou None."""
+        chave = self._chave(chat_id, user_id)
+        with self._trava:
+            item = self._lru.get(chave)
+        if item is None:
+            item = obter_conversa(chave) or _SEM_CONVERSA
+            self._lembrar(chave, item)
+        if item is _SEM_CONVERSA:
+            return None
+        estado, dados, expira_em = item
+        if expira_em <= time.time():
+            self.encerrar(chat_id, user_id)
+            return None
+        return estado, dict(dados)
+
+    def definir(self, chat_id, user_id, estado, dados):
+        """Avança a conversa para `estado`, guardando `dados` (serializáveis em JSON)."""
+        chave = self._chave(chat_id, user_id)
+        expira_em = time.time() + self.ttl
+        salvar_conversa(chave, estado, dados, expira_em)
+        self._lembrar(chave, (estado, dict(dados), expira_em))
+
+    def encerrar(self, chat_id, user_id):
+        chave = self._chave(chat_id, user_id)
+        apagar_conversa(chave)
+        self._lembrar(chave, _SEM_CONVERSA)
+
+
+conversas = EstadoConversas(Config.CONVERSA_TTL, Config.CONVERSAS_EM_MEMORIA)
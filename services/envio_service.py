@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+from core.config import Config
+from core.logger import logger
+
+# Falhas de conexão (o pedido não chegou) ou do lado do Telegram (5xx) valem nova tentativa.
+# Um timeout de leitura não: o Telegram pode ter entregue, e repetir duplicaria a mensagem
+# (só edições, que são idempotentes, são repetidas nesse caso).
+ERROS_CONEXAO = (requests.exceptions.ConnectionError,)
+ERROS_TIMEOUT = (requests.exceptions.Timeout, TimeoutError)
+AMOSTRAS_LATENCIA = 500
+
+
+class BaldeTokens:
+    """Token bucket: `taxa` fichas por segundo, acumulando até `capacidade`."""
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._fichas = float(capacidade)
+        self._atualizado = time.monotonic()
+
+    def _repor(self, agora):
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def espera(self, agora):
+        """Segundos até haver uma ficha (0 se já houver)."""
+        self._repor(agora)
+        return 0.0 if self._fichas >= 1 else (1 - self._fichas) / self.taxa
+
+    def consumir(self, agora):
+        self._repor(agora)
+        self._fichas -= 1
+
+
+class _Envio:
+    __slots__ = ("chat_id", "metodo", "args", "kwargs", "futuro", "criado", "tentativas")
+
+    def __init__(self, chat_id, metodo, args, kwargs):
+        self.chat_id = chat_id
+        self.metodo = metodo
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = Future()
+        self.criado = time.monotonic()
+        self.tentativas = 0
+
+
+class FilaEnvio:
+    """
+    Fila central de saída para o Telegram.
+
+    Cada chat tem sua própria fila (a ordem das mensagens de um chat é mantida: só uma
+    chamada por chat fica em voo e o item só sai da fila quando é entregue). Um balde
+    global e um por chat seguram o ritmo dentro dos limites do Telegram; um 429 pausa
+    o chat pelo `retry_after` informado e falhas transitórias são repetidas com backoff.
+
+    Os métodos espelham os do TeleBot e devolvem um Future com o retorno da API.
+    """
+
+    def __init__(self, bot, workers=2, taxa_global=30, taxa_chat=1, rajada_chat=3, taxa_grupo=20 / 60,
+                 max_tentativas=5):
+        self.bot = bot
+        self.workers = workers
+        self.taxa_chat = taxa_chat
+        self.rajada_chat = rajada_chat
+        self.taxa_grupo = taxa_grupo
+        self.max_tentativas = max_tentativas
+        self._global = BaldeTokens(taxa_global, taxa_global)
+        self._baldes = {}
+        self._filas = OrderedDict()
+        self._em_voo = set()
+        self._pausas = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._contadores = {"enviados": 0, "retentativas": 0, "limitados_429": 0, "falhas": 0}
+
+    # --- API (espelha o TeleBot) ---
+    def send_message(self, chat_id, *args, **kwargs):
+        return self._enfileirar(chat_id, "send_message", (chat_id,) + args, kwargs)
+
+    def edit_message_text(self, texto, chat_id, message_id, **kwargs):
+        return self._enfileirar(chat_id, "edit_message_text", (texto, chat_id, message_id), kwargs)
+
+    def edit_message_reply_markup(self, chat_id, message_id, **kwargs):
+        return self._enfileirar(chat_id, "edit_message_reply_markup", (chat_id, message_id), kwargs)
+
+    def _enfileirar(self, chat_id, metodo, args, kwargs):
+        envio = _Envio(chat_id, metodo, args, kwargs)
+        with self._cond:
+            self._iniciar()
+            self._filas.setdefault(chat_id, deque()).append(envio)
+            self._cond.notify()
+        return envio.futuro
+
+    # --- DESPACHO ---
+    def _iniciar(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"envio-telegram-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _balde(self, chat_id):
+        if chat_id not in self._baldes:
+            # IDs negativos são grupos: o Telegram limita a ~20 mensagens por minuto
+            grupo = isinstance(chat_id, int) and chat_id < 0
+            self._baldes[chat_id] = (BaldeTokens(self.taxa_grupo, 1) if grupo
+                                     else BaldeTokens(self.taxa_chat, self.rajada_chat))
+        return self._baldes[chat_id]
+
+    def _proximo(self):
+        """Próximo envio liberado (ou None) e quanto esperar se nada estiver liberado."""
+        agora = time.monotonic()
+        menor_espera = None
+        for chat_id, fila in self._filas.items():
+            if chat_id in self._em_voo:
+                continue
+            balde = self._balde(chat_id)
+            espera = max(self._pausas.get(chat_id, 0) - agora, balde.espera(agora), self._global.espera(agora))
+            if espera <= 0:
+                balde.consumir(agora)
+                self._global.consumir(agora)
+                self._em_voo.add(chat_id)
+                # Rodízio: o chat atendido vai para o fim, para nenhum monopolizar o ritmo global
+                self._filas.move_to_end(chat_id)
+                return fila[0], None
+            menor_espera = espera if menor_espera is None else min(menor_espera, espera)
+        return None, menor_espera
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                envio, espera = self._proximo()
+                while envio is None:
+                    self._cond.wait(espera)
+                    envio, espera = self._proximo()
+            self._executar(envio)
+
+    def _executar(self, envio):
+        atraso, resultado, erro, limitado = None, None, None, False
+        try:
+            resultado = getattr(self.bot, envio.metodo)(*envio.args, **envio.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                atraso = float((e.result_json.get("parameters") or {}).get("retry_after", 5))
+                limitado = True
+                logger.warning(f"🚦 Telegram pediu {atraso:.0f}s de pausa no chat {envio.chat_id}.")
+            elif e.error_code >= 500:
+                atraso = self._backoff(envio)
+                if atraso is None:
+                    erro = e
+            elif "message is not modified" in str(e.description):
+                pass  # Edição idêntica: para o usuário, já está entregue
+            else:
+                erro = e
+        except ERROS_CONEXAO as e:
+            atraso = self._backoff(envio)
+            if atraso is None:
+                erro = e
+        except ERROS_TIMEOUT as e:
+            atraso = self._backoff(envio) if envio.metodo.startswith("edit_") else None
+            if atraso is None:
+                erro = e
+        except Exception as e:
+            erro = e
+
+        with self._cond:
+            self._em_voo.discard(envio.chat_id)
+            if limitado:
+                self._contadores["limitados_429"] += 1
+            if atraso is not None:
+                # Continua na cabeça da fila do chat: nada passa na frente dele
+                self._pausas[envio.chat_id] = time.monotonic() + atraso
+                self._contadores["retentativas"] += 1
+            else:
+                fila = self._filas[envio.chat_id]
+                fila.popleft()
+                if not fila:
+                    del self._filas[envio.chat_id]
+                    self._pausas.pop(envio.chat_id, None)
+                self._latencias.append(time.monotonic() - envio.criado)
+                self._contadores["falhas" if erro else "enviados"] += 1
+            self._cond.notify_all()
+
+        if atraso is not None:
+            return
+        if erro:
+            logger.error(f"❌ Falha ao enviar ({envio.metodo}) para {envio.chat_id}: {erro}")
+            envio.futuro.set_exception(erro)
+        else:
+            envio.futuro.set_result(resultado)
+
+    def _backoff(self, envio):
+        """Atraso da próxima tentativa (1s, 2s, 4s...) ou None se esgotou as tentativas."""
+        envio.tentativas += 1
+        if envio.tentativas >= self.max_tentativas:
+            return None
+        return float(2 ** (envio.tentativas - 1))
+
+    # --- MÉTRICAS ---
+    def metricas(self):
+        """Profundidade da fila, latência (enfileirado -> entregue) e contadores."""
+        with self._cond:
+            latencias = sorted(self._latencias)
+            profundidade = sum(len(f) for f in self._filas.values())
+            chats = len(self._filas)
+            contadores = dict(self._contadores)
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0.0
+
+        return {"profundidade": profundidade, "chats_na_fila": chats, "p50_ms": percentil(0.50),
+                "p95_ms": percentil(0.95), "max_ms": latencias[-1] * 1000 if latencias else 0.0, **contadores}
+
+
+def criar_fila_envio(bot):
+    return FilaEnvio(bot, workers=Config.ENVIO_WORKERS, taxa_global=Config.ENVIO_TAXA_GLOBAL,
+                     taxa_chat=Config.ENVIO_TAXA_CHAT, rajada_chat=Config.ENVIO_RAJADA_CHAT,
+                     max_tentativas=Config.ENVIO_MAX_TENTATIVAS)
@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+
+import gspread
+import requests
+
+from core.config import Config
+from core.database import (enfileirar_escrita, reservar_escritas, concluir_escritas, reagendar_escrita,
+                           recuperar_fila_escrita)
+from core.logger import logger
+from services.paginacao_service import invalidar_paginas
+from services.sheets_service import LoteEscrita, conectar_sheets, preparar_provisionamento, gravar_gasto
+
+# Erros de rede valem nova tentativa; da API do Google, só cota (429) e instabilidade (5xx).
+# 400/403/404 (intervalo inválido, permissão perdida, aba apagada) falham na hora.
+ERROS_REDE = (requests.exceptions.RequestException, ConnectionError, TimeoutError)
+
+_acordar = threading.Event()
+_estado = {"thread": None}
+_trava = threading.Lock()
+
+
+# --- ENFILEIRAMENTO (chamado pelos handlers do Telegram) ---
+def enfileirar_provisionamento(origem, valor, mes_referencia, chat_id=None, message_id=None,
+                               texto_sucesso=None, teclado=None):
+    """
+    Agenda a atualização de uma conta fixa. Provisionamentos da mesma conta no mesmo mês
+    são coalescidos: só o mais recente vai para a planilha.
+    """
+    dados = {"origem": origem, "valor": valor, "texto_sucesso": texto_sucesso, "teclado": teclado}
+    id_item = enfileirar_escrita("provisionamento", f"{mes_referencia}|{origem}", mes_referencia, dados,
+                                 chat_id, message_id)
+    _acordar.set()
+    return id_item
+
+
+def enfileirar_gasto(categoria, item, valor, user_id, mes_referencia, chat_id=None, message_id=None,
+                     texto_sucesso=None):
+    """Agenda o lançamento de um gasto manual (cada gasto é uma linha nova; nunca coalesce)."""
+    dados = {"categoria": categoria, "item": item, "valor": valor, "user_id": user_id,
+             "texto_sucesso": texto_sucesso}
+    id_item = enfileirar_escrita("gasto", None, mes_referencia, dados, chat_id, message_id)
+    _acordar.set()
+    return id_item
+
+
+# --- AVISOS AO USUÁRIO ---
+def _avisar(item, sucesso, erro=None):
+    """
+    Edita a mensagem original do usuário com o resultado da escrita. Sem message_id
+    (ex: botões da notificação agrupada), só as falhas viram uma mensagem nova no chat.
+    """
+    if not item.get("chat_id") or (sucesso and not item.get("message_id")):
+        return
+    # Import local para evitar Circular Import
+    from telebot import types
+    from services.notification_service import fila_envio
+
+    dados = item["dados"]
+    if sucesso:
+        texto = dados.get("texto_sucesso") or "✅ <b>Gravado na planilha!</b>"
+    else:
+        alvo = dados.get("origem") or dados.get("item") or ""
+        texto = (f"❌ <b>Não foi possível gravar {alvo} na planilha</b> ({item['mes_referencia']}).\n"
+                 f"<i>{erro}</i>")
+    teclado = dados.get("teclado")
+    # Envio assíncrono pela fila do Telegram, que já registra as falhas no log
+    if not item.get("message_id"):
+        fila_envio.send_message(item["chat_id"], texto, parse_mode="HTML")
+        return
+    fila_envio.edit_message_text(texto, item["chat_id"], item["message_id"], parse_mode="HTML",
+                                 reply_markup=types.InlineKeyboardMarkup.de_json(teclado) if teclado else None)
+
+
+def erro_transitorio(e):
+    """True se vale tentar de novo mais tarde: rede, 429 ou 5xx da API do Sheets."""
+    if isinstance(e, gspread.exceptions.APIError):
+        status = getattr(e.response, "status_code", None)
+        return status == 429 or (status is not None and status >= 500)
+    return isinstance(e, ERROS_REDE)
+
+
+def _atraso(tentativas):
+    """Backoff exponencial: 30s, 1min, 2min... até 30min."""
+    return min(30 * 2 ** tentativas, 1800)
+
+
+def _falhar(itens, erro):
+    """Tenta de novo mais tarde, ou desiste após o máximo de tentativas."""
+    for item in itens:
+        if item["tentativas"] + 1 >= Config.FILA_PLANILHA_MAX_TENTATIVAS:
+            _descartar([item], erro, f"após {item['tentativas'] + 1} tentativa(s)")
+        else:
+            atraso = _atraso(item["tentativas"])
+            reagendar_escrita(item["id"], erro, atraso)
+            logger.warning(f"🔁 Escrita {item['id']} ({item['tipo']}) falhou; nova tentativa em {atraso}s: {erro}")
+
+
+def _descartar(itens, erro, motivo="(erro definitivo)"):
+    """Marca os itens como falhos sem nova tentativa e avisa quem pediu."""
+    for item in itens:
+        concluir_escritas([item["id"]], status="falhou", erro=erro)
+        logger.error(f"❌ Escrita {item['id']} ({item['tipo']}) descartada {motivo}: {erro}")
+        _avisar(item, False, erro)
+
+
+# --- ENVIO ---
+def _enviar_provisionamentos(mes, itens):
+    """Todas as contas fixas de um mês vão num único batchUpdate; a última de cada conta vence."""
+    por_chave = OrderedDict()
+    for item in itens:
+        por_chave.setdefault(item["chave"], []).append(item)
+
+    try:
+        lote = LoteEscrita(conectar_sheets(mes))
+        gravados, nao_encontrados = [], []
+        for grupo in por_chave.values():
+            ultimo = grupo[-1]
+            try:
+                nome = preparar_provisionamento(lote, ultimo["dados"]["origem"], ultimo["dados"]["valor"])
+            except Exception as e:
+                if erro_transitorio(e):
+                    raise
+                nao_encontrados.append((grupo, f"{type(e).__name__}: {e}"))
+                continue
+            if nome:
+                gravados.append(grupo)
+            else:
+                nao_encontrados.append((grupo, f"Item '{ultimo['dados']['origem']}' não encontrado na aba {mes}"))
+        lote.enviar()
+    except Exception as e:
+        if erro_transitorio(e):
+            _falhar(itens, f"{type(e).__name__}: {e}")
+        else:
+            _descartar(itens, f"{type(e).__name__}: {e}")
+        return
+
+    if gravados:
+        # As páginas de detalhes em cache ainda mostram os valores anteriores
+        invalidar_paginas("detalhes")
+    for grupo in gravados:
+        concluir_escritas([i["id"] for i in grupo])
+        for item in grupo:
+            _avisar(item, True)
+    for grupo, erro in nao_encontrados:
+        concluir_escritas([i["id"] for i in grupo], status="falhou", erro=erro)
+        logger.error(f"❌ {erro}")
+        for item in grupo:
+            _avisar(item, False, erro)
+
+    if gravados:
+        logger.info(f"✅ Planilha {mes}: {len(gravados)} conta(s) provisionada(s) numa única chamada.")
+
+
+def _marca_gasto(item):
+    """Identifica o item da fila na planilha (o id sozinho se repetiria depois de um resetar_db)."""
+    return f"{item['id']}@{item['criado_em']}"
+
+
+def _enviar_gasto(item):
+    """
+    Gasto é inserção de linha: repetir às cegas um envio que a API aplicou sem confirmar
+    (timeout de leitura, queda entre o envio e concluir_escritas) duplicaria o lançamento.
+    A linha leva a marca do item e cada envio confere antes se ela já está na aba.
+    """
+    dados = item["dados"]
+    try:
+        gravar_gasto(dados["categoria"], dados["item"], str(dados["valor"]), dados["user_id"],
+                     mes_referencia=item["mes_referencia"], marca=_marca_gasto(item))
+    except Exception as e:
+        if erro_transitorio(e):
+            _falhar([item], f"{type(e).__name__}: {e}")
+        else:
+            _descartar([item], f"{type(e).__name__}: {e}")
+        return
+
+    concluir_escritas([item["id"]])
+    invalidar_paginas("detalhes")
+    _avisar(item, True)
+
+
+def processar_fila():
+    """Uma rodada do flusher: reserva um lote de itens prontos e envia. Retorna quantos processou."""
+    itens = reservar_escritas(Config.FILA_PLANILHA_LOTE)
+    if not itens:
+        return 0
+
+    provisionamentos = OrderedDict()
+    for item in itens:
+        if item["tipo"] == "provisionamento":
+            provisionamentos.setdefault(item["mes_referencia"], []).append(item)
+        else:
+            _enviar_gasto(item)
+
+    for mes, itens_mes in provisionamentos.items():
+        _enviar_provisionamentos(mes, itens_mes)
+    return len(itens)
+
+
+def _loop_fila():
+    while True:
+        _acordar.clear()
+        try:
+            # Enquanto houver itens prontos, segue esvaziando; senão espera o próximo aviso
+            if processar_fila() >= Config.FILA_PLANILHA_LOTE:
+                continue
+        except Exception as e:
+            logger.error(f"💥 Erro na fila da planilha: {e}")
+        _acordar.wait(Config.FILA_PLANILHA_INTERVALO)
+
+
+def iniciar_fila_planilha():
+    """Recupera itens interrompidos por um reinício e sobe a thread de envio (uma por processo)."""
+    with _trava:
+        if _estado["thread"] is not None:
+            return
+        pendentes = recuperar_fila_escrita()
+        if pendentes:
+            logger.info(f"📮 Fila da planilha: {pendentes} escrita(s) pendente(s) de execuções anteriores.")
+        _estado["thread"] = threading.Thread(target=_loop_fila, name="fila-planilha", daemon=True)
+        _estado["thread"].start()
@@ -1,64 +1,249 @@
 import re
 import os
-from datetime import date, timedelta
-from imap_tools import MailBox, AND
+import email
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from email import policy
+from email.utils import parsedate_to_datetime
+from typing import List
+from imap_tools import MailBox, AND, U, MailMessageFlags
 from core.models import Boleto
 from core.config import Config
+from core.database import obter_sync_label, confirmar_sync_label, mensagem_processada
+from core.logger import logger
 from utils.helpers import extrair_mes_referencia
+from utils.imap_estrutura import (interpretar_fetch, listar_partes, decodificar_parte, decodificar_texto,
+                                  como_bytes)
 from utils.parser_pdf import extrair_dados_de_texto, extrair_dados_pdf
 from utils.web_downloader import baixar_boleto_bevi
 
+# Fase 1 (em lote): só cabeçalhos essenciais e a estrutura MIME, sem corpo nem anexos
+CAMPOS_CABECALHO = "BODY.PEEK[HEADER.FIELDS (SUBJECT DATE MESSAGE-ID)]"
+TAMANHO_LOTE_CABECALHOS = 100
 
-def buscar_faturas_email():
+# Message-IDs em processamento neste momento (labels paralelas podem trazer a mesma mensagem).
+# Só vão para o banco na confirmação, depois que os boletos foram salvos.
+_em_processamento = set()
+_trava_reservas = threading.Lock()
+
+
+@dataclass
+class CabecalhoMensagem:
+    """Envelope e estrutura de uma mensagem, obtidos antes de baixar qualquer conteúdo."""
+    uid: int
+    message_id: str
+    assunto: str
+    data: datetime
+    partes: List = field(default_factory=list)
+
+
+@dataclass
+class SincronizacaoLabel:
+    """
+    Avanço pendente de uma varredura: a nova marca d'água e os Message-IDs reservados.
+    Quem salva os boletos chama `confirmar()` depois de gravá-los, ou `descartar()`
+    se a fonte falhou/estourou o prazo, para as mensagens voltarem no próximo ciclo.
+    """
+    label: str
+    uidvalidity: int
+    ultimo_uid: int
+    mensagens: List = field(default_factory=list)  # (message_id, uid)
+
+    def confirmar(self):
+        try:
+            confirmar_sync_label(self.label, self.uidvalidity, self.ultimo_uid, self.mensagens)
+        finally:
+            self.descartar()
+
+    def descartar(self):
+        _liberar([message_id for message_id, _ in self.mensagens])
+
+
+def _reservar(message_id):
+    """Reserva o Message-ID para esta varredura; False se já foi processado ou está em outra label."""
+    with _trava_reservas:
+        if message_id in _em_processamento or mensagem_processada(message_id):
+            return False
+        _em_processamento.add(message_id)
+        return True
+
+
+def _liberar(message_ids):
+    with _trava_reservas:
+        _em_processamento.difference_update(message_ids)
+
+
+def buscar_faturas_label(label, cancelamento=None, modo=None):
+    """
+    Busca as faturas de uma única label com conexão IMAP própria,
+    permitindo que várias labels sejam varridas em paralelo pelo ciclo de coleta.
+    Retorna (boletos, SincronizacaoLabel); a marca d'água só avança na confirmação.
+
+    Modos:
+    - 'incremental' (padrão): baixa apenas UIDs acima da marca d'água da label.
+      Na primeira execução, ou se o UIDVALIDITY da pasta mudar, cai numa
+      varredura completa da janela de datas.
+    - 'completo': varre a janela de datas inteira e reprocessa tudo.
+
+    Se o evento `cancelamento` for disparado, interrompe entre uma mensagem e outra.
+    """
+    modo = modo or Config.GMAIL_MODO_SYNC
     boletos_encontrados = []
     data_busca = date(date.today().year, date.today().month, 1) - timedelta(days=7)
 
     with MailBox('imap.gmail.com').login(Config.GMAIL_USER, Config.GMAIL_PASS) as mailbox:
-        for label in Config.LABELS_INTERESSE:
-            mailbox.folder.set(label)
-
-            for msg in mailbox.fetch(AND(date_gte=data_busca)):
-                mes_ref = msg.date.strftime("%m/%Y")
-                novo_boleto = Boleto(origem=label, titulo=msg.subject, mes_referencia=mes_ref)
-
-                # --- PASSO 1: Extração do CORPO (Texto/HTML) ---
-                corpo = (msg.text + msg.html)
-                # O cerne: tratamos o corpo como um "documento" e extraímos o dicionário
-                dados_corpo = extrair_dados_de_texto(corpo)
-
-                novo_boleto.linha_digitavel = dados_corpo["linha"]
-                novo_boleto.pix = dados_corpo["pix"]
-                novo_boleto.valor = dados_corpo["valor"]
-
-                novo_boleto.mes_referencia = extrair_mes_referencia(corpo)
-
-                # --- PASSO 2: Links Externos (Bevi) ---
-                if ("aluguel" in label.lower() or "bevi" in label.lower()) and not novo_boleto.linha_digitavel:
-                    links = re.findall(r'href=[\'"]?([^\'" >]+)', msg.html)
-                    for link in links:
-                        if "cobranca" in link or "pagamento" in link:
-                            path = baixar_boleto_bevi(link)
-                            if path:
-                                dados_bevi = extrair_dados_pdf(path)
-                                # Atualiza apenas se o PDF trouxer dados novos
-                                if dados_bevi["linha"]: novo_boleto.linha_digitavel = dados_bevi["linha"]
-                                if dados_bevi["valor"]: novo_boleto.valor = dados_bevi["valor"]
-
-                # --- PASSO 3: Anexos PDF ---
-                if not novo_boleto.linha_digitavel and not novo_boleto.pix:
-                    for att in msg.attachments:
-                        if '.pdf' in att.filename.lower():
-                            path = os.path.join(Config.TEMP_DIR, att.filename)
-                            with open(path, 'wb') as f:
-                                f.write(att.payload)
-
-                            senha = Config.CPF_SENHA if "comgas" in label.lower() else None
-                            dados_pdf = extrair_dados_pdf(path, password=senha)
-
-                            # Preenche o objeto com o dicionário retornado
-                            if dados_pdf["linha"]: novo_boleto.linha_digitavel = dados_pdf["linha"]
-                            if dados_pdf["pix"]: novo_boleto.pix = dados_pdf["pix"]
-                            if dados_pdf["valor"]: novo_boleto.valor = dados_pdf["valor"]
-
-                boletos_encontrados.append(novo_boleto)
-    return boletos_encontrados
\ No newline at end of file
+        status = mailbox.folder.status(label, ['UIDVALIDITY', 'UIDNEXT'])
+        uidvalidity = status.get('UIDVALIDITY')
+        mailbox.folder.set(label)
+
+        sync = obter_sync_label(label)
+        completo = not (modo == "incremental" and sync and sync[0] == uidvalidity)
+        if not completo:
+            ultimo_uid = sync[1] or 0
+            criterio = AND(uid=U(ultimo_uid + 1, '*'))
+        else:
+            if modo == "incremental" and sync:
+                logger.info(f"🔄 UIDVALIDITY de {label} mudou: varredura completa da janela.")
+            ultimo_uid = 0
+            criterio = AND(date_gte=data_busca)
+
+        maior_uid = ultimo_uid
+        interrompido = False
+        processados = []
+        reservadas = []
+
+        # "N:*" sempre devolve ao menos a última mensagem, mesmo que já processada
+        uids = sorted(u for u in map(int, mailbox.uids(criterio)) if u > ultimo_uid)
+
+        try:
+            for cab in _buscar_cabecalhos(mailbox, uids):
+                if cancelamento is not None and cancelamento.is_set():
+                    interrompido = True
+                    break
+
+                message_id = cab.message_id or f"{label}:{uidvalidity}:{cab.uid}"
+                inedita = _reservar(message_id)
+                if modo == "incremental" and not inedita:
+                    logger.info(f"⏭️ Mensagem já processada em outra label: {cab.assunto}")
+                    maior_uid = max(maior_uid, cab.uid)
+                    continue
+                if inedita:
+                    reservadas.append((message_id, cab.uid))
+
+                boletos_encontrados.append(_processar_mensagem(mailbox, cab, label))
+                maior_uid = max(maior_uid, cab.uid)
+                processados.append(str(cab.uid))
+        except BaseException:
+            # Nada desta varredura foi confirmado: as mensagens voltam no próximo ciclo
+            _liberar([message_id for message_id, _ in reservadas])
+            raise
+
+        # As leituras usam BODY.PEEK; marca como lidas, como o fetch completo fazia
+        if processados:
+            mailbox.flag(processados, MailMessageFlags.SEEN, True)
+
+        if completo and not interrompido:
+            # A janela inteira foi varrida: tudo abaixo do UIDNEXT lido no início está em dia
+            maior_uid = max(maior_uid, (status.get('UIDNEXT') or 1) - 1)
+
+    return boletos_encontrados, SincronizacaoLabel(label, uidvalidity, maior_uid, reservadas)
+
+
+def _buscar_cabecalhos(mailbox, uids):
+    """Fase 1: busca em lote o cabeçalho e a BODYSTRUCTURE das mensagens, em ordem de UID."""
+    for i in range(0, len(uids), TAMANHO_LOTE_CABECALHOS):
+        lote = ",".join(str(u) for u in uids[i:i + TAMANHO_LOTE_CABECALHOS])
+        tipo, dados = mailbox.client.uid("FETCH", lote, f"(UID BODYSTRUCTURE {CAMPOS_CABECALHO})")
+        if tipo != "OK":
+            raise RuntimeError(f"Falha no FETCH de cabeçalhos: {tipo}")
+
+        for uid, itens in sorted(interpretar_fetch(dados).items()):
+            bruto = next((v for k, v in itens.items() if k.startswith("BODY[HEADER")), None)
+            cabecalho = email.message_from_bytes(como_bytes(bruto), policy=policy.default)
+            try:
+                data_msg = parsedate_to_datetime(cabecalho["date"])
+            except (TypeError, ValueError):
+                data_msg = datetime.now()
+
+            yield CabecalhoMensagem(
+                uid=uid,
+                message_id=str(cabecalho["message-id"] or "").strip(),
+                assunto=str(cabecalho["subject"] or ""),
+                data=data_msg,
+                partes=listar_partes(itens.get("BODYSTRUCTURE")),
+            )
+
+
+def _baixar_partes(mailbox, uid, partes):
+    """Fases 2/3: baixa apenas as seções pedidas de uma mensagem (BODY.PEEK[n])."""
+    secoes = " ".join(f"BODY.PEEK[{p.numero}]" for p in partes)
+    tipo, dados = mailbox.client.uid("FETCH", str(uid), f"(UID {secoes})")
+    if tipo != "OK":
+        raise RuntimeError(f"Falha no FETCH das partes da mensagem {uid}: {tipo}")
+    itens = interpretar_fetch(dados).get(uid, {})
+    return {p.numero: itens.get(f"BODY[{p.numero}]") for p in partes}
+
+
+def _processar_mensagem(mailbox, cab, label):
+    """
+    Extrai os dados de pagamento de uma mensagem a partir da sua estrutura:
+    baixa só as partes de texto e, se o corpo não tiver linha/PIX, um PDF por vez.
+    """
+    novo_boleto = Boleto(origem=label, titulo=cab.assunto, mes_referencia=cab.data.strftime("%m/%Y"))
+
+    # --- PASSO 1: Extração do CORPO (Texto/HTML) ---
+    partes_texto = [p for p in cab.partes if p.eh_texto]
+    conteudos = _baixar_partes(mailbox, cab.uid, partes_texto) if partes_texto else {}
+    texto = "".join(decodificar_texto(p, conteudos.get(p.numero)) for p in partes_texto if p.tipo == "text/plain")
+    html = "".join(decodificar_texto(p, conteudos.get(p.numero)) for p in partes_texto if p.tipo == "text/html")
+
+    corpo = (texto + html)
+    # O cerne: tratamos o corpo como um "documento" e extraímos o dicionário
+    dados_corpo = extrair_dados_de_texto(corpo)
+
+    novo_boleto.linha_digitavel = dados_corpo["linha"]
+    novo_boleto.pix = dados_corpo["pix"]
+    novo_boleto.valor = dados_corpo["valor"]
+
+    novo_boleto.mes_referencia = extrair_mes_referencia(corpo)
+
+    # --- PASSO 2: Links Externos (Bevi) ---
+    if ("aluguel" in label.lower() or "bevi" in label.lower()) and not novo_boleto.linha_digitavel:
+        links = re.findall(r'href=[\'"]?([^\'" >]+)', html)
+        for link in links:
+            if "cobranca" in link or "pagamento" in link:
+                path = baixar_boleto_bevi(link)
+                if path:
+                    try:
+                        dados_bevi = extrair_dados_pdf(path)
+                    finally:
+                        os.remove(path)
+                    # Atualiza apenas se o PDF trouxer dados novos
+                    if dados_bevi["linha"]: novo_boleto.linha_digitavel = dados_bevi["linha"]
+                    if dados_bevi["valor"]: novo_boleto.valor = dados_bevi["valor"]
+
+    # --- PASSO 3: Anexos PDF (baixados sob demanda, um por vez) ---
+    for parte in (p for p in cab.partes if p.eh_pdf):
+        if novo_boleto.linha_digitavel or novo_boleto.pix:
+            break
+
+        conteudo = _baixar_partes(mailbox, cab.uid, [parte])[parte.numero]
+        # Nome por label/UID/seção: labels paralelas podem trazer anexos com o mesmo nome
+        prefixo = re.sub(r'\W+', '_', label)
+        path = os.path.join(Config.TEMP_DIR, f"{prefixo}_{cab.uid}_{parte.numero}.pdf")
+        senha = Config.CPF_SENHA if "comgas" in label.lower() else None
+        try:
+            with open(path, 'wb') as f:
+                f.write(decodificar_parte(parte, conteudo))
+            dados_pdf = extrair_dados_pdf(path, password=senha)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+        # Preenche o objeto com o dicionário retornado
+        if dados_pdf["linha"]: novo_boleto.linha_digitavel = dados_pdf["linha"]
+        if dados_pdf["pix"]: novo_boleto.pix = dados_pdf["pix"]
+        if dados_pdf["valor"]: novo_boleto.valor = dados_pdf["valor"]
+
+    return novo_boleto
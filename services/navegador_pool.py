@@ -0,0 +1,228 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from core.logger import logger
+
+
+def _rss_arvore_mb(pid_raiz):
+    """
+    Soma o RSS (em MB) de um processo e de todos os seus descendentes lendo o /proc.
+    O Chromium abre vários processos filhos a partir do chromedriver, então o
+    consumo real só aparece somando a árvore. Fora do Linux retorna 0.
+    """
+    if not pid_raiz or not os.path.isdir("/proc"):
+        return 0.0
+
+    filhos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                # O nome do processo pode conter espaços; os campos úteis vêm após o ')'
+                campos = f.read().rsplit(")", 1)[1].split()
+            filhos.setdefault(int(campos[1]), []).append(int(entrada))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tamanho_pagina = os.sysconf("SC_PAGE_SIZE")
+    total_bytes = 0
+    pendentes = [pid_raiz]
+    while pendentes:
+        pid = pendentes.pop()
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total_bytes += int(f.read().split()[1]) * tamanho_pagina
+        except (OSError, IndexError, ValueError):
+            pass
+        pendentes.extend(filhos.get(pid, []))
+
+    return total_bytes / (1024 * 1024)
+
+
+class _NavegadorPool:
+    """Um navegador vivo dentro do pool, com contadores para reciclagem."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.usos = 0
+        self.ultimo_uso = time.monotonic()
+
+    @property
+    def pid(self):
+        servico = getattr(self.driver, "service", None)
+        processo = getattr(servico, "process", None)
+        return getattr(processo, "pid", None)
+
+
+class PoolNavegadores:
+    """
+    Mantém navegadores headless aquecidos para os scrapers.
+
+    Cada empréstimo recebe uma sessão limpa (cookies, storage e abas extras
+    são descartados na devolução). O navegador é reciclado após `max_usos`
+    empréstimos, quando a árvore de processos passa de `limite_rss_mb`, ou
+    quando deixa de responder; e é encerrado após `ocioso_segundos` sem uso.
+    """
+
+    def __init__(self, fabrica, tamanho=1, max_usos=10, limite_rss_mb=350,
+                 ocioso_segundos=300, timeout_espera=120):
+        self._fabrica = fabrica
+        self.tamanho = max(1, tamanho)
+        self.max_usos = max_usos
+        self.limite_rss_mb = limite_rss_mb
+        self.ocioso_segundos = ocioso_segundos
+        self.timeout_espera = timeout_espera
+
+        self._livres = []
+        self._total = 0
+        self._condicao = threading.Condition()
+        self._vigia = None
+        self._encerrado = False
+
+    @contextmanager
+    def emprestar(self):
+        """Empresta um navegador do pool; `with pool.emprestar() as driver: ...`"""
+        navegador = self._obter()
+        saudavel = False
+        try:
+            yield navegador.driver
+            saudavel = True
+        finally:
+            self._devolver(navegador, saudavel)
+
+    def _obter(self):
+        limite = time.monotonic() + self.timeout_espera
+        with self._condicao:
+            while not self._livres and self._total >= self.tamanho:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise TimeoutError("Nenhum navegador livre no pool dentro do prazo.")
+                self._condicao.wait(restante)
+
+            if self._livres:
+                return self._livres.pop()
+            self._total += 1
+            self._iniciar_vigia()
+
+        # A criação (lenta) acontece fora da trava para não bloquear devoluções
+        try:
+            inicio = time.monotonic()
+            navegador = _NavegadorPool(self._fabrica())
+            logger.info(f"🌐 Navegador iniciado em {time.monotonic() - inicio:.1f}s (pool).")
+            return navegador
+        except Exception:
+            with self._condicao:
+                self._total -= 1
+                self._condicao.notify()
+            raise
+
+    def _devolver(self, navegador, saudavel):
+        navegador.usos += 1
+        navegador.ultimo_uso = time.monotonic()
+
+        motivo = None
+        if not saudavel:
+            motivo = "erro durante o uso"
+        elif navegador.usos >= self.max_usos:
+            motivo = f"{navegador.usos} usos"
+        else:
+            rss = _rss_arvore_mb(navegador.pid)
+            if rss > self.limite_rss_mb:
+                motivo = f"RSS de {rss:.0f} MB"
+            elif not self._limpar_sessao(navegador.driver):
+                motivo = "navegador não responde"
+
+        if motivo:
+            logger.info(f"♻️ Reciclando navegador do pool ({motivo}).")
+            self._encerrar_navegador(navegador)
+            with self._condicao:
+                self._total -= 1
+                self._condicao.notify()
+            return
+
+        with self._condicao:
+            if self._encerrado:
+                self._total -= 1
+                self._encerrar_navegador(navegador)
+            else:
+                self._livres.append(navegador)
+            self._condicao.notify()
+
+    @staticmethod
+    def _limpar_sessao(driver):
+        """Isola o próximo empréstimo: fecha abas extras e apaga cookies, cache e storage."""
+        try:
+            origens = set()
+            abas = driver.window_handles
+            for aba in abas:
+                driver.switch_to.window(aba)
+                url = urlparse(driver.current_url)
+                if url.scheme in ("http", "https"):
+                    origens.add(f"{url.scheme}://{url.netloc}")
+            for aba in abas[1:]:
+                driver.switch_to.window(aba)
+                driver.close()
+            driver.switch_to.window(abas[0])
+
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            for origem in origens:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origem, "storageTypes": "all"})
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao limpar sessão do navegador: {e}")
+            return False
+
+    @staticmethod
+    def _encerrar_navegador(navegador):
+        try:
+            navegador.driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao encerrar navegador: {e}")
+
+    def _iniciar_vigia(self):
+        """Sobe (uma vez) a thread que encerra navegadores ociosos. Chamar com a trava adquirida."""
+        if self._vigia is None:
+            self._vigia = threading.Thread(target=self._vigiar_ociosos, name="pool-navegadores", daemon=True)
+            self._vigia.start()
+
+    def _vigiar_ociosos(self):
+        while True:
+            time.sleep(min(30, self.ocioso_segundos))
+            agora = time.monotonic()
+            with self._condicao:
+                ociosos = [n for n in self._livres if agora - n.ultimo_uso > self.ocioso_segundos]
+                for navegador in ociosos:
+                    self._livres.remove(navegador)
+                    self._total -= 1
+                # Sem navegadores vivos a vigia não tem o que fazer; volta no próximo empréstimo
+                sair = self._total == 0
+                if sair:
+                    self._vigia = None
+            for navegador in ociosos:
+                logger.info("💤 Encerrando navegador ocioso do pool.")
+                self._encerrar_navegador(navegador)
+            if sair:
+                return
+
+    def encerrar(self):
+        """Fecha todos os navegadores livres (os emprestados fecham ao serem devolvidos)."""
+        with self._condicao:
+            self._encerrado = True
+            livres, self._livres = self._livres, []
+            self._total -= len(livres)
+        for navegador in livres:
+            self._encerrar_navegador(navegador)
+
+
+def criar_pool(fabrica, **kwargs):
+    """Cria um pool e garante o encerramento dos navegadores na saída do processo."""
+    pool = PoolNavegadores(fabrica, **kwargs)
+    atexit.register(pool.encerrar)
+    return pool
@@ -5,14 +5,24 @@ from datetime import datetime, timedelta
 import telebot
 from telebot import types, apihelper
 from core.config import Config
-from core.database import get_db_connection
+from core.database import get_db_connection, transacao, limpar_estado_sync, estatisticas_db
 from core.logger import logger
-from utils.helpers import formatar_mensagem_boleto
+from services.conversa_service import conversas
+from services.envio_service import criar_fila_envio
+from services.paginacao_service import (pagina_pendentes, pagina_detalhes, montar_paginas_detalhes,
+                                        invalidar_paginas)
+from utils.helpers import formatar_bloco_boleto, centavos_para_valor
 
 # Configurações iniciais
 apihelper.ENABLE_MIDDLEWARE = True
 bot = telebot.TeleBot(Config.TELEGRAM_TOKEN)
-TEMP_MANUAL = {}
+# Toda mensagem enviada/editada passa pela fila de saída (limites do Telegram, 429, retentativas)
+fila_envio = criar_fila_envio(bot)
+
+# Lançamento manual: categoria -> valor -> descrição -> mês (estado em `conversas`)
+LANCAMENTO_VALOR = "lancamento:valor"
+LANCAMENTO_DESCRICAO = "lancamento:descricao"
+LANCAMENTO_MES = "lancamento:mes"
 
 
 # --- MIDDLEWARE DE SEGURANÇA ---
@@ -20,7 +30,7 @@ TEMP_MANUAL = {}
 def restrict_access(bot_instance, update):
     user_id = update.from_user.id
     if user_id not in Config.ALLOWED_USERS:
-        bot.send_message(update.chat.id, "🚫 Acesso Negado.")
+        fila_envio.send_message(update.chat.id, "🚫 Acesso Negado.")
         return False
 
 
@@ -94,73 +104,201 @@ def enviar_notificacao_fatura(boleto, target_user=None):
     elif boleto.linha_digitavel:
         mensagem += f"\n🔢 <b>Linha Digitável:</b>\n<code>{boleto.linha_digitavel}</code>"
 
-    # Busca o ID do banco de dados para o botão de callback
-    with get_db_connection() as conn:
-        res = conn.execute(
-            "SELECT id FROM boletos WHERE (pix = ?) OR (linha_digitavel = ?)",
-            (boleto.pix, boleto.linha_digitavel)
-        ).fetchone()
-        id_db = res['id'] if res else "unknown"
-
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("📊 Lançar na Planilha", callback_data=f"lncsht_{id_db}"))
-    markup.add(types.InlineKeyboardButton("✅ Marcar como Pago", callback_data=f"pago_{id_db}"))
+    # O id vem de salvar_boletos_em_lote; sem ele não há o que marcar, então vai sem botões
+    markup = None
+    if boleto.id is not None:
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton("📊 Lançar na Planilha", callback_data=f"lncsht_{boleto.id}"))
+        markup.add(types.InlineKeyboardButton("✅ Marcar como Pago", callback_data=f"pago_{boleto.id}"))
+    else:
+        logger.warning(f"⚠️ Boleto '{boleto.titulo}' notificado sem id do banco; botões omitidos.")
 
     destinatarios = [target_user] if target_user else Config.ALLOWED_USERS
+    # A fila registra no log as falhas de entrega; aqui não há o que tratar
     for user_id in destinatarios:
-        try:
-            bot.send_message(user_id, mensagem, reply_markup=markup, parse_mode="HTML")
-        except Exception as e:
-            logger.error(f"Erro ao enviar notificação para {user_id}: {e}")
+        fila_envio.send_message(user_id, mensagem, reply_markup=markup, parse_mode="HTML")
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('lncsht_'))
 def processar_lancamento_planilha(call):
-    bot.answer_callback_query(call.id, "⌛ Processando lançamento...")
+    bot.answer_callback_query(call.id, "📮 Lançamento na fila da planilha...")
     id_boleto = call.data.split('_')[1]
 
     with get_db_connection() as conn:
         fatura = conn.execute("SELECT * FROM boletos WHERE id = ?", (id_boleto,)).fetchone()
 
     if fatura:
-        from services.sheets_service import atualizar_valor_planilha
-        sucesso = atualizar_valor_planilha(fatura['origem'], fatura['valor'], fatura['mes_referencia'])
+        # A escrita vai para a fila persistente; a mensagem é editada de novo quando ela chegar na planilha
+        from services.fila_planilha_service import enfileirar_provisionamento
+        markup = call.message.reply_markup
+        enfileirar_provisionamento(
+            fatura['origem'], centavos_para_valor(fatura['valor_centavos']), fatura['mes_referencia'],
+            chat_id=call.message.chat.id, message_id=call.message.message_id,
+            texto_sucesso=call.message.text + "\n\n✅ <b>Provisionado na planilha!</b>",
+            teclado=markup.to_json() if markup else None
+        )
+        fila_envio.edit_message_text(call.message.text + "\n\n⏳ <i>Na fila da planilha...</i>",
+                                     call.message.chat.id, call.message.message_id,
+                                     reply_markup=markup, parse_mode="HTML")
+
+
+# --- NOTIFICAÇÃO AGRUPADA (UMA MENSAGEM POR CICLO) ---
+# Limites por mensagem: texto do Telegram (4096) com folga e botões (2 por boleto)
+LIMITE_TEXTO_AGRUPADO = 3800
+MAX_BOLETOS_POR_MENSAGEM = 20
+
 
-        if sucesso:
-            novo_texto = call.message.text + "\n\n✅ <b>Provisionado na planilha!</b>"
-            bot.edit_message_text(novo_texto, call.message.chat.id, call.message.message_id,
-                                  reply_markup=call.message.reply_markup, parse_mode="HTML")
-        else:
-            bot.send_message(call.message.chat.id, "❌ Erro ao atualizar planilha da Comgás.")
+def _paginas_agrupadas(boletos):
+    """Divide os boletos em mensagens que respeitam o limite de texto e de botões."""
+    paginas, atual, tamanho = [], [], 0
+    for indice, boleto in enumerate(boletos, 1):
+        bloco = formatar_bloco_boleto(indice, boleto)
+        if atual and (tamanho + len(bloco) > LIMITE_TEXTO_AGRUPADO or len(atual) >= MAX_BOLETOS_POR_MENSAGEM):
+            paginas.append(atual)
+            atual, tamanho = [], 0
+        atual.append((indice, boleto, bloco))
+        tamanho += len(bloco)
+    if atual:
+        paginas.append(atual)
+    return paginas
+
+
+def enviar_boletos_agrupados(boletos, target_user=None):
+    """
+    Envia os boletos novos do ciclo numa mensagem por destinatário (ou poucas, se não couberem),
+    com uma linha de botões numerados por boleto.
+    """
+    if not boletos:
+        return
+    paginas = _paginas_agrupadas(boletos)
+    destinatarios = [target_user] if target_user else Config.ALLOWED_USERS
+
+    mensagens = []
+    for n, pagina in enumerate(paginas, 1):
+        parte = f" ({n}/{len(paginas)})" if len(paginas) > 1 else ""
+        texto = f"<b>🧾 {len(boletos)} BOLETO(S) NOVO(S){parte}</b>\n\n" + "".join(b for _, _, b in pagina)
+
+        markup = types.InlineKeyboardMarkup()
+        for indice, boleto, _ in pagina:
+            if boleto.id is None:
+                continue
+            markup.row(
+                types.InlineKeyboardButton(f"📊 {indice}", callback_data=f"grp_lnc_{boleto.id}"),
+                types.InlineKeyboardButton(f"✅ {indice}", callback_data=f"grp_pago_{boleto.id}"),
+            )
+        mensagens.append((texto, markup))
+
+    for user_id in destinatarios:
+        for texto, markup in mensagens:
+            fila_envio.send_message(user_id, texto, reply_markup=markup, parse_mode="HTML")
+
+
+def _marcar_botao(call, novos_botoes):
+    """Troca, no teclado da mensagem agrupada, a linha do botão clicado por `novos_botoes`."""
+    markup = call.message.reply_markup
+    if not markup:
+        return
+    for i, linha in enumerate(markup.keyboard):
+        if any(b.callback_data == call.data for b in linha):
+            markup.keyboard[i] = novos_botoes(linha)
+            break
+    fila_envio.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=markup)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('grp_lnc_'))
+def processar_lancamento_agrupado(call):
+    id_boleto = call.data.split('_')[-1]
+    with get_db_connection() as conn:
+        fatura = conn.execute("SELECT * FROM boletos WHERE id = ?", (id_boleto,)).fetchone()
+    if not fatura:
+        return bot.answer_callback_query(call.id, "❌ Boleto não encontrado.")
+
+    # Sem message_id: a fila não reescreve a mensagem agrupada, só avisa se a escrita falhar
+    from services.fila_planilha_service import enfileirar_provisionamento
+    enfileirar_provisionamento(fatura['origem'], centavos_para_valor(fatura['valor_centavos']),
+                               fatura['mes_referencia'], chat_id=call.message.chat.id)
+    bot.answer_callback_query(call.id, f"📮 {fatura['titulo']}: na fila da planilha.")
+
+    def _lancado(linha):
+        return [types.InlineKeyboardButton(b.text.replace("📊", "📮"), callback_data="grp_ok")
+                if b.callback_data == call.data else b for b in linha]
+    _marcar_botao(call, _lancado)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('grp_pago_'))
+def confirmar_pagamento_agrupado(call):
+    id_boleto = call.data.split('_')[-1]
+    with transacao() as conn:
+        fatura = conn.execute("SELECT * FROM boletos WHERE id = ?", (id_boleto,)).fetchone()
+        conn.execute("UPDATE boletos SET pago = 1 WHERE id = ?", (id_boleto,))
+    invalidar_paginas("pendentes")
+    if not fatura:
+        return bot.answer_callback_query(call.id, "❌ Boleto não encontrado.")
+
+    from services.fila_planilha_service import enfileirar_provisionamento
+    enfileirar_provisionamento(fatura['origem'], centavos_para_valor(fatura['valor_centavos']),
+                               fatura['mes_referencia'], chat_id=call.message.chat.id)
+    bot.answer_callback_query(call.id, f"✅ PAGO: {fatura['titulo']}")
+
+    indice = next((b.text.split()[-1] for linha in call.message.reply_markup.keyboard for b in linha
+                   if b.callback_data == call.data), "")
+    _marcar_botao(call, lambda linha: [types.InlineKeyboardButton(f"✔️ {indice} pago", callback_data="grp_ok")])
+
+
+@bot.callback_query_handler(func=lambda call: call.data == "grp_ok")
+def botao_agrupado_concluido(call):
+    bot.answer_callback_query(call.id, "✔️ Já registrado.")
 
 
 # --- HANDLERS DE COMANDOS ---
 @bot.message_handler(commands=['start', 'menu'])
 def welcome(message):
-    bot.send_message(message.chat.id, "🤖 <b>BoletoBot Central</b>\nGerenciamento financeiro ativo.",
-                     reply_markup=main_menu(), parse_mode="HTML")
+    fila_envio.send_message(message.chat.id, "🤖 <b>BoletoBot Central</b>\nGerenciamento financeiro ativo.",
+                            reply_markup=main_menu(), parse_mode="HTML")
+
+
+@bot.message_handler(commands=['metricas'])
+def exibir_metricas(message):
+    """Saúde da fila de saída do Telegram e do pool do SQLite."""
+    envio = fila_envio.metricas()
+    db = estatisticas_db()
+    fila_envio.send_message(
+        message.chat.id,
+        f"📈 <b>MÉTRICAS</b>\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n"
+        f"📤 <b>Fila do Telegram:</b> {envio['profundidade']} mensagem(ns) em {envio['chats_na_fila']} chat(s)\n"
+        f"⏱️ Latência p50 {envio['p50_ms']:.0f} ms · p95 {envio['p95_ms']:.0f} ms · máx {envio['max_ms']:.0f} ms\n"
+        f"✅ {envio['enviados']} enviada(s) · 🔁 {envio['retentativas']} retentativa(s) · "
+        f"🚦 {envio['limitados_429']} 429 · ❌ {envio['falhas']} falha(s)\n"
+        f"🗄️ <b>SQLite:</b> {db['abertas']} conexão(ões), pico {db['pico_em_uso']} em uso, "
+        f"espera média {db['espera_media_ms']:.1f} ms",
+        parse_mode="HTML"
+    )
 
 
 # --- BUSCA MANUAL ---
 @bot.message_handler(func=lambda m: m.text == "🔍 Buscar Novos Boletos")
 def trigger_busca_manual(message):
-    bot.send_message(message.chat.id, "🔎 Iniciando varredura... Aguarde.")
-    try:
+    # O ciclo roda no executor de tarefas; a mensagem de progresso é editada a cada fonte concluída
+    from services.tarefas_service import executar_em_segundo_plano
+    solicitante_id = message.from_user.id
+
+    def buscar(progresso):
         # Import local para evitar Circular Import
         from main import executar_ciclo_coleta
-        executar_ciclo_coleta(solicitante_id=message.from_user.id)
-        bot.send_message(message.chat.id, "✅ Busca finalizada!")
-    except Exception as e:
-        logger.error(f"Erro na busca manual: {e}")
-        bot.send_message(message.chat.id, "❌ Erro ao realizar busca.")
+        executar_ciclo_coleta(solicitante_id=solicitante_id, progresso=progresso)
+
+    if not executar_em_segundo_plano(message.chat.id, "🔎 Busca de boletos", buscar, chave="coleta",
+                                     texto_inicial="⏳ Varrendo as fontes..."):
+        fila_envio.send_message(message.chat.id, "⏳ Já existe uma busca em andamento. Aguarde ela terminar.")
 
 
 # --- RESUMO MENSAL ---
 @bot.message_handler(func=lambda m: m.text == "📊 Resumo Mensal")
 def exibir_resumo(message):
     markup = gerar_teclado_meses("resumo_mes_")
-    bot.send_message(message.chat.id, "📊 Escolha o mês para o <b>Resumo Geral</b>:",
-                     reply_markup=markup, parse_mode="HTML")
+    fila_envio.send_message(message.chat.id, "📊 Escolha o mês para o <b>Resumo Geral</b>:",
+                            reply_markup=markup, parse_mode="HTML")
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('resumo_mes_'))
@@ -168,11 +306,13 @@ def processar_resumo_por_mes(call):
     mes_selecionado = call.data.split('_')[-1]
     bot.answer_callback_query(call.id, f"⌛ Consultando {mes_selecionado}...")
 
-    from services.sheets_service import obter_resumo_financeiro
-    resumo = obter_resumo_financeiro(mes_alvo=mes_selecionado)
+    def consultar(progresso):
+        from services.sheets_service import obter_resumo_financeiro
+        resumo = obter_resumo_financeiro(mes_alvo=mes_selecionado)
 
-    if resumo:
-        msg = (
+        if not resumo:
+            return progresso.falhar("❌ Não foi possível ler a planilha.")
+        progresso.concluir(
             f"📊 <b>RESUMO FINANCEIRO - {mes_selecionado}</b>\n"
             f"━━━━━━━━━━━━━━━━━━━━\n"
             f"💰 <b>Total Geral:</b> {resumo['geral']}\n"
@@ -180,7 +320,11 @@ def processar_resumo_por_mes(call):
             f"👤 <b>Total Neko:</b> {resumo['neko']}\n"
             f"━━━━━━━━━━━━━━━━━━━━"
         )
-        bot.send_message(call.message.chat.id, msg, parse_mode="HTML")
+
+    # A leitura da planilha roda fora do handler; a mensagem "consultando" vira o resumo
+    from services.tarefas_service import executar_em_segundo_plano
+    executar_em_segundo_plano(call.message.chat.id, f"📊 Resumo {mes_selecionado}", consultar,
+                              texto_inicial="⌛ Consultando a planilha...")
 
 
 # --- RESUMO DE BOLETOS PAGOS ---
@@ -190,11 +334,11 @@ def listar_pagos(m):
         faturas = conn.execute("SELECT titulo, origem FROM boletos WHERE pago = 1 LIMIT 10").fetchall()
 
     if not faturas:
-        return bot.send_message(m.chat.id, "📭 Nenhum histórico de pagamento.")
+        return fila_envio.send_message(m.chat.id, "📭 Nenhum histórico de pagamento.")
 
     res = "<b>✅ ÚLTIMOS PAGAMENTOS:</b>\n\n"
     res += "\n".join([f"✔️ {f['titulo']} ({f['origem']})" for f in faturas])
-    bot.send_message(m.chat.id, res, parse_mode="HTML")
+    fila_envio.send_message(m.chat.id, res, parse_mode="HTML")
 
 
 # --- LANÇAMENTO DINÂMICO (FLUXO GUIADO) ---
@@ -203,122 +347,137 @@ def selecionar_categoria(message):
     markup = types.InlineKeyboardMarkup(row_width=2)
     botoes = [types.InlineKeyboardButton(cat, callback_data=f"lnc_{cat}") for cat in Config.CATEGORIAS_MANUAIS]
     markup.add(*botoes)
-    bot.send_message(message.chat.id, "📁 Selecione a <b>Categoria</b>:", reply_markup=markup, parse_mode="HTML")
+    fila_envio.send_message(message.chat.id, "📁 Selecione a <b>Categoria</b>:", reply_markup=markup, parse_mode="HTML")
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('lnc_'))
 def pedir_valor(call):
     categoria = call.data.split('_')[1]
-    msg = bot.edit_message_text(f"💰 Categoria: <b>{categoria}</b>\nDigite o <b>Valor</b> (ex: 150,50):",
-                                call.message.chat.id, call.message.message_id, parse_mode="HTML")
-    bot.register_next_step_handler(msg, processar_valor_manual, categoria)
+    conversas.definir(call.message.chat.id, call.from_user.id, LANCAMENTO_VALOR, {'categoria': categoria})
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("❌ Cancelar", callback_data="cancelar_operacao"))
+    fila_envio.edit_message_text(f"💰 Categoria: <b>{categoria}</b>\nDigite o <b>Valor</b> (ex: 150,50):",
+                                 call.message.chat.id, call.message.message_id, reply_markup=markup,
+                                 parse_mode="HTML")
 
 
-def processar_valor_manual(message, categoria):
+def processar_valor_manual(message, dados):
     try:
-        valor_limpo = message.text.replace(',', '.')
-        valor_float = float(valor_limpo)
-        msg = bot.send_message(message.chat.id, f"📝 Valor: R$ {valor_float:.2f}\nDigite a <b>Descrição</b>:")
-        bot.register_next_step_handler(msg, finalizar_lancamento_manual, categoria, valor_float)
-    except:
-        bot.send_message(message.chat.id, "❌ Valor inválido. Tente novamente.")
+        valor_float = float(message.text.replace(',', '.'))
+    except (AttributeError, ValueError):
+        # Continua no mesmo passo: basta digitar de novo
+        return fila_envio.send_message(message.chat.id, "❌ Valor inválido. Tente novamente.")
+
+    dados['valor'] = valor_float
+    conversas.definir(message.chat.id, message.from_user.id, LANCAMENTO_DESCRICAO, dados)
+    fila_envio.send_message(message.chat.id, f"📝 Valor: R$ {valor_float:.2f}\nDigite a <b>Descrição</b>:",
+                            parse_mode="HTML")
 
 
-def finalizar_lancamento_manual(message, categoria, valor):
+def finalizar_lancamento_manual(message, dados):
     """
     Em vez de pedir para digitar, exibe o seletor de meses reutilizando a lógica.
     """
-    descricao = message.text
-    user_id = message.from_user.id
-
-    # Salva os dados no estado temporário
-    TEMP_MANUAL[user_id] = {
-        'categoria': categoria,
-        'valor': valor,
-        'descricao': descricao
-    }
+    dados['descricao'] = message.text
+    conversas.definir(message.chat.id, message.from_user.id, LANCAMENTO_MES, dados)
 
     # Reutiliza a lógica dos botões com o prefixo 'lncsalvar_'
     markup = gerar_teclado_meses("lncsalvar_")
 
-    bot.send_message(
+    fila_envio.send_message(
         message.chat.id,
         f"📅 Quase lá! Selecione o <b>mês</b> para o gasto:\n"
-        f"📝 <i>{descricao} (R$ {valor:.2f})</i>",
+        f"📝 <i>{dados['descricao']} (R$ {dados['valor']:.2f})</i>",
         reply_markup=markup,
         parse_mode="HTML"
     )
 
+
+# Passos que esperam texto digitado; o do mês espera o botão (lncsalvar_)
+PASSOS_TEXTO = {
+    LANCAMENTO_VALOR: processar_valor_manual,
+    LANCAMENTO_DESCRICAO: finalizar_lancamento_manual,
+}
+
+
 @bot.callback_query_handler(func=lambda call: call.data.startswith('lncsalvar_'))
 def processar_salvamento_final_callback(call):
     """Recebe o mês via botão e finalmente envia para a planilha."""
     mes_ref = call.data.split('_')[-1]
     user_id = call.from_user.id
 
-    # Recupera os dados que guardamos no passo anterior
-    dados = TEMP_MANUAL.pop(user_id, None)
-
-    if not dados:
-        return bot.send_message(call.message.chat.id, "❌ Sessão expirada. Tente lançar o gasto novamente.")
+    # Recupera os dados guardados nos passos anteriores (persistidos no SQLite)
+    conversa = conversas.obter(call.message.chat.id, user_id)
+    if not conversa or conversa[0] != LANCAMENTO_MES:
+        bot.answer_callback_query(call.id)
+        return fila_envio.send_message(call.message.chat.id, "❌ Sessão expirada. Tente lançar o gasto novamente.")
+    dados = conversa[1]
+    conversas.encerrar(call.message.chat.id, user_id)
 
     bot.answer_callback_query(call.id, f"✅ Salvando em {mes_ref}...")
 
-    from services.sheets_service import lancar_gasto_dinamico
-    res = lancar_gasto_dinamico(
+    confirmacao = (
+        f"✅ <b>Lançado com Sucesso!</b>\n"
+        f"📅 Mês: {mes_ref}\n"
+        f"📂 {dados['categoria'].upper()} | 📝 {dados['descricao'].upper()}\n"
+        f"💰 Total: R$ {float(dados['valor']):.2f}"
+    )
+
+    from services.fila_planilha_service import enfileirar_gasto
+    enfileirar_gasto(
         dados['categoria'],
         dados['descricao'],
-        str(dados['valor']),
+        dados['valor'],
         user_id,
-        mes_referencia=mes_ref
+        mes_ref,
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        texto_sucesso=confirmacao
     )
 
-    if res["sucesso"]:
-        confirmacao = (
-            f"✅ <b>Lançado com Sucesso!</b>\n"
-            f"📅 Mês: {mes_ref}\n"
-            f"📂 {res['categoria']} | 📝 {res['item']}\n"
-            f"💰 Total: R$ {float(dados['valor']):.2f}"
-        )
-        # Edita a mensagem dos botões para a confirmação (fica mais limpo)
-        bot.edit_message_text(confirmacao, call.message.chat.id, call.message.message_id, parse_mode="HTML")
-    else:
-        bot.send_message(call.message.chat.id, "❌ Erro ao salvar na planilha. Verifique os logs.")
+    # Edita a mensagem dos botões; a fila troca pela confirmação quando a planilha for atualizada
+    fila_envio.edit_message_text(f"⏳ Lançando <i>{dados['descricao']} (R$ {float(dados['valor']):.2f})</i> em {mes_ref}...",
+                                 call.message.chat.id, call.message.message_id, parse_mode="HTML")
 
 
 # --- GERENCIAMENTO DE BOLETOS ---
 @bot.callback_query_handler(func=lambda call: call.data.startswith('pago_'))
 def confirmar_pagamento(call):
     id_boleto = call.data.split('_')[1]
-    with get_db_connection() as conn:
+    with transacao() as conn:
         fatura = conn.execute("SELECT * FROM boletos WHERE id = ?", (id_boleto,)).fetchone()
         conn.execute("UPDATE boletos SET pago = 1 WHERE id = ?", (id_boleto,))
+    invalidar_paginas("pendentes")
 
     if fatura:
-        from services.sheets_service import atualizar_valor_planilha
-        atualizar_valor_planilha(fatura['origem'], fatura['valor'], fatura['mes_referencia'])
-        bot.edit_message_text(f"✅ <b>PAGO:</b> {fatura['titulo']}", call.message.chat.id, call.message.message_id,
-                              parse_mode="HTML")
+        from services.fila_planilha_service import enfileirar_provisionamento
+        texto = f"✅ <b>PAGO:</b> {fatura['titulo']}"
+        enfileirar_provisionamento(
+            fatura['origem'], centavos_para_valor(fatura['valor_centavos']), fatura['mes_referencia'],
+            chat_id=call.message.chat.id, message_id=call.message.message_id,
+            texto_sucesso=texto + "\n📊 Lançado na planilha."
+        )
+        fila_envio.edit_message_text(texto + "\n⏳ <i>Lançando na planilha...</i>", call.message.chat.id,
+                                     call.message.message_id, parse_mode="HTML")
 
 
 @bot.message_handler(func=lambda m: m.text == "🧾 Boletos Pendentes")
 def listar_pendentes(m):
-    with get_db_connection() as conn:
-        faturas = conn.execute("SELECT * FROM boletos WHERE pago = 0").fetchall()
+    # Uma única mensagem paginada (◀️/▶️ editam no lugar), qualquer que seja o tamanho do backlog
+    texto, markup = pagina_pendentes()
+    fila_envio.send_message(m.chat.id, texto, reply_markup=markup, parse_mode="HTML")
 
-    if not faturas:
-        return bot.send_message(m.chat.id, "✅ Nada pendente!")
 
-    for f in faturas:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("📊 Lançar na Planilha", callback_data=f"lncsht_{f['id']}"))
-        markup.add(types.InlineKeyboardButton("✅ Marcar como Pago", callback_data=f"pago_{f['id']}"))
-        msg_formatada = formatar_mensagem_boleto(f)
-        bot.send_message(
-            m.chat.id,
-            msg_formatada,
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+@bot.callback_query_handler(func=lambda call: call.data.startswith('pgp_'))
+def navegar_pendentes(call):
+    _, direcao, id_ref = call.data.split('_')
+    bot.answer_callback_query(call.id)
+    if direcao == "a":
+        texto, markup = pagina_pendentes(apos_id=int(id_ref))
+    else:
+        texto, markup = pagina_pendentes(antes_id=int(id_ref))
+    fila_envio.edit_message_text(texto, call.message.chat.id, call.message.message_id,
+                                 reply_markup=markup, parse_mode="HTML")
 
 
 # --- LIMPEZA DA BASE ---
@@ -328,7 +487,7 @@ def confirmar_limpeza(message):
     markup.add(types.InlineKeyboardButton("⚠️ SIM, APAGAR TUDO", callback_data="confirmar_reset_db"))
     markup.add(types.InlineKeyboardButton("❌ Cancelar", callback_data="cancelar_operacao"))
 
-    bot.send_message(
+    fila_envio.send_message(
         message.chat.id,
         "❓ <b>Tem certeza?</b>\nIsto apagará todos os boletos identificados (pendentes e pagos) e não pode ser desfeito.",
         reply_markup=markup,
@@ -338,33 +497,36 @@ def confirmar_limpeza(message):
 
 @bot.callback_query_handler(func=lambda call: call.data == "confirmar_reset_db")
 def resetar_db(call):
-    from core.database import get_db_connection
     try:
         with get_db_connection() as conn:
             # Apaga os dados mas mantém a estrutura das tabelas
             conn.execute("DELETE FROM boletos")
             # Reinicia o contador de IDs (opcional)
             conn.execute("DELETE FROM sqlite_sequence WHERE name='boletos'")
-            conn.commit()
 
-        bot.edit_message_text("✅ <b>Base de dados limpa com sucesso!</b>",
-                              call.message.chat.id, call.message.message_id, parse_mode="HTML")
+        # Sem o histórico, a próxima busca precisa voltar a ler os e-mails da janela
+        limpar_estado_sync()
+        invalidar_paginas("pendentes")
+
+        fila_envio.edit_message_text("✅ <b>Base de dados limpa com sucesso!</b>",
+                                     call.message.chat.id, call.message.message_id, parse_mode="HTML")
         logger.info("🗑️ Base de dados resetada pelo usuário.")
     except Exception as e:
-        bot.send_message(call.message.chat.id, f"❌ Erro ao limpar base: {e}")
+        fila_envio.send_message(call.message.chat.id, f"❌ Erro ao limpar base: {e}")
 
 
 @bot.callback_query_handler(func=lambda call: call.data == "cancelar_operacao")
 def cancelar_acao(call):
-    bot.edit_message_text("❌ Operação cancelada.", call.message.chat.id, call.message.message_id)
+    conversas.encerrar(call.message.chat.id, call.from_user.id)
+    fila_envio.edit_message_text("❌ Operação cancelada.", call.message.chat.id, call.message.message_id)
 
 
 @bot.message_handler(func=lambda m: m.text == "🧾 Detalhes do Mês")
 def selecionar_mes_detalhes(message):
     """Primeiro passo: Selecionar qual mês deseja visualizar."""
     markup = gerar_teclado_meses("detalhe_mes_")
-    bot.send_message(message.chat.id, "📅 Escolha o mês para ver a <b>Lista Detalhada</b>:",
-                     reply_markup=markup, parse_mode="HTML")
+    fila_envio.send_message(message.chat.id, "📅 Escolha o mês para ver a <b>Lista Detalhada</b>:",
+                            reply_markup=markup, parse_mode="HTML")
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('detalhe_mes_'))
@@ -373,30 +535,60 @@ def processar_detalhes_por_mes(call):
     mes_selecionado = call.data.split('_')[-1]
     bot.answer_callback_query(call.id, f"⌛ Buscando dados de {mes_selecionado}...")
 
-    from services.sheets_service import obter_gastos_detalhados
-    gastos = obter_gastos_detalhados(mes_alvo=mes_selecionado)  # Passamos o mês escolhido
-
-    if not gastos:
-        return bot.send_message(call.message.chat.id, f"📭 Nenhuma informação em <b>{mes_selecionado}</b>.",
-                                parse_mode="HTML")
-
-    msg = f"📝 <b>LISTA DETALHADA - {mes_selecionado}</b>\n"
-    msg += "━━━━━━━━━━━━━━━━━━━━\n\n"
-
-    for g in gastos:
-        emoji_n = "🟢" if "-" in str(g['neko']) else "🔴"
-        emoji_b = "🟢" if "-" in str(g['baka']) else "🔴"
-
-        linha = (
-            f"🔹 <b>{g['item']}</b> ({g['categoria']})\n"
-            f"💰 Total: <code>R$ {g['valor']}</code>\n"
-            f"└ 🙋‍♂️ Neko: {emoji_n} <code>{g['neko']}</code> | 🙋‍♀️ Baka: {emoji_b} <code>{g['baka']}</code>\n"
-            "────────────────────\n"
-        )
-
-        if len(msg + linha) > 4000:
-            bot.send_message(call.message.chat.id, msg, parse_mode="HTML")
-            msg = ""
-        msg += linha
-
-    bot.send_message(call.message.chat.id, msg, parse_mode="HTML")
+    def consultar(progresso):
+        from services.sheets_service import obter_gastos_detalhados
+        gastos = obter_gastos_detalhados(mes_alvo=mes_selecionado)  # Passamos o mês escolhido
+        if gastos is None:
+            return progresso.falhar("❌ Não foi possível ler a planilha.")
+
+        # A mensagem de progresso vira a primeira página; ◀️/▶️ editam a mesma mensagem
+        texto, markup = pagina_detalhes(mes_selecionado, 0, montar_paginas_detalhes(mes_selecionado, gastos))
+        progresso.concluir(texto, reply_markup=markup)
+
+    from services.tarefas_service import executar_em_segundo_plano
+    executar_em_segundo_plano(call.message.chat.id, f"🧾 Detalhes {mes_selecionado}", consultar,
+                              texto_inicial="⌛ Buscando dados na planilha...")
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('pgd_'))
+def navegar_detalhes(call):
+    _, mes, numero = call.data.split('_')
+    bot.answer_callback_query(call.id)
+
+    def editar(pagina):
+        texto, markup = pagina
+        fila_envio.edit_message_text(texto, call.message.chat.id, call.message.message_id,
+                                     reply_markup=markup, parse_mode="HTML")
+
+    pagina = pagina_detalhes(mes, int(numero))
+    if pagina:
+        return editar(pagina)
+
+    # Páginas expiraram: relê a planilha fora do handler e edita a mesma mensagem
+    def reler():
+        from services.sheets_service import obter_gastos_detalhados
+        gastos = obter_gastos_detalhados(mes_alvo=mes)
+        if gastos is not None:
+            editar(pagina_detalhes(mes, int(numero), montar_paginas_detalhes(mes, gastos)))
+
+    from services.tarefas_service import agendar
+    agendar(f"🧾 Detalhes {mes}", reler)
+
+
+@bot.callback_query_handler(func=lambda call: call.data == "pg_nada")
+def botao_indicador_pagina(call):
+    bot.answer_callback_query(call.id)
+
+
+# Registrado por último: comandos e botões do menu têm prioridade sobre a conversa em andamento
+@bot.message_handler(func=lambda m: conversas.obter(m.chat.id, m.from_user.id) is not None)
+def continuar_conversa(message):
+    conversa = conversas.obter(message.chat.id, message.from_user.id)
+    if not conversa:
+        return
+    estado, dados = conversa
+    passo = PASSOS_TEXTO.get(estado)
+    if passo:
+        passo(message, dados)
+    else:
+        fila_envio.send_message(message.chat.id, "📅 Selecione o mês nos botões da mensagem anterior.")
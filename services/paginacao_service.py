@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+from telebot import types
+
+from core.config import Config
+from core.database import listar_pendentes_pagina
+from core.models import Boleto
+from utils.helpers import formatar_bloco_boleto, centavos_para_valor
+
+LIMITE_TEXTO_PAGINA = 3800
+ITENS_POR_PAGINA_DETALHES = 15
+
+
+class CachePaginas:
+    """LRU com validade para páginas já renderizadas (texto + teclado)."""
+
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                self._itens.pop(chave, None)
+                return None
+            self._itens.move_to_end(chave)
+            return item[1]
+
+    def guardar(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_entradas:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, visao=None):
+        """Descarta as páginas de uma visão ("pendentes", "detalhes") ou todas."""
+        with self._trava:
+            for chave in [c for c in self._itens if visao is None or c[0] == visao]:
+                del self._itens[chave]
+
+
+_cache = CachePaginas(Config.PAGINAS_CACHE_MAX, Config.PAGINAS_TTL)
+
+
+def invalidar_paginas(visao=None):
+    _cache.invalidar(visao)
+
+
+def _boleto_da_linha(row):
+    return Boleto(origem=row['origem'], titulo=row['titulo'], valor=centavos_para_valor(row['valor_centavos']),
+                  linha_digitavel=row['linha_digitavel'], mes_referencia=row['mes_referencia'], pix=row['pix'],
+                  id=row['id'])
+
+
+# --- BOLETOS PENDENTES (KEYSET NO SQLITE) ---
+def pagina_pendentes(apos_id=None, antes_id=None):
+    """
+    Página de pendentes pronta para envio/edição: (texto, teclado). Navega por id
+    (callbacks pgp_a_<id> / pgp_b_<id>), então o custo não depende do tamanho do backlog.
+    """
+    chave = ("pendentes", apos_id, antes_id)
+    pagina = _cache.obter(chave)
+    if pagina:
+        return pagina
+
+    rows, ha_anterior, ha_proxima, total = listar_pendentes_pagina(Config.PAGINA_PENDENTES, apos_id, antes_id)
+    if not rows:
+        pagina = ("✅ Nada pendente!", None)
+        _cache.guardar(chave, pagina)
+        return pagina
+
+    markup = types.InlineKeyboardMarkup()
+    blocos = []
+    for indice, row in enumerate(rows, 1):
+        blocos.append(formatar_bloco_boleto(indice, _boleto_da_linha(row)))
+        markup.row(
+            types.InlineKeyboardButton(f"📊 {indice}", callback_data=f"grp_lnc_{row['id']}"),
+            types.InlineKeyboardButton(f"✅ {indice}", callback_data=f"grp_pago_{row['id']}"),
+        )
+
+    navegacao = []
+    if ha_anterior:
+        navegacao.append(types.InlineKeyboardButton("◀️", callback_data=f"pgp_b_{rows[0]['id']}"))
+    if ha_proxima:
+        navegacao.append(types.InlineKeyboardButton("▶️", callback_data=f"pgp_a_{rows[-1]['id']}"))
+    if navegacao:
+        markup.row(*navegacao)
+
+    pagina = (f"<b>🧾 BOLETOS PENDENTES ({total})</b>\n\n" + "".join(blocos), markup)
+    _cache.guardar(chave, pagina)
+    return pagina
+
+
+# --- DETALHES DO MÊS (PLANILHA) ---
+def _linha_gasto(g):
+    emoji_n = "🟢" if "-" in str(g['neko']) else "🔴"
+    emoji_b = "🟢" if "-" in str(g['baka']) else "🔴"
+    return (
+        f"🔹 <b>{g['item']}</b> ({g['categoria']})\n"
+        f"💰 Total: <code>R$ {g['valor']}</code>\n"
+        f"└ 🙋‍♂️ Neko: {emoji_n} <code>{g['neko']}</code> | 🙋‍♀️ Baka: {emoji_b} <code>{g['baka']}</code>\n"
+        "────────────────────\n"
+    )
+
+
+def montar_paginas_detalhes(mes, gastos):
+    """Quebra os gastos do mês em páginas (por tamanho e quantidade) e guarda no cache."""
+    paginas, atual, tamanho = [], [], 0
+    for g in gastos:
+        linha = _linha_gasto(g)
+        if atual and (tamanho + len(linha) > LIMITE_TEXTO_PAGINA or len(atual) >= ITENS_POR_PAGINA_DETALHES):
+            paginas.append("".join(atual))
+            atual, tamanho = [], 0
+        atual.append(linha)
+        tamanho += len(linha)
+    if atual:
+        paginas.append("".join(atual))
+    _cache.guardar(("detalhes", mes), paginas)
+    return paginas
+
+
+def pagina_detalhes(mes, numero, paginas=None):
+    """
+    Página `numero` (a partir de 0) dos detalhes do mês: (texto, teclado), ou None se as
+    páginas do mês não estiverem mais no cache (o chamador relê a planilha).
+    """
+    paginas = paginas if paginas is not None else _cache.obter(("detalhes", mes))
+    if paginas is None:
+        return None
+    if not paginas:
+        return f"📭 Nenhuma informação em <b>{mes}</b>.", None
+
+    numero = max(0, min(numero, len(paginas) - 1))
+    texto = (f"📝 <b>LISTA DETALHADA - {mes}</b>\n"
+             f"━━━━━━━━━━━━━━━━━━━━\n\n" + paginas[numero])
+    if len(paginas) == 1:
+        return texto, None
+
+    markup = types.InlineKeyboardMarkup()
+    navegacao = []
+    if numero > 0:
+        navegacao.append(types.InlineKeyboardButton("◀️", callback_data=f"pgd_{mes}_{numero - 1}"))
+    navegacao.append(types.InlineKeyboardButton(f"{numero + 1}/{len(paginas)}", callback_data="pg_nada"))
+    if numero < len(paginas) - 1:
+        navegacao.append(types.InlineKeyboardButton("▶️", callback_data=f"pgd_{mes}_{numero + 1}"))
+    markup.row(*navegacao)
+    return texto, markup
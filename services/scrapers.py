@@ -2,6 +2,7 @@ import re
 import time
 import os
 from datetime import datetime
+from functools import lru_cache
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -11,12 +12,21 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import python_anticaptcha
-import pyperclip
 
 # Imports internos
 from core.models import Boleto
 from core.config import Config
 from core.logger import logger
+from services.navegador_pool import criar_pool
+from utils.http_client import obter_sessao
+
+
+@lru_cache(maxsize=1)
+def _caminho_chromedriver():
+    """Resolve o chromedriver uma única vez por processo (o download/checagem é lento)."""
+    if os.path.exists("/data"):
+        return "/usr/bin/chromedriver"
+    return ChromeDriverManager().install()
 
 
 def configurar_driver():
@@ -43,182 +53,298 @@ def configurar_driver():
 
     if os.path.exists("/data"):
         options.binary_location = "/usr/bin/chromium"
-        service = Service(executable_path="/usr/bin/chromedriver")
-    else:
-        service = Service(ChromeDriverManager().install())
+    service = Service(executable_path=_caminho_chromedriver())
 
     return webdriver.Chrome(service=service, options=options)
 
 
+# Navegadores aquecidos compartilhados pelos scrapers (evita o cold start a cada execução)
+pool_navegadores = criar_pool(
+    configurar_driver,
+    tamanho=Config.NAVEGADORES_POOL,
+    max_usos=Config.NAVEGADOR_MAX_USOS,
+    limite_rss_mb=Config.NAVEGADOR_LIMITE_RSS_MB,
+    ocioso_segundos=Config.NAVEGADOR_OCIOSO_SEGUNDOS,
+    timeout_espera=Config.NAVEGADOR_TIMEOUT_ESPERA,
+)
+
+
 def scrap_semae_piracicaba():
     """Scraper para o portal do SEMAE Piracicaba com resolução de Captcha."""
-    driver = configurar_driver()
-    wait = WebDriverWait(driver, 20)
-    SITE_KEY = "6Le9VR4bAAAAAPKYAoYNcXcq3JbLLKGdLI9hzwN4"
-
-    try:
-        driver.get("https://agenciaweb.semaepiracicaba.sp.gov.br/")
-        logger.info("⌨️ Preenchendo dados SEMAE...")
-
-        wait.until(EC.presence_of_element_located((By.ID, "NrMatriculaUnidade"))).send_keys(Config.SEMAE_USER)
-        driver.find_element(By.ID, "NrCpfCnpj").send_keys(Config.SEMAE_CPF)
-        driver.find_element(By.ID, "sDsSenha").send_keys(Config.SEMAE_PASS)
-
-        # Resolução de Captcha via Anti-Captcha
-        client = python_anticaptcha.AnticaptchaClient(Config.ANTICAPTCHA_KEY)
-        task = python_anticaptcha.NoCaptchaTaskProxylessTask(driver.current_url, SITE_KEY)
-        job = client.createTask(task)
-        logger.info("⏳ Resolvendo Captcha SEMAE...")
-        job.join()
-
-        token = job.get_solution_response()
-        driver.execute_script(f'document.getElementById("g-recaptcha-response").innerHTML="{token}";')
-        driver.find_element(By.ID, "botao_login").click()
-
-        # Navegação após login
-        logger.info("✅ Login realizado. Navegando para faturas...")
-
-        # Passo 1: Clicar em Dados Cadastrais (ajuste o seletor se necessário para o menu)
-        btn_agencia = wait.until(EC.presence_of_element_located(
-            (By.XPATH, "//a[contains(@class, 'agencia') and contains(., 'MINHA AGÊNCIA')]")
-        ))
-
-        # Força o clique via JavaScript (ignora se o elemento está 'oculto' ou sobreposto)
-        driver.execute_script("arguments[0].click();", btn_agencia)
-
-        # Passo 2: Localizar a linha PENDENTE na tabela
-        # Buscamos a linha que contém o texto 'PENDENTE' dentro da tabela de faturas
-        linha_pendente = wait.until(EC.presence_of_element_located(
-            (By.XPATH, "//table[@id='GridFaturaResumo_Table']//tr[td[contains(text(), 'PENDENTE')]]")
-        ))
-
-        # Extração de Metadados da linha
-        colunas = linha_pendente.find_elements(By.TAG_NAME, "td")
-        mes_ref = colunas[1].text  # "12/2025"
-        valor_texto = colunas[4].text.replace('R$', '').strip()  # "66,75"
-
-        # Clica na linha para selecioná-la (necessário para habilitar o botão de código de barras)
-        linha_pendente.click()
-        time.sleep(1)
-
-        # Passo 3: Clicar no botão "Exibir código de barras"
-        btn_barras = wait.until(EC.element_to_be_clickable((By.ID, "btnExibirCodigoBarras")))
-        driver.execute_script("arguments[0].click();", btn_barras)
-
-        # Passo 4: Extrair o código do botão de cópiaick
-        btn_copiar = wait.until(EC.presence_of_element_located(
-            (By.XPATH, "//button[contains(text(), 'Copiar Código')]")
-        ))
-
-        onclick_attr = btn_copiar.get_attribute("onclick")
-        match_codigo = re.search(r"'\s*(\d+)\s*'", onclick_attr)
-
-        if match_codigo:
-            codigo_barras = match_codigo.group(1)
-            logger.info(f"💰 SEMAE: Fatura {mes_ref} capturada com sucesso.")
-
-            return Boleto(
-                origem="Finances/SEMAE",
-                titulo=f"Fatura Água SEMAE - {mes_ref}",
-                valor=valor_texto,
-                linha_digitavel=codigo_barras,
-                mes_referencia=mes_ref
-            )
-
-        return None
-
-    except Exception as e:
-        logger.error(f"❌ Erro no scraper SEMAE: {e}")
-        return None
-    finally:
-        driver.quit()
+    with pool_navegadores.emprestar() as driver:
+        wait = WebDriverWait(driver, 20)
+        SITE_KEY = "6Le9VR4bAAAAAPKYAoYNcXcq3JbLLKGdLI9hzwN4"
+
+        try:
+            driver.get("https://agenciaweb.semaepiracicaba.sp.gov.br/")
+            logger.info("⌨️ Preenchendo dados SEMAE...")
+
+            wait.until(EC.presence_of_element_located((By.ID, "NrMatriculaUnidade"))).send_keys(Config.SEMAE_USER)
+            driver.find_element(By.ID, "NrCpfCnpj").send_keys(Config.SEMAE_CPF)
+            driver.find_element(By.ID, "sDsSenha").send_keys(Config.SEMAE_PASS)
+
+            # Resolução de Captcha via Anti-Captcha
+            client = python_anticaptcha.AnticaptchaClient(Config.ANTICAPTCHA_KEY)
+            task = python_anticaptcha.NoCaptchaTaskProxylessTask(driver.current_url, SITE_KEY)
+            job = client.createTask(task)
+            logger.info("⏳ Resolvendo Captcha SEMAE...")
+            job.join()
+
+            token = job.get_solution_response()
+            driver.execute_script(f'document.getElementById("g-recaptcha-response").innerHTML="{token}";')
+            driver.find_element(By.ID, "botao_login").click()
+
+            # Navegação após login
+            logger.info("✅ Login realizado. Navegando para faturas...")
+
+            # Passo 1: Clicar em Dados Cadastrais (ajuste o seletor se necessário para o menu)
+            btn_agencia = wait.until(EC.presence_of_element_located(
+                (By.XPATH, "//a[contains(@class, 'agencia') and contains(., 'MINHA AGÊNCIA')]")
+            ))
+
+            # Força o clique via JavaScript (ignora se o elemento está 'oculto' ou sobreposto)
+            driver.execute_script("arguments[0].click();", btn_agencia)
+
+            # Passo 2: Localizar a linha PENDENTE na tabela
+            # Buscamos a linha que contém o texto 'PENDENTE' dentro da tabela de faturas
+            linha_pendente = wait.until(EC.presence_of_element_located(
+                (By.XPATH, "//table[@id='GridFaturaResumo_Table']//tr[td[contains(text(), 'PENDENTE')]]")
+            ))
+
+            # Extração de Metadados da linha
+            colunas = linha_pendente.find_elements(By.TAG_NAME, "td")
+            mes_ref = colunas[1].text  # "12/2025"
+            valor_texto = colunas[4].text.replace('R$', '').strip()  # "66,75"
+
+            # Clica na linha para selecioná-la (necessário para habilitar o botão de código de barras)
+            linha_pendente.click()
+            time.sleep(1)
+
+            # Passo 3: Clicar no botão "Exibir código de barras"
+            btn_barras = wait.until(EC.element_to_be_clickable((By.ID, "btnExibirCodigoBarras")))
+            driver.execute_script("arguments[0].click();", btn_barras)
+
+            # Passo 4: Extrair o código do botão de cópiaick
+            btn_copiar = wait.until(EC.presence_of_element_located(
+                (By.XPATH, "//button[contains(text(), 'Copiar Código')]")
+            ))
+
+            onclick_attr = btn_copiar.get_attribute("onclick")
+            match_codigo = re.search(r"'\s*(\d+)\s*'", onclick_attr)
+
+            if match_codigo:
+                codigo_barras = match_codigo.group(1)
+                logger.info(f"💰 SEMAE: Fatura {mes_ref} capturada com sucesso.")
+
+                return Boleto(
+                    origem="Finances/SEMAE",
+                    titulo=f"Fatura Água SEMAE - {mes_ref}",
+                    valor=valor_texto,
+                    linha_digitavel=codigo_barras,
+                    mes_referencia=mes_ref
+                )
+
+            return None
+
+        except Exception as e:
+            logger.error(f"❌ Erro no scraper SEMAE: {e}")
+            return None
+
+
+# Origem gravada nos boletos de cada scraper (liga a fonte ao histórico de entregas)
+ORIGENS_SCRAPERS = {
+    "scrap_semae_piracicaba": "Finances/SEMAE",
+    "scrap_llz_condominio": "Finances/Condomínio (LLZ)",
+    "scrap_llz_condominio_http": "Finances/Condomínio (LLZ)",
+    "scrap_llz_condominio_selenium": "Finances/Condomínio (LLZ)",
+}
+# Scrapers que gastam crédito de captcha a cada execução
+SCRAPERS_COM_CAPTCHA = {"scrap_semae_piracicaba"}
+
+
+def modo_scraper(nome_funcao):
+    """Modo configurado para o scraper: 'selenium' (padrão), 'http' ou 'auto'."""
+    return Config.MODOS_SCRAPERS.get(nome_funcao, "selenium")
+
+
+def _primeiro_campo(dados, *chaves):
+    """Retorna o primeiro campo preenchido entre os nomes possíveis (a API não é documentada)."""
+    for chave in chaves:
+        if dados.get(chave) not in (None, ""):
+            return dados[chave]
+    return None
+
+
+def _mes_referencia_de_vencimento(vencimento):
+    """Converte '2025-12-10', '2025-12-10T00:00:00' ou '10/12/2025' em '12/2025'."""
+    if vencimento:
+        match = re.search(r'(\d{4})-(\d{2})-\d{2}', str(vencimento))
+        if match:
+            return f"{match.group(2)}/{match.group(1)}"
+        match = re.search(r'\d{2}/(\d{2})/(\d{4})', str(vencimento))
+        if match:
+            return f"{match.group(1)}/{match.group(2)}"
+    return datetime.now().strftime("%m/%Y")
+
+
+def scrap_llz_condominio_http():
+    """
+    Versão sem navegador do scraper LLZ: faz login e lê os boletos direto na API
+    (JSON/XHR) consumida pelo portal, em duas requisições.
+    Retorna None se não houver boleto pendente; levanta exceção se a API falhar.
+    """
+    sessao = obter_sessao()
+    base = Config.LLZ_API_URL.rstrip('/')
+
+    logger.info("🔑 Realizando login na API LLZ (modo HTTP)...")
+    resp = sessao.post(base + Config.LLZ_ROTA_LOGIN,
+                       json={"email": Config.LLZ_USER, "password": Config.LLZ_PASS}, timeout=15)
+    resp.raise_for_status()
+    dados_login = resp.json()
+    token = _primeiro_campo(dados_login, "token", "access_token", "accessToken") \
+        or _primeiro_campo(dados_login.get("data") or {}, "token", "access_token", "accessToken")
+    if not token:
+        raise ValueError("Resposta de login da LLZ sem token.")
+
+    resp = sessao.get(base + Config.LLZ_ROTA_BOLETOS,
+                      headers={"Authorization": f"Bearer {token}"}, timeout=15)
+    resp.raise_for_status()
+    payload = resp.json()
+    itens = payload if isinstance(payload, list) else \
+        _primeiro_campo(payload, "data", "boletos", "items", "results") or []
+
+    for item in itens:
+        status = str(_primeiro_campo(item, "status", "situacao") or "").lower()
+        if _primeiro_campo(item, "pago", "paid") or status in ("pago", "paid", "liquidado", "cancelado"):
+            continue
+
+        codigo = _primeiro_campo(item, "linha_digitavel", "linhaDigitavel", "digitable_line",
+                                 "codigo_barras", "codigoBarras", "barcode")
+        if not codigo:
+            continue
+
+        valor = _primeiro_campo(item, "valor", "value", "amount")
+        if isinstance(valor, (int, float)):
+            valor = "{:.2f}".format(valor).replace('.', ',')
+        elif valor:
+            valor = str(valor).replace('R$', '').replace('\xa0', '').strip()
+
+        mes_ref = _mes_referencia_de_vencimento(
+            _primeiro_campo(item, "vencimento", "data_vencimento", "dataVencimento", "due_date", "dueDate"))
+
+        logger.info(f"💰 Código de barras LLZ obtido via API ({mes_ref}).")
+        return Boleto(
+            origem="Finances/Condomínio (LLZ)",
+            titulo="Fatura Condomínio - LLZ",
+            valor=valor,
+            linha_digitavel=str(codigo),
+            mes_referencia=mes_ref
+        )
+
+    logger.info("🍃 Nenhuma fatura pendente encontrada na LLZ (API).")
+    return None
 
 
 def scrap_llz_condominio():
-    """Scraper para o portal LLZ Garantidora para copiar código de barras do condomínio."""
-    driver = configurar_driver()
-    wait = WebDriverWait(driver, 20)
+    """
+    Scraper LLZ conforme o modo configurado: 'http' usa apenas a API,
+    'auto' tenta a API e recorre ao navegador se ela falhar, 'selenium' usa o navegador.
+    """
+    modo = modo_scraper("scrap_llz_condominio")
+    if modo in ("http", "auto"):
+        try:
+            return scrap_llz_condominio_http()
+        except Exception as e:
+            if modo == "http":
+                logger.error(f"❌ Erro no scraper LLZ (HTTP): {e}")
+                return None
+            logger.warning(f"⚠️ Modo HTTP da LLZ falhou ({e}). Usando o navegador...")
+    return scrap_llz_condominio_selenium()
 
-    try:
-        driver.get("https://cliente.llzgarantidora.com.br/auth/entrar")
-        logger.info("🔑 Realizando login no portal LLZ...")
 
-        wait.until(EC.presence_of_element_located((By.NAME, "email"))).send_keys(Config.LLZ_USER)
-        driver.find_element(By.NAME, "password").send_keys(Config.LLZ_PASS)
-        driver.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
+def scrap_llz_condominio_selenium():
+    """Scraper para o portal LLZ Garantidora para copiar código de barras do condomínio."""
+    with pool_navegadores.emprestar() as driver:
+        wait = WebDriverWait(driver, 20)
 
         try:
+            driver.get("https://cliente.llzgarantidora.com.br/auth/entrar")
+            logger.info("🔑 Realizando login no portal LLZ...")
 
-            try:
-                elemento_valor = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'R$')]"))
-                )
-                valor_texto = elemento_valor.text.replace('R$', '').replace('\xa0', '').strip()
-                logger.info(f"💰 Valor LLZ identificado: R$ {valor_texto}")
-            except Exception as e:
-                logger.warning(f"⚠️ Não foi possível capturar o valor da LLZ: {e}")
-                valor_texto = None
+            wait.until(EC.presence_of_element_located((By.NAME, "email"))).send_keys(Config.LLZ_USER)
+            driver.find_element(By.NAME, "password").send_keys(Config.LLZ_PASS)
+            driver.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
 
             try:
-                elementos = driver.find_elements(By.XPATH, "//*[contains(text(), '/20')]")
-
-                data_vencimento = None
-                for el in elementos:
-                    match = re.search(r'(\d{2}/\d{2}/\d{4})', el.text)
-                    if match:
-                        data_vencimento = match.group(1)
-                        break
-
-                if data_vencimento:
-                    mes_ref = "/".join(data_vencimento.split("/")[1:])
-                    logger.info(f"📅 Mês de referência LLZ: {mes_ref}")
-                else:
+
+                try:
+                    elemento_valor = wait.until(
+                        EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'R$')]"))
+                    )
+                    valor_texto = elemento_valor.text.replace('R$', '').replace('\xa0', '').strip()
+                    logger.info(f"💰 Valor LLZ identificado: R$ {valor_texto}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Não foi possível capturar o valor da LLZ: {e}")
+                    valor_texto = None
+
+                try:
+                    elementos = driver.find_elements(By.XPATH, "//*[contains(text(), '/20')]")
+
+                    data_vencimento = None
+                    for el in elementos:
+                        match = re.search(r'(\d{2}/\d{2}/\d{4})', el.text)
+                        if match:
+                            data_vencimento = match.group(1)
+                            break
+
+                    if data_vencimento:
+                        mes_ref = "/".join(data_vencimento.split("/")[1:])
+                        logger.info(f"📅 Mês de referência LLZ: {mes_ref}")
+                    else:
+                        mes_ref = datetime.now().strftime("%m/%Y")
+
+                except Exception as e:
+                    logger.warning(f"⚠️ Erro ao extrair data, usando mês atual: {e}")
                     mes_ref = datetime.now().strftime("%m/%Y")
 
+                btn_pagar = wait.until(
+                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Pagar')]"))
+                )
+                driver.execute_script("arguments[0].click();", btn_pagar)
+
+                driver.execute_script("""
+                    window.ultimo_codigo_copiado = "";
+                    navigator.clipboard.writeText = function(text) {
+                        window.ultimo_codigo_copiado = text;
+                        return Promise.resolve();
+                    };
+                """)
+
+                btn_copiar = wait.until(
+                    EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Copiar Código de Barras')]"))
+                )
+                driver.execute_script("arguments[0].click();", btn_copiar)
+
+                time.sleep(2)
+                codigo = driver.execute_script("return window.ultimo_codigo_copiado;")
+
+                logger.info("💰 Código de barras LLZ copiado com sucesso!")
+                return Boleto(
+                    origem="Finances/Condomínio (LLZ)",
+                    titulo="Fatura Condomínio - LLZ",
+                    valor=valor_texto,
+                    linha_digitavel=codigo,
+                    mes_referencia = mes_ref
+                )
+
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao extrair data, usando mês atual: {e}")
-                mes_ref = datetime.now().strftime("%m/%Y")
-
-            btn_pagar = wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Pagar')]"))
-            )
-            driver.execute_script("arguments[0].click();", btn_pagar)
-
-            driver.execute_script("""
-                window.ultimo_codigo_copiado = "";
-                navigator.clipboard.writeText = function(text) {
-                    window.ultimo_codigo_copiado = text;
-                    return Promise.resolve();
-                };
-            """)
-
-            btn_copiar = wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Copiar Código de Barras')]"))
-            )
-            driver.execute_script("arguments[0].click();", btn_copiar)
-
-            time.sleep(2)
-            codigo = driver.execute_script("return window.ultimo_codigo_copiado;")
-
-            logger.info("💰 Código de barras LLZ copiado com sucesso!")
-            return Boleto(
-                origem="Finances/Condomínio (LLZ)",
-                titulo="Fatura Condomínio - LLZ",
-                valor=valor_texto,
-                linha_digitavel=codigo,
-                mes_referencia = mes_ref
-            )
+                logger.info(f"🍃 Nenhuma fatura pendente encontrada na LLZ. Erro: {e}")
+                return None
 
         except Exception as e:
-            logger.info(f"🍃 Nenhuma fatura pendente encontrada na LLZ. Erro: {e}")
+            logger.error(f"❌ Erro no scraper LLZ: {e}")
             return None
 
-    except Exception as e:
-        logger.error(f"❌ Erro no scraper LLZ: {e}")
-        return None
-    finally:
-        driver.quit()
-
 
 if __name__ == '__main__':
     boleto_llz = scrap_llz_condominio()
@@ -1,6 +1,11 @@
-import re
 import os
+import threading
+import time
+from functools import lru_cache
+
 import gspread
+import requests
+from gspread.urls import SPREADSHEET_URL
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 from core.config import Config
@@ -10,18 +15,66 @@ from core.logger import logger
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CREDENTIALS_PATH = os.path.join(BASE_DIR, 'credentials.json')
 
+# Chave dos metadados de linha com que a fila marca cada gasto gravado
+CHAVE_MARCA = "boletobot_fila"
+
+
+# --- CONEXÃO REAPROVEITADA ---
+# O cliente autorizado e a planilha vivem enquanto o processo viver (o token é renovado
+# pela sessão do google-auth). As abas ficam em cache por "MM/AAAA" até expirar o TTL.
+_trava_conexao = threading.RLock()
+_conexao = {"cliente": None, "planilha": None}
+_abas = {}  # "MM/AAAA" -> (worksheet, expira_em)
+
+
+def _obter_planilha():
+    """Autoriza e abre a planilha uma única vez por processo."""
+    with _trava_conexao:
+        if _conexao["planilha"] is None:
+            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_PATH, scope)
+            # BackOff: respostas 429 (cota de 60 req/min) são repetidas com espera crescente
+            cliente = gspread.authorize(creds, http_client=gspread.BackOffHTTPClient)
+            # Pela chave é uma chamada direta; pelo nome é uma busca no Drive
+            if Config.SHEET_ID:
+                planilha = cliente.open_by_key(Config.SHEET_ID)
+            else:
+                planilha = cliente.open(Config.SHEET_NAME)
+            _conexao.update(cliente=cliente, planilha=planilha)
+            logger.info(f"🔌 Conectado à planilha '{planilha.title}'.")
+        return _conexao["planilha"]
+
+
+def _guardar_aba(titulo, aba):
+    _abas[titulo] = (aba, time.monotonic() + Config.SHEETS_TTL_ABAS)
+
+
+def invalidar_cache_sheets(reconectar=False):
+    """Esquece as abas em cache; com `reconectar`, descarta também cliente e planilha."""
+    invalidar_indice()
+    with _trava_conexao:
+        _abas.clear()
+        if reconectar:
+            _conexao.update(cliente=None, planilha=None)
+
 
 def obter_aba_mensal(spreadsheet, mes_alvo=None):
     """
     Localiza a aba do mês atual (MM/AAAA).
     Se não existir, cria uma nova duplicando a aba de índice 0 como modelo.
+    Uma única listagem de abas abastece o cache de todos os meses.
     """
     mes_alvo = mes_alvo if mes_alvo else datetime.now().strftime("%m/%Y")
-    try:
-        return spreadsheet.worksheet(mes_alvo)
-    except gspread.exceptions.WorksheetNotFound:
-        logger.info(f"✨ Criando nova aba para o mês {mes_alvo}...")
+    with _trava_conexao:
         abas = spreadsheet.worksheets()
+        _abas.clear()
+        for aba in abas:
+            _guardar_aba(aba.title, aba)
+
+        if mes_alvo in _abas:
+            return _abas[mes_alvo][0]
+
+        logger.info(f"✨ Criando nova aba para o mês {mes_alvo}...")
         aba_modelo = abas[0]  # template
 
         nova_aba = spreadsheet.duplicate_sheet(
@@ -29,155 +82,422 @@ def obter_aba_mensal(spreadsheet, mes_alvo=None):
             insert_sheet_index=0,
             new_sheet_name=mes_alvo
         )
+        _guardar_aba(mes_alvo, nova_aba)
         return nova_aba
 
 
+def _deve_reconectar(erro):
+    if isinstance(erro, requests.exceptions.ConnectionError):
+        return True
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None) in (401, 403)
+
+
 def conectar_sheets(mes_alvo=None):
-    """Configura a conexão com a API do Google Sheets."""
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_PATH, scope)
-    client = gspread.authorize(creds)
-    ss = client.open(Config.SHEET_NAME)
-    return obter_aba_mensal(ss, mes_alvo)
+    """
+    Devolve a aba do mês, reaproveitando a conexão e o cache de abas.
+    Se a sessão tiver caído (conexão ou credencial recusada), reconecta uma vez.
+    """
+    mes_alvo = mes_alvo if mes_alvo else datetime.now().strftime("%m/%Y")
+    with _trava_conexao:
+        cache = _abas.get(mes_alvo)
+        if cache and cache[1] > time.monotonic():
+            return cache[0]
 
+    try:
+        return obter_aba_mensal(_obter_planilha(), mes_alvo)
+    except (gspread.exceptions.APIError, requests.exceptions.ConnectionError) as e:
+        if not _deve_reconectar(e):
+            raise
+        logger.warning(f"🔄 Sessão do Google Sheets expirada ({e}); reconectando...")
+        invalidar_cache_sheets(reconectar=True)
+        return obter_aba_mensal(_obter_planilha(), mes_alvo)
+
+
+# --- ESCRITA EM LOTE ---
+def _celula(valor):
+    """Converte um valor Python no CellData da API (número continua número na planilha)."""
+    if isinstance(valor, bool):
+        return {"userEnteredValue": {"boolValue": valor}}
+    if isinstance(valor, (int, float)):
+        return {"userEnteredValue": {"numberValue": valor}}
+    texto = "" if valor is None else str(valor)
+    if texto.startswith("="):
+        return {"userEnteredValue": {"formulaValue": texto}}
+    return {"userEnteredValue": {"stringValue": texto}}
+
+
+class LoteEscrita:
+    """
+    Acumula inserções de linha e escritas de células de uma aba e envia tudo
+    num único spreadsheets.batchUpdate (uma ida à API, uma unidade da cota).
 
-def atualizar_valor_planilha(item_nome, valor_str, mes_referencia=None):
+    Linhas e colunas são 1-based, como no restante do gspread. Como contexto,
+    envia ao sair do bloco sem exceção:
+
+        with LoteEscrita(aba) as lote:
+            lote.inserir_linha(10)
+            lote.escrever(10, 1, ["MERCADO", "FEIRA", 50.0])
     """
-    Atualiza as contas fixas na planilha com lógica de compensação:
+
+    def __init__(self, aba):
+        self.aba = aba
+        self.requisicoes = []
+
+    def inserir_linha(self, linha):
+        """Insere uma linha vazia na posição `linha`, herdando a formatação da linha de cima."""
+        self.requisicoes.append({"insertDimension": {
+            "range": {"sheetId": self.aba.id, "dimension": "ROWS",
+                      "startIndex": linha - 1, "endIndex": linha},
+            "inheritFromBefore": linha > 1,
+        }})
+        return self
+
+    def escrever(self, linha, coluna, valores):
+        """Escreve `valores` em sequência na linha, a partir da coluna indicada."""
+        self.requisicoes.append({"updateCells": {
+            "start": {"sheetId": self.aba.id, "rowIndex": linha - 1, "columnIndex": coluna - 1},
+            "rows": [{"values": [_celula(v) for v in valores]}],
+            "fields": "userEnteredValue",
+        }})
+        return self
+
+    def marcar_linha(self, linha, marca):
+        """
+        Anexa à linha uma marca invisível (developer metadata), que acompanha a linha
+        quando outras são inseridas acima. Vai no mesmo batchUpdate: ou a linha e a marca
+        são aplicadas juntas, ou nenhuma das duas.
+        """
+        self.requisicoes.append({"createDeveloperMetadata": {"developerMetadata": {
+            "metadataKey": CHAVE_MARCA, "metadataValue": str(marca), "visibility": "DOCUMENT",
+            "location": {"dimensionRange": {"sheetId": self.aba.id, "dimension": "ROWS",
+                                            "startIndex": linha - 1, "endIndex": linha}},
+        }}})
+        return self
+
+    def enviar(self):
+        """Envia as requisições acumuladas (nada se o lote estiver vazio)."""
+        if not self.requisicoes:
+            return None
+        requisicoes, self.requisicoes = self.requisicoes, []
+        try:
+            return self.aba.spreadsheet.batch_update({"requests": requisicoes})
+        finally:
+            # Mesmo numa falha parte do lote pode ter sido aplicada: a próxima leitura vai à API
+            invalidar_leitura_mes(self.aba.title)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, erro, rastreio):
+        if tipo_erro is None:
+            self.enviar()
+        return False
+
+
+def linha_marcada(aba, marca):
+    """Linha (1-based) da aba que carrega a marca gravada por LoteEscrita.marcar_linha, ou None."""
+    planilha = aba.spreadsheet
+    resposta = planilha.client.request(
+        "post", f"{SPREADSHEET_URL % planilha.id}/developerMetadata:search",
+        json={"dataFilters": [{"developerMetadataLookup": {"metadataKey": CHAVE_MARCA,
+                                                            "metadataValue": str(marca)}}]},
+    ).json()
+    for encontrado in resposta.get("matchedDeveloperMetadata", []):
+        faixa = encontrado["developerMetadata"].get("location", {}).get("dimensionRange", {})
+        if faixa.get("sheetId") == aba.id:
+            return faixa.get("startIndex", 0) + 1
+    return None
+
+
+# --- ÍNDICE DE LINHAS ---
+def _normalizar(texto):
+    return (texto or "").strip().casefold()
+
+
+class IndiceLinhas:
+    """
+    Mapa local de uma aba mensal, montado a partir de uma leitura de A:B:
+    item (coluna B) -> primeira linha e categoria (coluna A) -> última linha.
+    Inserções feitas pelo bot atualizam o índice sem nova leitura.
+    """
+
+    def __init__(self, valores):
+        self.itens = {}
+        self.categorias = {}
+        self.ultima_linha_a = 0
+        self.expira_em = time.monotonic() + Config.SHEETS_TTL_INDICE
+        for numero, linha in enumerate(valores, start=1):
+            categoria = linha[0] if linha else ""
+            item = linha[1] if len(linha) > 1 else ""
+            if item.strip():
+                self.itens.setdefault(_normalizar(item), numero)
+            if categoria.strip():
+                self.categorias[_normalizar(categoria)] = numero
+                self.ultima_linha_a = numero
+
+    def linha_do_item(self, nome):
+        return self.itens.get(_normalizar(nome))
+
+    def ultima_linha_categoria(self, categoria):
+        return self.categorias.get(_normalizar(categoria))
+
+    def registrar_insercao(self, linha, categoria, item):
+        """Desloca as linhas abaixo de `linha` e registra a nova linha."""
+        for mapa in (self.itens, self.categorias):
+            for chave, numero in mapa.items():
+                if numero >= linha:
+                    mapa[chave] = numero + 1
+        if self.ultima_linha_a >= linha:
+            self.ultima_linha_a += 1
+
+        chave_item = _normalizar(item)
+        self.itens[chave_item] = min(self.itens.get(chave_item, linha), linha)
+        chave_cat = _normalizar(categoria)
+        self.categorias[chave_cat] = max(self.categorias.get(chave_cat, linha), linha)
+        self.ultima_linha_a = max(self.ultima_linha_a, linha)
+
+
+_indices = {}  # "MM/AAAA" -> IndiceLinhas
+_trava_indices = threading.Lock()
+
+
+def obter_indice(aba, renovar=False):
+    """Índice de linhas da aba, lido da API no máximo uma vez por TTL (ou quando `renovar`)."""
+    with _trava_indices:
+        indice = _indices.get(aba.title)
+        if indice and not renovar and indice.expira_em > time.monotonic():
+            return indice
+        indice = IndiceLinhas(aba.get("A:B"))
+        _indices[aba.title] = indice
+        return indice
+
+
+def invalidar_indice(mes_alvo=None):
+    """Descarta o índice do mês (ou de todos os meses)."""
+    with _trava_indices:
+        if mes_alvo is None:
+            _indices.clear()
+        else:
+            _indices.pop(mes_alvo, None)
+
+
+@lru_cache(maxsize=4)
+def _mapa_categorias(texto):
+    """Interpreta MAPA_CATEGORIAS uma única vez: [(trecho em minúsculas, nome na planilha)]."""
+    pares = [item.split(':', 1) for item in (texto or "").split(',') if ':' in item]
+    return tuple((k.strip().lower(), v.strip()) for k, v in pares if k.strip())
+
+
+def nome_na_planilha(item_nome):
+    """Traduz a origem do boleto para o nome da linha na planilha (Ex: 'Finances/Claro' -> 'CLARO')."""
+    item_lower = item_nome.lower()
+    for chave, real in _mapa_categorias(Config.MAPA_CATEGORIAS):
+        if chave in item_lower:
+            return real
+    return item_nome
+
+
+def preparar_provisionamento(lote, item_nome, valor_str):
+    """
+    Acrescenta ao lote a escrita das colunas C/D/E da conta fixa, com lógica de compensação:
     - NEKO (Coluna D): Recebe a parte dele POSITIVA (Débito com a Baka).
     - BAKA (Coluna E): Recebe a parte dela NEGATIVA (Crédito, pois ela pagou o banco).
+    Retorna o nome encontrado na planilha, ou None se o item não existir na aba.
+    Erros da API não são tratados aqui (quem envia o lote decide se tenta de novo).
     """
-    try:
-        mes_alvo = mes_referencia if mes_referencia else datetime.now().strftime("%m/%Y")
-        aba = conectar_sheets(mes_alvo)
+    aba = lote.aba
 
-        # 1. Limpeza para garantir formato numérico (Ex: R$ 1.234,56 -> 1234.56)
-        valor_limpo = valor_str.replace('R$', '').replace('.', '').replace(',', '.').strip()
-        valor_float = float(valor_limpo)
+    # 1. Limpeza para garantir formato numérico (Ex: R$ 1.234,56 -> 1234.56)
+    valor_limpo = valor_str.replace('R$', '').replace('.', '').replace(',', '.').strip()
+    valor_float = float(valor_limpo)
 
-        # 2. Cálculo das partes (Baseado nas taxas de rateio)
-        parte_neko = valor_float * Config.RATEIO_NEKO
-        parte_baka = (valor_float * Config.RATEIO_BAKA) * -1  # Negativo pois a Baka pagou o boleto
-
-        # 3. Formatação para o padrão brasileiro (vírgula)
-        valor_fmt = "{:.2f}".format(valor_float).replace('.', ',')
-        neko_fmt = "{:.2f}".format(parte_neko).replace('.', ',')
-        baka_fmt = "{:.2f}".format(parte_baka).replace('.', ',')
-
-        # 4. Mapeamento de nomes (Ex: 'Finances/Claro' -> 'CLARO')
-        mapa = {k.strip().lower(): v.strip() for k, v in
-                [item.split(':') for item in Config.MAPA_CATEGORIAS.split(',') if ':' in item]}
-
-        nome_busca = item_nome
-        for chave, real in mapa.items():
-            if chave in item_nome.lower():
-                nome_busca = real
-                break
-
-        # 5. Localização da célula e atualização em lote (Batch update para performance)
-        celula = aba.find(re.compile(f"^{nome_busca}$", re.IGNORECASE))
-
-        if celula:
-            # Atualiza Coluna C (Valor Total), D (Neko) e E (Baka)
-            aba.update_cell(celula.row, celula.col + 1, valor_fmt)  # Coluna C
-            aba.update_cell(celula.row, celula.col + 2, neko_fmt)  # Coluna D
-            aba.update_cell(celula.row, celula.col + 3, baka_fmt)  # Coluna E
-
-            logger.info(f"✅ Fatura {nome_busca} atualizada: Neko (+{neko_fmt}) | Baka ({baka_fmt})")
-            return True
-        else:
-            logger.warning(f"⚠️ Item '{nome_busca}' não encontrado na planilha.")
-            return False
+    # 2. Cálculo das partes (Baseado nas taxas de rateio)
+    parte_neko = valor_float * Config.RATEIO_NEKO
+    parte_baka = (valor_float * Config.RATEIO_BAKA) * -1  # Negativo pois a Baka pagou o boleto
+
+    # 3. Formatação para o padrão brasileiro (vírgula), só para o log
+    neko_fmt = "{:.2f}".format(parte_neko).replace('.', ',')
+    baka_fmt = "{:.2f}".format(parte_baka).replace('.', ',')
+
+    # 4. Mapeamento de nomes (Ex: 'Finances/Claro' -> 'CLARO')
+    nome_busca = nome_na_planilha(item_nome)
+
+    # 5. Localização da linha pelo índice local (reconstruído uma vez se o item não aparecer,
+    #    pois a planilha pode ter sido editada à mão)
+    linha = obter_indice(aba).linha_do_item(nome_busca)
+    if linha is None:
+        linha = obter_indice(aba, renovar=True).linha_do_item(nome_busca)
+
+    if linha is None:
+        logger.warning(f"⚠️ Item '{nome_busca}' não encontrado na planilha.")
+        return None
+
+    # Coluna C (Valor Total), D (Neko) e E (Baka)
+    lote.escrever(linha, 3, [round(valor_float, 2), round(parte_neko, 2), round(parte_baka, 2)])
+    logger.info(f"📝 Fatura {nome_busca}: Neko (+{neko_fmt}) | Baka ({baka_fmt})")
+    return nome_busca
+
+
+def atualizar_valor_planilha(item_nome, valor_str, mes_referencia=None):
+    """Atualiza uma conta fixa na planilha numa única chamada. Retorna True se gravou."""
+    try:
+        mes_alvo = mes_referencia if mes_referencia else datetime.now().strftime("%m/%Y")
+        with LoteEscrita(conectar_sheets(mes_alvo)) as lote:
+            nome = preparar_provisionamento(lote, item_nome, valor_str)
+        if nome:
+            logger.info(f"✅ Fatura {nome} atualizada em {mes_alvo}.")
+        return nome is not None
     except Exception as e:
         logger.error(f"❌ Erro ao atualizar planilha: {e}")
         return False
 
 
-def lancar_gasto_dinamico(categoria, item, valor_str, user_id, mes_referencia=None):
+def gravar_gasto(categoria, item, valor_str, user_id, mes_referencia=None, marca=None):
     """
     Insere gasto manual agrupando por categoria e calculando rateio por usuário.
+    Com `marca`, a linha gravada leva essa marca e, se ela já estiver na aba (envio
+    anterior aplicado sem confirmação), nada é escrito de novo.
+    Levanta a exceção da API em caso de falha; veja lancar_gasto_dinamico.
     """
-    try:
-        mes_alvo = mes_referencia if mes_referencia else datetime.now().strftime("%m/%Y")
-        aba = conectar_sheets(mes_alvo)
-        cat_upper = categoria.upper()
-        item_upper = item.upper()
-
-        valor_float = float(valor_str)
-
-        # Determina quem pagou e calcula as partes
-        if str(user_id) == Config.ID_NEKO:
-            # NEKO pagou: recebe crédito da parte que a BAKA deve
-            # A coluna do NEKO subtrai o que ele já adiantou
-            parte_neko = (valor_float * Config.RATEIO_NEKO) * -1
-            parte_baka = valor_float * Config.RATEIO_BAKA
-            logger.info(f"💰 Lançamento: NEKO pagou, BAKA deve {parte_baka}")
-        else:
-            # BAKA pagou: recebe crédito da parte que o NEKO deve
-            parte_baka = (valor_float * Config.RATEIO_BAKA) * -1
-            parte_neko = valor_float * Config.RATEIO_NEKO
-            logger.info(f"💰 Lançamento: BAKA pagou, NEKO deve {parte_neko}")
-
-        val_neko_fmt = "{:.2f}".format(parte_neko).replace('.', ',')
-        val_baka_fmt = "{:.2f}".format(parte_baka).replace('.', ',')
-
-        # --- LÓGICA SELETIVA DE ATUALIZAÇÃO ---
-        celula_existente = None
-        # SÓ tenta atualizar se for a categoria FIANÇA
-        if cat_upper == "CASA" and item_upper == "FIANÇA":
-            try:
-                celula_existente = aba.find(re.compile(f"^{item_upper}$", re.IGNORECASE), in_column=2)
-            except:
-                celula_existente = None
-
-        if celula_existente:
-            linha_alvo = celula_existente.row
-            logger.info(f"🔄 Atualizando Fiança na linha {linha_alvo}")
+    mes_alvo = mes_referencia if mes_referencia else datetime.now().strftime("%m/%Y")
+    aba = conectar_sheets(mes_alvo)
+    cat_upper = categoria.upper()
+    item_upper = item.upper()
+
+    valor_float = float(valor_str)
+
+    # Determina quem pagou e calcula as partes
+    if str(user_id) == Config.ID_NEKO:
+        # NEKO pagou: recebe crédito da parte que a BAKA deve
+        # A coluna do NEKO subtrai o que ele já adiantou
+        parte_neko = (valor_float * Config.RATEIO_NEKO) * -1
+        parte_baka = valor_float * Config.RATEIO_BAKA
+        logger.info(f"💰 Lançamento: NEKO pagou, BAKA deve {parte_baka}")
+    else:
+        # BAKA pagou: recebe crédito da parte que o NEKO deve
+        parte_baka = (valor_float * Config.RATEIO_BAKA) * -1
+        parte_neko = valor_float * Config.RATEIO_NEKO
+        logger.info(f"💰 Lançamento: BAKA pagou, NEKO deve {parte_neko}")
+
+    resultado = {
+        "sucesso": True, "categoria": cat_upper, "item": item_upper,
+        "total": valor_float, "parte_neko": parte_neko, "parte_baka": parte_baka
+    }
+    if marca is not None:
+        linha_gravada = linha_marcada(aba, marca)
+        if linha_gravada:
+            logger.info(f"♻️ Gasto {marca} já está na linha {linha_gravada} da aba {aba.title}; nada a reenviar.")
+            return resultado
+
+    # --- LÓGICA SELETIVA DE ATUALIZAÇÃO ---
+    indice = obter_indice(aba)
+    linha_existente = None
+    # SÓ tenta atualizar se for a categoria FIANÇA
+    if cat_upper == "CASA" and item_upper == "FIANÇA":
+        linha_existente = indice.linha_do_item(item_upper)
+
+    lote = LoteEscrita(aba)
+    if linha_existente:
+        linha_alvo = linha_existente
+        logger.info(f"🔄 Atualizando Fiança na linha {linha_alvo}")
+    else:
+        # Para outras categorias (Mercado, Lazer, etc) ou Fiança nova, INSERE linha
+        ultima_da_categoria = indice.ultima_linha_categoria(cat_upper)
+        if ultima_da_categoria:
+            linha_alvo = ultima_da_categoria + 1
         else:
-            # Para outras categorias (Mercado, Lazer, etc) ou Fiança nova, INSERE linha
-            celulas_cat = aba.findall(cat_upper, in_column=1)
-            if celulas_cat:
-                linha_alvo = celulas_cat[-1].row + 1
-            else:
-                valores_coluna_a = aba.col_values(1)
-                linha_alvo = len(valores_coluna_a) + 1
-                logger.info(f"📂 Nova categoria detectada ({cat_upper}). Alocando na linha {linha_alvo}")
-
-            aba.insert_row([], linha_alvo)
-            logger.info(f"➕ Inserindo novo gasto em {cat_upper}")
-
-        aba.update_cell(linha_alvo, 1, cat_upper)  # Coluna A: Categoria
-        aba.update_cell(linha_alvo, 2, item_upper)  # Coluna B: Item
-        aba.update_cell(linha_alvo, 3, valor_str.replace('.', ','))  # Coluna C: Valor Total
-        aba.update_cell(linha_alvo, 4, val_neko_fmt)  # Coluna D: Parte Neko
-        aba.update_cell(linha_alvo, 5, val_baka_fmt)  # Coluna E: Parte Baka
-
-        return {
-            "sucesso": True, "categoria": cat_upper, "item": item_upper,
-            "total": valor_float, "parte_neko": parte_neko, "parte_baka": parte_baka
-        }
+            linha_alvo = indice.ultima_linha_a + 1
+            logger.info(f"📂 Nova categoria detectada ({cat_upper}). Alocando na linha {linha_alvo}")
+
+        lote.inserir_linha(linha_alvo)
+        logger.info(f"➕ Inserindo novo gasto em {cat_upper}")
+
+    # Colunas A (Categoria), B (Item), C (Valor Total), D (Parte Neko) e E (Parte Baka)
+    lote.escrever(linha_alvo, 1, [cat_upper, item_upper, round(valor_float, 2),
+                                  round(parte_neko, 2), round(parte_baka, 2)])
+    if marca is not None:
+        lote.marcar_linha(linha_alvo, marca)
+    try:
+        lote.enviar()
+    except Exception:
+        # Não se sabe se a inserção foi aplicada: a próxima consulta relê a aba
+        invalidar_indice(aba.title)
+        raise
+
+    if not linha_existente:
+        indice.registrar_insercao(linha_alvo, cat_upper, item_upper)
+
+    return resultado
+
+
+def lancar_gasto_dinamico(categoria, item, valor_str, user_id, mes_referencia=None):
+    """Versão tolerante de gravar_gasto: erros viram {"sucesso": False} e ficam no log."""
+    try:
+        return gravar_gasto(categoria, item, valor_str, user_id, mes_referencia)
     except Exception as e:
         logger.error(f"❌ Erro no lançamento dinâmico: {e}")
         return {"sucesso": False}
 
 
+# --- LEITURAS EM CACHE ---
+# Resumo (H3:H5) e detalhes (A3:E) de cada aba mensal chegam numa única chamada e ficam
+# em cache por Config.SHEETS_TTL_LEITURA segundos; qualquer escrita do bot na aba invalida.
+_leituras = {}  # "MM/AAAA" -> (dados, expira_em)
+_trava_leituras = threading.Lock()
+
+
+def invalidar_leitura_mes(mes_alvo):
+    """Descarta o resumo/detalhes em cache do mês (chamado após escritas na aba)."""
+    with _trava_leituras:
+        _leituras.pop(mes_alvo, None)
+
+
+def _interpretar_gastos(linhas):
+    gastos = []
+    for linha in linhas:
+        # O batch_get não completa as linhas com células vazias no fim
+        linha = list(linha) + [""] * (5 - len(linha))
+        if linha[1].strip() and linha[0].strip():
+            gastos.append({
+                'categoria': linha[0].strip(),
+                'item': linha[1].strip(),
+                'valor': linha[2].strip(),
+                'neko': linha[3].strip() or "0,00",
+                'baka': linha[4].strip() or "0,00"
+            })
+    return gastos
+
+
+def _ler_mes(mes_alvo):
+    """Lê (ou devolve do cache) o resumo e os gastos da aba do mês."""
+    with _trava_leituras:
+        cache = _leituras.get(mes_alvo)
+        if cache and cache[1] > time.monotonic():
+            return cache[0]
+
+    aba = conectar_sheets(mes_alvo)
+    resumo, detalhes = aba.batch_get(["H3:H5", "A3:E"])
+    totais = [(linha[0] if linha else None) for linha in resumo] + [None] * 3
+    dados = {
+        "resumo": {"geral": totais[0], "baka": totais[1], "neko": totais[2]},
+        "gastos": _interpretar_gastos(detalhes),
+    }
+
+    with _trava_leituras:
+        _leituras[mes_alvo] = (dados, time.monotonic() + Config.SHEETS_TTL_LEITURA)
+    return dados
+
+
 def obter_resumo_financeiro(mes_alvo=None):
     """
-    Lê os totais da tabela (G3:G5).
+    Lê os totais da tabela (H3:H5).
     Agora suporta a busca por um mês específico vindo do seletor.
     """
     try:
         # Se mes_alvo for None, usa o mês atual (comportamento original)
         mes_busca = mes_alvo if mes_alvo else datetime.now().strftime("%m/%Y")
-
-        # Conecta na aba do mês selecionado
-        aba = conectar_sheets(mes_busca)
-
-        return {
-            "geral": aba.acell('H3').value,
-            "baka": aba.acell('H4').value,
-            "neko": aba.acell('H5').value
-        }
+        return dict(_ler_mes(mes_busca)["resumo"])
     except Exception as e:
         logger.error(f"❌ Erro ao ler resumo do mês {mes_alvo}: {e}")
         return None
@@ -190,25 +510,7 @@ def obter_gastos_detalhados(mes_alvo=None):
     try:
         # Se não passar mês, usa o atual
         mes_busca = mes_alvo if mes_alvo else datetime.now().strftime("%m/%Y")
-        aba = conectar_sheets(mes_alvo=mes_busca)
-
-        todas_as_linhas = aba.get_all_values()
-
-        if len(todas_as_linhas) < 3:
-            return []
-
-        gastos = []
-        for linha in todas_as_linhas[2:]:
-            if len(linha) >= 3 and linha[1].strip():
-                if linha[0].strip():
-                    gastos.append({
-                        'categoria': linha[0].strip(),
-                        'item': linha[1].strip(),
-                        'valor': linha[2].strip(),
-                        'neko': linha[3].strip() if len(linha) > 3 else "0,00",
-                        'baka': linha[4].strip() if len(linha) > 4 else "0,00"
-                    })
-        return gastos
+        return list(_ler_mes(mes_busca)["gastos"])
     except Exception as e:
         logger.error(f"❌ Erro ao buscar detalhes de {mes_alvo}: {e}")
         return None
@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import Config
+from core.logger import logger
+
+# Tarefas longas (coleta, leituras da planilha) rodam aqui, fora das threads do polling
+_executor = ThreadPoolExecutor(max_workers=Config.TAREFAS_WORKERS, thread_name_prefix="tarefa")
+_em_andamento = set()
+_trava = threading.Lock()
+
+# Intervalo mínimo entre edições intermediárias da mensagem (limite de edição do Telegram)
+INTERVALO_EDICAO = 1.5
+MAX_ETAPAS_VISIVEIS = 15
+
+
+class Progresso:
+    """
+    Mensagem do Telegram que acompanha uma tarefa em segundo plano: é enviada no início
+    e editada a cada etapa (com limite de frequência) e no resultado final.
+    """
+
+    def __init__(self, chat_id, titulo):
+        self.chat_id = chat_id
+        self.titulo = titulo
+        self.message_id = None
+        self.finalizado = False
+        self._etapas = []
+        self._ultima_edicao = 0.0
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def _fila():
+        # Import local para evitar Circular Import
+        from services.notification_service import fila_envio
+        return fila_envio
+
+    def _compor(self, rodape):
+        linhas = [f"<b>{self.titulo}</b>"] + self._etapas[-MAX_ETAPAS_VISIVEIS:]
+        if rodape:
+            linhas.append(rodape)
+        return "\n".join(linhas)
+
+    def _editar(self, texto, reply_markup=None, forcar=False):
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_edicao < INTERVALO_EDICAO:
+            return
+        self._ultima_edicao = agora
+        try:
+            if self.message_id is None:
+                # O id da mensagem é necessário para as edições seguintes: espera a entrega
+                msg = self._fila().send_message(self.chat_id, texto, reply_markup=reply_markup,
+                                                parse_mode="HTML").result(timeout=60)
+                self.message_id = msg.message_id
+            else:
+                # Edições seguem pela fila do chat, na ordem
+                self._fila().edit_message_text(texto, self.chat_id, self.message_id,
+                                               reply_markup=reply_markup, parse_mode="HTML")
+        except Exception as e:
+            logger.warning(f"⚠️ Não consegui atualizar o progresso de '{self.titulo}': {e}")
+
+    def iniciar(self, texto="⏳ Em andamento..."):
+        with self._trava:
+            self._editar(self._compor(texto), forcar=True)
+
+    def etapa(self, texto):
+        """Acrescenta uma linha de andamento (ex: fonte concluída)."""
+        with self._trava:
+            self._etapas.append(texto)
+            self._editar(self._compor("⏳ Em andamento..."))
+
+    def concluir(self, texto=None, reply_markup=None, rodape="✅ Concluído."):
+        """Resultado final: `texto` substitui a mensagem; sem ele, mostra as etapas com o `rodape`."""
+        with self._trava:
+            self.finalizado = True
+            self._editar(texto or self._compor(rodape), reply_markup=reply_markup, forcar=True)
+
+    def falhar(self, texto):
+        with self._trava:
+            self.finalizado = True
+            self._editar(self._compor(texto), forcar=True)
+
+
+def executar_em_segundo_plano(chat_id, titulo, funcao, chave=None, texto_inicial="⏳ Em andamento..."):
+    """
+    Agenda `funcao(progresso)` no executor e retorna na hora, sem bloquear o handler.
+    Com `chave`, recusa (retorna False) se já houver uma tarefa igual rodando.
+    """
+    with _trava:
+        if chave and chave in _em_andamento:
+            return False
+        if chave:
+            _em_andamento.add(chave)
+
+    progresso = Progresso(chat_id, titulo)
+
+    def rodar():
+        inicio = time.monotonic()
+        try:
+            progresso.iniciar(texto_inicial)
+            funcao(progresso)
+            if not progresso.finalizado:
+                progresso.concluir()
+        except Exception as e:
+            logger.error(f"💥 Erro na tarefa '{titulo}': {e}")
+            progresso.falhar(f"❌ Erro: {e}")
+        finally:
+            if chave:
+                with _trava:
+                    _em_andamento.discard(chave)
+            logger.info(f"🧵 Tarefa '{titulo}' finalizada em {time.monotonic() - inicio:.1f}s.")
+
+    _executor.submit(rodar)
+    return True
+
+
+def agendar(titulo, funcao, *args):
+    """Roda `funcao(*args)` no executor, sem mensagem de progresso (ex: reler dados para editar uma tela)."""
+    def rodar():
+        try:
+            funcao(*args)
+        except Exception as e:
+            logger.error(f"💥 Erro na tarefa '{titulo}': {e}")
+
+    _executor.submit(rodar)
@@ -0,0 +1,165 @@
+"""
+Modo webhook: um servidor HTTP embutido recebe os updates do Telegram e os despacha
+para um pool de threads, respondendo 200 na hora.
+
+Teste local (sem registrar no Telegram, deixe WEBHOOK_URL vazio e BOT_MODO=webhook):
+    python main.py
+    python -m services.webhook_service update.json [http://127.0.0.1:8080/telegram]
+O update.json pode ser um item do `result` de getUpdates (ou a lista inteira).
+"""
+import hashlib
+import hmac
+import json
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+from core.config import Config
+from core.logger import logger
+
+CABECALHO_SEGREDO = "X-Telegram-Bot-Api-Secret-Token"
+# Updates do Telegram são pequenos; corpo maior que isso é descartado
+MAX_CORPO_BYTES = 1024 * 1024
+ROTA_SAUDE = "/saude"
+
+_executor = None
+
+
+def segredo_webhook():
+    """Segredo configurado ou, na falta dele, um derivado do token (estável entre reinícios)."""
+    if Config.WEBHOOK_SEGREDO:
+        return Config.WEBHOOK_SEGREDO
+    return hashlib.sha256(Config.TELEGRAM_TOKEN.encode()).hexdigest()[:64]
+
+
+def _processar(dados):
+    # Import local para evitar Circular Import
+    from services.notification_service import bot
+    try:
+        bot.process_new_updates([types.Update.de_json(dados)])
+    except Exception as e:
+        logger.error(f"💥 Erro ao processar update {dados.get('update_id')}: {e}")
+
+
+class _ReceptorUpdates(BaseHTTPRequestHandler):
+    server_version = "BoletoBot"
+
+    def _responder(self, status, corpo=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if corpo:
+            self.wfile.write(corpo)
+
+    def do_GET(self):
+        # Health check (ex: Fly.io); não expõe nada além de "ok"
+        if self.path == ROTA_SAUDE:
+            return self._responder(200, b"ok")
+        self._responder(404)
+
+    def do_POST(self):
+        if self.path != Config.WEBHOOK_CAMINHO:
+            return self._responder(404)
+
+        recebido = self.headers.get(CABECALHO_SEGREDO, "")
+        if not hmac.compare_digest(recebido.encode(), segredo_webhook().encode()):
+            logger.warning(f"🚫 Webhook recusado: segredo inválido (de {self.client_address[0]}).")
+            return self._responder(403)
+
+        try:
+            tamanho = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            return self._responder(400)
+        if tamanho <= 0 or tamanho > MAX_CORPO_BYTES:
+            return self._responder(413 if tamanho > 0 else 400)
+
+        try:
+            dados = json.loads(self.rfile.read(tamanho))
+        except (ValueError, UnicodeDecodeError):
+            return self._responder(400)
+
+        # Aceita um update ou uma lista deles (útil para reproduzir gravações)
+        updates = dados if isinstance(dados, list) else [dados]
+        if not all(isinstance(u, dict) and "update_id" in u for u in updates):
+            return self._responder(400)
+
+        # O Telegram só precisa do 200; o processamento segue no pool
+        for update in updates:
+            _executor.submit(_processar, update)
+        self._responder(200)
+
+    def log_message(self, formato, *args):
+        logger.debug(f"🌐 {self.address_string()} {formato % args}")
+
+
+def criar_servidor(host="0.0.0.0", porta=None):
+    """Cria o servidor HTTP (e o pool de despacho) sem iniciar o loop."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=Config.WEBHOOK_WORKERS, thread_name_prefix="webhook")
+    return ThreadingHTTPServer((host, porta or Config.WEBHOOK_PORTA), _ReceptorUpdates)
+
+
+def iniciar_webhook():
+    """
+    Sobe o servidor e registra o webhook no Telegram (se WEBHOOK_URL estiver definido).
+    Bloqueia enquanto o servidor estiver no ar; retorna False se não conseguiu subir,
+    para o chamador cair no polling.
+    """
+    from services.notification_service import bot
+
+    try:
+        servidor = criar_servidor()
+    except OSError as e:
+        logger.error(f"❌ Não foi possível abrir a porta {Config.WEBHOOK_PORTA} do webhook: {e}")
+        return False
+
+    if Config.WEBHOOK_URL:
+        url = Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_CAMINHO
+        try:
+            bot.set_webhook(url=url, secret_token=segredo_webhook(),
+                            allowed_updates=["message", "callback_query"],
+                            max_connections=Config.WEBHOOK_WORKERS)
+            logger.info(f"🔗 Webhook registrado em {url}.")
+        except Exception as e:
+            logger.error(f"❌ Falha ao registrar o webhook: {e}")
+            servidor.server_close()
+            return False
+    else:
+        logger.warning("⚠️ WEBHOOK_URL vazio: servidor no ar sem registrar no Telegram (modo de teste local).")
+
+    logger.info(f"🌐 Webhook ouvindo na porta {Config.WEBHOOK_PORTA} ({Config.WEBHOOK_CAMINHO}).")
+    try:
+        servidor.serve_forever()
+    except Exception as e:
+        logger.error(f"💥 Servidor do webhook caiu: {e}")
+        return False
+    finally:
+        servidor.server_close()
+    return True
+
+
+def enviar_update_gravado(caminho_json, url=None):
+    """Reenvia um update gravado (JSON) ao servidor local, com o cabeçalho de segredo."""
+    url = url or f"http://127.0.0.1:{Config.WEBHOOK_PORTA}{Config.WEBHOOK_CAMINHO}"
+    with open(caminho_json, "rb") as f:
+        corpo = f.read()
+    requisicao = urllib.request.Request(url, data=corpo, method="POST", headers={
+        "Content-Type": "application/json",
+        CABECALHO_SEGREDO: segredo_webhook(),
+    })
+    try:
+        with urllib.request.urlopen(requisicao, timeout=10) as resposta:
+            return resposta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("uso: python -m services.webhook_service update.json [url]")
+    print(enviar_update_gravado(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Os módulos do bot leem o .env na importação: valores mínimos para rodar sem credenciais
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:teste")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,130 @@
+"""Acurácia do extrator em documentos reais e no corpus sintético dos benchmarks (DVs FEBRABAN e CRC do PIX)."""
+import datetime
+import random
+
+import pytest
+
+from benchmarks.corpus import (formatar_linha, gerar_corpus_emails, gerar_linha_arrecadacao, gerar_linha_bancaria,
+                               gerar_linha_invalida, gerar_pix)
+import utils.extractor as extractor
+from utils.extractor import decodificar_linha, escanear_texto, extrair_dados_de_texto
+
+# Posições dos dígitos verificadores: campos 1-3 e DV geral (47) / DV de cada bloco (48)
+DVS_BANCARIA = (9, 20, 31, 32)
+DVS_ARRECADACAO = (11, 23, 35, 47)
+
+# Documentos reais (exemplos publicados), com o que cada um deve render
+BOLETO_BB = "00190.50095 40144.816069 06809.350314 3 37370000000100"  # R$ 1,00, vence 31/12/2007
+CONTA_LUZ = "83640000001-1 33120138000-2 81288462711-6 08013618155-1"  # R$ 133,12 (segmento energia)
+PIX_BACEN = ("00020126580014br.gov.bcb.pix0136123e4567-e12b-12d1-a456-4266554400005204000053039865802BR"
+             "5913Fulano de Tal6008BRASILIA62070503***63041D3D")  # QR estático do manual do Pix, sem valor
+
+
+def _trocar_digito(linha, posicao):
+    novo = str((int(linha[posicao]) + 1 + random.Random(posicao).randint(0, 8)) % 10)
+    return linha[:posicao] + novo + linha[posicao + 1:]
+
+
+class _Hoje(datetime.date):
+    """Fixa o 'hoje' usado na escolha da base do fator de vencimento."""
+
+    @classmethod
+    def today(cls):
+        return cls(2007, 12, 10)
+
+
+def test_boleto_bancario_real(monkeypatch):
+    monkeypatch.setattr(extractor, "date", _Hoje)
+    dados = decodificar_linha("".join(filter(str.isdigit, BOLETO_BB)))
+    assert dados == {"tipo": "bancaria", "valido": True, "valor": "1,00", "vencimento": datetime.date(2007, 12, 31)}
+    assert extrair_dados_de_texto(f"Linha digitável: {BOLETO_BB}") == {
+        "linha": "00190500954014481606906809350314337370000000100", "pix": None, "valor": "1,00"}
+
+
+def test_conta_de_arrecadacao_real():
+    linha = "".join(filter(str.isdigit, CONTA_LUZ))
+    # Arrecadação não traz fator de vencimento: a data fica por conta do texto do e-mail
+    assert decodificar_linha(linha) == {"tipo": "arrecadacao", "valido": True, "valor": "133,12",
+                                        "vencimento": None}
+    assert extrair_dados_de_texto(f"Código de barras: {CONTA_LUZ}") == {"linha": linha, "pix": None,
+                                                                         "valor": "133,12"}
+
+
+def test_pix_real():
+    # Sem o campo 54 (valor), o valor só viria de um "R$" no texto
+    assert extrair_dados_de_texto(f"Pix copia e cola: {PIX_BACEN}") == {"linha": None, "pix": PIX_BACEN,
+                                                                         "valor": None}
+    assert extrair_dados_de_texto(f"{PIX_BACEN}\nTotal: R$ 1.234,56")["valor"] == "1234,56"
+
+
+def test_corpus_de_emails_sem_erros():
+    corpus = gerar_corpus_emails(200)
+    erros = [(esperado, extrair_dados_de_texto(html)) for html, esperado in corpus]
+    erros = [(e, d) for e, d in erros if (d["linha"], d["pix"], d["valor"]) != (e["linha"], e["pix"], e["valor"])]
+    assert not erros, f"{len(erros)} e-mail(s) com extração errada, ex: {erros[0]}"
+
+
+@pytest.mark.parametrize("identificador", "6789")
+def test_linhas_de_arrecadacao_validas_sao_aceitas(identificador):
+    rng = random.Random(identificador)
+    for _ in range(200):
+        valor = rng.randint(1, 10 ** 7)
+        linha = gerar_linha_arrecadacao(rng, valor, identificador=identificador)
+        dados = decodificar_linha(linha)
+        assert dados["valido"], linha
+        # Só os identificadores 6 e 8 trazem valor efetivo
+        esperado = f"{valor // 100},{valor % 100:02d}" if identificador in "68" else None
+        assert dados["valor"] == esperado
+
+
+def test_linhas_bancarias_validas_sao_aceitas():
+    rng = random.Random(47)
+    for _ in range(500):
+        valor = rng.randint(1, 10 ** 7)
+        linha = gerar_linha_bancaria(rng, valor)
+        dados = decodificar_linha(linha)
+        assert dados["valido"], linha
+        assert dados["valor"] == f"{valor // 100},{valor % 100:02d}"
+        assert extrair_dados_de_texto(f"Pague até o vencimento: {formatar_linha(linha)}")["linha"] == linha
+
+
+def test_dv_errado_e_rejeitado():
+    rng = random.Random(11)
+    for _ in range(100):
+        bancaria = gerar_linha_bancaria(rng, rng.randint(1, 10 ** 6))
+        arrecadacao = gerar_linha_arrecadacao(rng, rng.randint(1, 10 ** 6), identificador=rng.choice("6789"))
+        for linha, posicoes in ((bancaria, DVS_BANCARIA), (arrecadacao, DVS_ARRECADACAO)):
+            for posicao in posicoes:
+                errada = _trocar_digito(linha, posicao)
+                assert not decodificar_linha(errada)["valido"], (linha, posicao)
+                assert extrair_dados_de_texto(formatar_linha(errada))["linha"] is None
+
+
+def test_iscas_sao_ignoradas_em_favor_da_linha_real():
+    rng = random.Random(5)
+    for tamanho in (47, 48) * 50:
+        isca = gerar_linha_invalida(rng, tamanho)
+        linha = gerar_linha_bancaria(rng, 12345) if tamanho == 47 else gerar_linha_arrecadacao(rng, 12345)
+        assert extrair_dados_de_texto(f"Contrato {isca}")["linha"] is None
+        texto = f"Contrato {isca}\nLinha digitável: {formatar_linha(linha)}"
+        assert extrair_dados_de_texto(texto)["linha"] == linha
+
+
+def test_crc_do_pix_e_verificado():
+    rng = random.Random(16)
+    for _ in range(100):
+        pix = gerar_pix(rng, rng.randint(100, 10 ** 6))
+        crc_errado = pix[:-4] + ("0000" if pix[-4:] != "0000" else "FFFF")
+
+        candidatos, _ = escanear_texto(f"PIX: {pix}")
+        assert [(c.tipo, c.codigo, c.valido) for c in candidatos] == [("pix", pix, True)]
+        candidatos, _ = escanear_texto(f"PIX: {crc_errado}")
+        assert [c.valido for c in candidatos] == [False]
+        # O válido tem prioridade mesmo aparecendo depois de um corrompido
+        assert extrair_dados_de_texto(f"{crc_errado}\n{pix}")["pix"] == pix
+
+
+def test_pix_quebrado_em_linhas_e_remontado():
+    pix = gerar_pix(random.Random(3), 4321)
+    texto = f"Pague com PIX:\n{pix[:40]}\n{pix[40:80]}\n{pix[80:]}"
+    assert extrair_dados_de_texto(texto)["pix"] == pix
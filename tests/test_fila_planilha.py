@@ -0,0 +1,77 @@
+"""Gasto da fila da planilha: um envio aplicado sem confirmação não é gravado de novo."""
+import requests
+
+import services.fila_planilha_service as fila
+import services.paginacao_service as paginacao
+import services.sheets_service as sheets
+
+
+class _RespostaBusca:
+    def __init__(self, corpo):
+        self.corpo = corpo
+
+    def json(self):
+        return self.corpo
+
+
+class _PlanilhaFalsa:
+    """Aplica os batchUpdates e guarda as marcas de linha; a primeira resposta se perde."""
+
+    id = "planilha"
+
+    def __init__(self):
+        self.client = self
+        self.envios = 0
+        self.marcas = {}
+
+    def batch_update(self, corpo):
+        self.envios += 1
+        for req in corpo["requests"]:
+            meta = req.get("createDeveloperMetadata", {}).get("developerMetadata")
+            if meta:
+                self.marcas[meta["metadataValue"]] = meta["location"]
+        if self.envios == 1:
+            raise requests.exceptions.ReadTimeout("resposta não chegou")
+        return {}
+
+    def request(self, metodo, url, json=None):
+        valor = json["dataFilters"][0]["developerMetadataLookup"]["metadataValue"]
+        local = self.marcas.get(valor)
+        return _RespostaBusca({"matchedDeveloperMetadata": [{"developerMetadata": {"location": local}}]}
+                              if local else {})
+
+
+class _AbaFalsa:
+    id = 7
+    title = "05/2026"
+
+    def __init__(self):
+        self.spreadsheet = _PlanilhaFalsa()
+
+    def get(self, intervalo):
+        return [["MERCADO", "FEIRA"]]
+
+
+def test_gasto_reenviado_apos_timeout_nao_duplica(monkeypatch):
+    aba = _AbaFalsa()
+    sheets.invalidar_indice()
+    monkeypatch.setattr(sheets, "conectar_sheets", lambda mes=None: aba)
+    reagendados, concluidos = [], []
+    monkeypatch.setattr(fila, "reagendar_escrita", lambda id_item, erro, atraso: reagendados.append(id_item))
+    monkeypatch.setattr(fila, "concluir_escritas", lambda ids, **kw: concluidos.extend(ids))
+    monkeypatch.setattr(fila, "_avisar", lambda *a, **kw: None)
+
+    item = {"id": 1, "tipo": "gasto", "tentativas": 0, "mes_referencia": "05/2026",
+            "criado_em": "2026-05-01 10:00:00", "chat_id": None, "message_id": None,
+            "dados": {"categoria": "Mercado", "item": "Feira", "valor": 50.0, "user_id": 1}}
+    fila._enviar_gasto(item)
+    assert reagendados == [1] and concluidos == []
+
+    # A nova tentativa encontra a marca da linha já aplicada e não envia outro batchUpdate
+    paginacao.montar_paginas_detalhes("05/2026", [])
+    fila._enviar_gasto(dict(item, tentativas=1))
+    assert concluidos == [1]
+    assert aba.spreadsheet.envios == 1
+    # Gasto confirmado: a lista detalhada do mês em cache deixa de valer
+    assert paginacao.pagina_detalhes("05/2026", 0) is None
+    sheets.invalidar_indice()
@@ -0,0 +1,103 @@
+"""Interpretação de respostas UID FETCH gravadas (formato devolvido pelo imaplib)."""
+from services.gmail_service import _baixar_partes, _buscar_cabecalhos
+from utils.imap_estrutura import (ParteMensagem, como_bytes, decodificar_texto, interpretar_fetch, listar_partes,
+                                  tokenizar)
+
+# multipart/mixed com multipart/alternative (texto + HTML) e um PDF anexado, como o Gmail devolve
+ESTRUTURA_ANINHADA = (
+    b'((("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "ISO-8859-1") NIL NIL "BASE64" 2048 27 NIL NIL NIL NIL) "ALTERNATIVE" '
+    b'("BOUNDARY" "000b1") NIL NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "fatura.pdf") "<anexo@id>" NIL "BASE64" 51234 NIL '
+    b'("ATTACHMENT" ("FILENAME" "Fatura Comgas.pdf")) NIL NIL) "MIXED" ("BOUNDARY" "000b0") NIL NIL NIL)'
+)
+CABECALHO = (b"Subject: =?UTF-8?Q?Sua_fatura_Comg=C3=A1s?=\r\n"
+             b"Date: Mon, 10 Nov 2025 08:30:00 -0300\r\n"
+             b"Message-ID: <fatura-123@comgas.com.br>\r\n\r\n")
+CAMPOS = b"BODY[HEADER.FIELDS (SUBJECT DATE MESSAGE-ID)]"
+
+# Duas mensagens num único FETCH: cabeçalho como literal {n} e como string entre aspas
+RESPOSTA_CABECALHOS = [
+    (b"1 (UID 101 BODYSTRUCTURE " + ESTRUTURA_ANINHADA + b" " + CAMPOS + b" {%d}" % len(CABECALHO), CABECALHO),
+    b")",
+    b'2 (UID 102 BODYSTRUCTURE ("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "7BIT" 10 1 NIL NIL NIL NIL) '
+    + CAMPOS + b' "Subject: Fatura \\"Claro\\" de novembro")',
+    b"3 (UID 103 BODYSTRUCTURE NIL " + CAMPOS + b" NIL)",
+]
+
+
+class _ClienteGravado:
+    def __init__(self, resposta):
+        self.resposta = resposta
+        self.comandos = []
+
+    def uid(self, comando, conjunto, itens):
+        self.comandos.append((comando, conjunto, itens))
+        return "OK", self.resposta
+
+
+class _MailboxGravada:
+    def __init__(self, resposta):
+        self.client = _ClienteGravado(resposta)
+
+
+def test_tokenizar_atomos_nil_aspas_e_literais():
+    tokens = tokenizar(b'(UID 7 FLAGS (\\Seen) X NIL Y "a \\"b\\" c" Z {3}\r\nabc)')
+    assert tokens == [["UID", "7", "FLAGS", ["\\Seen"], "X", None, "Y", 'a "b" c', "Z", b"abc"]]
+
+
+def test_tokenizar_literal_com_parenteses_no_conteudo():
+    assert tokenizar(b"(BODY[1] {5}\r\n(a)b) X)") == [["BODY[1]", b"(a)b)", "X"]]
+
+
+def test_estrutura_aninhada_vira_partes_numeradas():
+    itens = interpretar_fetch(RESPOSTA_CABECALHOS)[101]
+    partes = listar_partes(itens["BODYSTRUCTURE"])
+
+    assert [(p.numero, p.tipo, p.codificacao) for p in partes] == [
+        ("1.1", "text/plain", "quoted-printable"),
+        ("1.2", "text/html", "base64"),
+        ("2", "application/pdf", "base64"),
+    ]
+    assert partes[1].parametros["charset"] == "ISO-8859-1"
+    assert partes[2].nome_arquivo == "Fatura Comgas.pdf"
+    assert partes[2].tamanho == 51234
+    assert [p.eh_texto for p in partes] == [True, True, False]
+    assert partes[2].eh_pdf
+
+
+def test_parte_unica_e_estrutura_nil():
+    fetch = interpretar_fetch(RESPOSTA_CABECALHOS)
+    assert [(p.numero, p.tipo) for p in listar_partes(fetch[102]["BODYSTRUCTURE"])] == [("1", "text/html")]
+    assert listar_partes(fetch[103]["BODYSTRUCTURE"]) == []
+
+
+def test_como_bytes_aceita_literal_aspas_e_nil():
+    assert como_bytes(b"abc") == b"abc"
+    assert como_bytes("ção") == "ção".encode("utf-8")
+    assert como_bytes(None) == b""
+
+
+def test_cabecalhos_de_literal_aspas_e_nil():
+    mailbox = _MailboxGravada(RESPOSTA_CABECALHOS)
+    cabecalhos = {c.uid: c for c in _buscar_cabecalhos(mailbox, [101, 102, 103])}
+
+    assert cabecalhos[101].assunto == "Sua fatura Comgás"
+    assert cabecalhos[101].message_id == "<fatura-123@comgas.com.br>"
+    assert cabecalhos[101].data.strftime("%d/%m/%Y %H:%M") == "10/11/2025 08:30"
+    assert len(cabecalhos[101].partes) == 3
+    # String entre aspas não pode virar cabeçalho vazio
+    assert cabecalhos[102].assunto == 'Fatura "Claro" de novembro'
+    assert cabecalhos[103].assunto == "" and cabecalhos[103].message_id == ""
+    assert mailbox.client.comandos[0][1] == "101,102,103"
+
+
+def test_baixar_partes_com_literal_e_aspas():
+    html = "<p>Linha digitável: 8466 R$ 10,00</p>".encode("latin-1")
+    resposta = [(b"1 (UID 101 BODY[1.2] {%d}" % len(html), html), b' BODY[1.1] "Total R$ 10,00")']
+    partes = [ParteMensagem("1.1", "text/plain"), ParteMensagem("1.2", "text/html", {"charset": "ISO-8859-1"})]
+
+    conteudos = _baixar_partes(_MailboxGravada(resposta), 101, partes)
+
+    assert decodificar_texto(partes[0], conteudos["1.1"]) == "Total R$ 10,00"
+    assert decodificar_texto(partes[1], conteudos["1.2"]) == "<p>Linha digitável: 8466 R$ 10,00</p>"
@@ -0,0 +1,24 @@
+"""Migração 4: duplicatas antigas saem de boletos, mas ficam guardadas em boletos_duplicados."""
+import sqlite3
+
+from core.database import aplicar_migracoes
+
+
+def test_duplicatas_vao_para_boletos_duplicados(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "base.db"))
+    conn.row_factory = sqlite3.Row
+    aplicar_migracoes(conn, ate=3)
+    conn.executemany(
+        "INSERT INTO boletos (origem, titulo, linha_digitavel, pago, mes_referencia) VALUES (?, ?, ?, ?, ?)",
+        [("Luz", "Fatura", "111", 0, "05/2026"),
+         ("Luz", "Fatura (reenvio)", "111", 1, "05/2026"),
+         ("Água", "Fatura", "222", 0, "05/2026")])
+    conn.commit()
+
+    aplicar_migracoes(conn)
+
+    restantes = conn.execute("SELECT id, pago FROM boletos ORDER BY id").fetchall()
+    assert [(r["id"], r["pago"]) for r in restantes] == [(1, 1), (3, 0)]
+    copias = conn.execute("SELECT id, titulo, id_mantido, digital FROM boletos_duplicados").fetchall()
+    assert [tuple(r) for r in copias] == [(2, "Fatura (reenvio)", 1, "linha_digitavel")]
+    conn.close()
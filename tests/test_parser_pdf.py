@@ -0,0 +1,66 @@
+"""Varredura página a página do texto dos PDFs (sem abrir PDFs de verdade)."""
+import random
+import sqlite3
+
+import utils.parser_pdf as parser_pdf
+from benchmarks.corpus import formatar_linha, gerar_linha_arrecadacao, gerar_pix
+from core.config import Config
+from utils.parser_pdf import _varrer_paginas
+
+
+def _paginas(textos, lidas):
+    for texto in textos:
+        lidas.append(texto)
+        yield texto
+
+
+def _dados(semente=1, valor=12345):
+    rng = random.Random(semente)
+    return gerar_linha_arrecadacao(rng, valor), gerar_pix(rng, valor)
+
+
+def test_para_ao_achar_linha_e_pix_na_mesma_pagina():
+    linha, pix = _dados()
+    lidas = []
+    textos = ["capa", f"Linha digitável:\n{formatar_linha(linha)}\nPIX:\n{pix}", "histórico", "avisos"]
+    dados = _varrer_paginas(_paginas(textos, lidas))
+    assert (dados["linha"], dados["pix"], dados["valor"]) == (linha, pix, "123,45")
+    assert len(lidas) == 2
+
+
+def test_pix_quebrado_na_virada_de_pagina():
+    linha, pix = _dados(2)
+    textos = [f"{formatar_linha(linha)}\nPague com PIX:\n{pix[:70]}", f"{pix[70:]}\nAtendimento 0800"]
+    dados = _varrer_paginas(_paginas(textos, []))
+    assert dados["linha"] == linha
+    assert dados["pix"] == pix
+
+
+def test_le_paginas_extras_atras_do_que_falta(monkeypatch):
+    monkeypatch.setattr(Config, "PDF_PAGINAS_APOS_ACHADO", 1)
+    linha, pix = _dados(3)
+    lidas = []
+    textos = [formatar_linha(linha), "consumo", "tributos", pix]
+    dados = _varrer_paginas(_paginas(textos, lidas))
+    # Lê só mais uma página depois da linha e desiste do PIX
+    assert dados["linha"] == linha and dados["pix"] is None
+    assert len(lidas) == 2
+
+
+def test_sem_linha_usa_o_ultimo_valor_em_reais():
+    dados = _varrer_paginas(_paginas(["Subtotal R$ 10,00", "TOTAL A PAGAR R$ 1.234,56"], []))
+    assert dados == {"linha": None, "pix": None, "valor": "1234,56"}
+
+
+def test_base_travada_nao_impede_a_extracao(monkeypatch, tmp_path):
+    def travada(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    esperado = {"linha": "123", "pix": None, "valor": "1,00"}
+    monkeypatch.setattr(parser_pdf, "buscar_cache_pdf", travada)
+    monkeypatch.setattr(parser_pdf, "salvar_cache_pdf", travada)
+    monkeypatch.setattr(Config, "PDF_PROCESSO_ISOLADO", False)
+    monkeypatch.setattr(parser_pdf, "_extrair_dados_pdf_sem_cache", lambda caminho, senha: dict(esperado))
+    caminho = tmp_path / "fatura.pdf"
+    caminho.write_bytes(b"%PDF-1.4")
+    assert parser_pdf.extrair_dados_pdf(str(caminho)) == esperado
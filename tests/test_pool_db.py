@@ -0,0 +1,70 @@
+"""Transações do pool de conexões: blocos aninhados não encerram a transação externa."""
+import sqlite3
+
+import pytest
+
+from core.pool_db import PoolConexoes
+
+
+@pytest.fixture
+def pool(tmp_path):
+    caminho = str(tmp_path / "pool.db")
+    pool = PoolConexoes(lambda: sqlite3.connect(caminho, check_same_thread=False), tamanho=2)
+    with pool.conexao() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+    yield pool
+    pool.fechar()
+
+
+def _valores(pool):
+    with pool.conexao() as conn:
+        return [v for (v,) in conn.execute("SELECT v FROM t ORDER BY v")]
+
+
+def test_rollback_externo_desfaz_bloco_aninhado(pool):
+    with pytest.raises(RuntimeError):
+        with pool.conexao(imediata=True) as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            with pool.conexao() as interna:
+                interna.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("falha depois do bloco aninhado")
+    assert _valores(pool) == []
+
+
+def test_erro_no_bloco_aninhado_desfaz_so_o_aninhado(pool):
+    with pool.conexao(imediata=True) as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(ValueError):
+            with pool.conexao() as interna:
+                interna.execute("INSERT INTO t VALUES (2)")
+                raise ValueError
+        assert conn.in_transaction
+        conn.execute("INSERT INTO t VALUES (3)")
+    assert _valores(pool) == [1, 3]
+
+
+def test_aninhado_sem_transacao_externa_grava(pool):
+    with pool.conexao() as conn:
+        conn.execute("SELECT 1").fetchone()
+        with pool.conexao() as interna:
+            interna.execute("INSERT INTO t VALUES (5)")
+    assert _valores(pool) == [5]
+    assert pool.estatisticas()["em_uso"] == 0
+
+
+def test_funcao_do_banco_dentro_de_transacao_nao_faz_commit(tmp_path, monkeypatch):
+    import core.database as database
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "boletos.db"))
+    monkeypatch.setattr(database, "_pool", PoolConexoes(database._abrir_conexao, tamanho=2))
+    database.inicializar_db()
+
+    with pytest.raises(RuntimeError):
+        with database.transacao():
+            database.salvar_conversa("chat:1", "valor", {}, 9e12)
+            database.confirmar_sync_label("Finances/Teste", 1, 10, [("<m1@teste>", 10)])
+            raise RuntimeError("falha antes do fim da transação")
+
+    assert database.obter_conversa("chat:1") is None
+    assert database.obter_sync_label("Finances/Teste") is None
+    assert not database.mensagem_processada("<m1@teste>")
+    database._pool.fechar()
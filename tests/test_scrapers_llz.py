@@ -0,0 +1,99 @@
+"""Modo HTTP do scraper LLZ contra um stub local da API (sem rede nem navegador)."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import services.scrapers as scrapers
+from core.config import Config
+
+TOKEN = "tok-123"
+
+
+class _StubLLZ(BaseHTTPRequestHandler):
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        self.server.chamadas.append(("POST", self.path))
+        tamanho = int(self.headers.get("Content-Length", 0))
+        credenciais = json.loads(self.rfile.read(tamanho) or b"{}")
+        if self.server.status_login != 200:
+            return self._responder(self.server.status_login, {"erro": "indisponível"})
+        if credenciais.get("email") != "morador@teste":
+            return self._responder(401, {"erro": "credenciais"})
+        self._responder(200, {"data": {"accessToken": TOKEN}})
+
+    def do_GET(self):
+        self.server.chamadas.append(("GET", self.path))
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            return self._responder(401, {"erro": "token"})
+        self._responder(200, {"boletos": self.server.boletos})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLZ)
+    servidor.chamadas, servidor.boletos, servidor.status_login = [], [], 200
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(Config, "LLZ_API_URL", f"http://127.0.0.1:{servidor.server_address[1]}/")
+    monkeypatch.setattr(Config, "LLZ_ROTA_LOGIN", "/auth/login")
+    monkeypatch.setattr(Config, "LLZ_ROTA_BOLETOS", "/boletos")
+    monkeypatch.setattr(Config, "LLZ_USER", "morador@teste")
+    monkeypatch.setattr(Config, "LLZ_PASS", "segredo")
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_http_retorna_primeiro_boleto_pendente(stub):
+    stub.boletos = [
+        {"linhaDigitavel": "11111", "valor": 10.0, "status": "PAGO", "vencimento": "2025-10-10"},
+        {"linhaDigitavel": "23790000000000000000000000000000000000000012345", "valor": 1234.5,
+         "status": "aberto", "dataVencimento": "2025-11-10T00:00:00"},
+    ]
+    boleto = scrapers.scrap_llz_condominio_http()
+
+    assert boleto.linha_digitavel == "23790000000000000000000000000000000000000012345"
+    assert boleto.valor == "1234,50"
+    assert boleto.mes_referencia == "11/2025"
+    assert boleto.origem == "Finances/Condomínio (LLZ)"
+    assert stub.chamadas == [("POST", "/auth/login"), ("GET", "/boletos")]
+
+
+def test_http_sem_pendentes_retorna_none(stub):
+    stub.boletos = [{"linha_digitavel": "11111", "pago": True}]
+    assert scrapers.scrap_llz_condominio_http() is None
+
+
+def test_http_login_com_erro_nao_e_repetido(stub):
+    stub.status_login = 503
+    with pytest.raises(Exception):
+        scrapers.scrap_llz_condominio_http()
+    # POST não é idempotente: uma única tentativa, sem as retentativas da sessão
+    assert stub.chamadas == [("POST", "/auth/login")]
+
+
+def test_auto_recorre_ao_navegador_quando_a_api_falha(stub, monkeypatch):
+    stub.status_login = 500
+    monkeypatch.setattr(Config, "MODOS_SCRAPERS", {"scrap_llz_condominio": "auto"})
+    monkeypatch.setattr(scrapers, "scrap_llz_condominio_selenium", lambda: "via navegador")
+    assert scrapers.scrap_llz_condominio() == "via navegador"
+
+
+def test_modo_padrao_e_selenium(monkeypatch):
+    monkeypatch.setattr(Config, "MODOS_SCRAPERS", {})
+    monkeypatch.setattr(scrapers, "scrap_llz_condominio_http",
+                        lambda: pytest.fail("o modo HTTP não deve rodar sem ser ativado"))
+    monkeypatch.setattr(scrapers, "scrap_llz_condominio_selenium", lambda: "via navegador")
+    assert scrapers.scrap_llz_condominio() == "via navegador"
@@ -1,68 +1,242 @@
 import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
 from core.logger import logger
 
+# Incrementar sempre que a lógica de extração (texto ou PDF) mudar: invalida o cache de PDFs
+VERSAO_EXTRATOR = "3"
+
+# Trechos com cara de linha digitável: 46+ caracteres de dígitos e separadores.
+# O portão é só uma classe de caracteres, o caminho mais rápido do `re`; as regex
+# estritas (e a validação) rodam apenas dentro desses trechos.
+_TRECHO_NUMERICO = re.compile(r'[0-9][0-9.\s\-]{45,}')
+# Linha bancária (47) ou de arrecadação (48, começa com 8), sem dígitos colados nas pontas
+_LINHA = re.compile(
+    r'(?<![0-9])(?P<bancaria>\d{5}[\.\s]?\d{5}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d[\.\s]?\d{14})(?![0-9])'
+    r'|(?<![0-9])(?P<arrecadacao>8\d{10}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d)(?![0-9])'
+)
+_PIX = re.compile(r'000201[\s\S]*?6304[A-Fa-f0-9]{4}')
+_VALOR_RS = re.compile(r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})')
+_NAO_DIGITO = re.compile(r'\D')
+_QUEBRAS = re.compile(r'[\r\n]+')
+_ESPACOS = re.compile(r'\s+')
+_FIM_PIX = re.compile(r'6304[A-Fa-f0-9]{4}')
+
+# Fator de vencimento: base original e a nova base após o fator 9999 (FEBRABAN, fev/2025)
+_BASE_FATOR = date(1997, 10, 7)
+_BASE_FATOR_2025 = date(2025, 2, 22)
+
+
+@dataclass
+class Candidato:
+    """Um código de pagamento encontrado no texto, com posição e resultado da validação."""
+    tipo: str  # "bancaria", "arrecadacao" ou "pix"
+    codigo: str
+    inicio: int
+    fim: int
+    valido: bool
+    valor: Optional[str] = None  # Formato da planilha: "1234,56"
+    vencimento: Optional[date] = None
+
+
+# --- DÍGITOS VERIFICADORES (FEBRABAN) ---
+def _mod10(numero):
+    soma, peso = 0, 2
+    for digito in reversed(numero):
+        produto = int(digito) * peso
+        soma += produto // 10 + produto % 10
+        peso = 1 if peso == 2 else 2
+    return (10 - soma % 10) % 10
+
+
+def _mod11(numero):
+    soma, peso = 0, 2
+    for digito in reversed(numero):
+        soma += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    return soma % 11
+
+
+def _dv_bancario(numero):
+    dv = 11 - _mod11(numero)
+    return 1 if dv in (0, 10, 11) else dv
+
+
+def _dv_arrecadacao(numero):
+    resto = _mod11(numero)
+    return 0 if resto in (0, 1) else 11 - resto
+
+
+def _formatar_centavos(centavos):
+    return "{:.2f}".format(centavos / 100.0).replace('.', ',') if centavos > 0 else None
+
+
+def _vencimento_por_fator(fator):
+    """Converte o fator de vencimento em data, escolhendo a base mais próxima de hoje."""
+    if fator == 0:
+        return None
+    opcoes = [_BASE_FATOR + timedelta(days=fator)]
+    if fator >= 1000:
+        opcoes.append(_BASE_FATOR_2025 + timedelta(days=fator - 1000))
+    return min(opcoes, key=lambda d: abs((d - date.today()).days))
+
+
+def decodificar_linha(linha):
+    """
+    Valida e decodifica uma linha digitável (só dígitos).
+    Retorna {"tipo", "valido", "valor", "vencimento"} ou None se o tamanho não bater.
+    """
+    if len(linha) == 47:
+        campos_ok = (
+            _mod10(linha[0:9]) == int(linha[9])
+            and _mod10(linha[10:20]) == int(linha[20])
+            and _mod10(linha[21:31]) == int(linha[31])
+        )
+        # Código de barras: banco+moeda, DV, fator+valor, campo livre
+        barras = linha[0:4] + linha[32] + linha[33:47] + linha[4:9] + linha[10:20] + linha[21:31]
+        geral_ok = _dv_bancario(barras[:4] + barras[5:]) == int(barras[4])
+        return {
+            "tipo": "bancaria",
+            "valido": campos_ok and geral_ok,
+            "valor": _formatar_centavos(int(linha[37:47])),
+            "vencimento": _vencimento_por_fator(int(linha[33:37])),
+        }
+
+    if len(linha) == 48 and linha.startswith('8'):
+        # O 3º dígito define o módulo: 6/7 -> módulo 10, 8/9 -> módulo 11
+        identificador = linha[2]
+        calcular = _mod10 if identificador in "67" else _dv_arrecadacao
+        blocos = [linha[i:i + 12] for i in range(0, 48, 12)]
+        blocos_ok = all(calcular(b[:11]) == int(b[11]) for b in blocos)
+        barras = "".join(b[:11] for b in blocos)
+        geral_ok = calcular(barras[:3] + barras[4:]) == int(barras[3])
+        # Só 6 e 8 trazem valor efetivo em reais (7 e 9 são valor de referência)
+        valor = _formatar_centavos(int(barras[4:15])) if identificador in "68" else None
+        return {
+            "tipo": "arrecadacao",
+            "valido": blocos_ok and geral_ok,
+            "valor": valor,
+            "vencimento": None,
+        }
+
+    return None
+
+
+def _crc16_pix(payload):
+    crc = 0xFFFF
+    for byte in payload.encode("utf-8"):
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return "{:04X}".format(crc)
+
+
+def _pix_valido(payload):
+    return len(payload) > 8 and _crc16_pix(payload[:-4]) == payload[-4:].upper()
+
+
+def _candidato_pix(texto, inicio, fim):
+    """
+    Reconstrói o PIX a partir do trecho casado. Tenta remover só as quebras de linha
+    (nomes de recebedor têm espaços) e depois todos os espaços; se o CRC não fechar,
+    procura um '6304XXXX' mais adiante antes de desistir.
+    """
+    primeiro = None
+    for m_fim in _FIM_PIX.finditer(texto, fim - 8, min(len(texto), inicio + 600)):
+        trecho = texto[inicio:m_fim.end()]
+        for variante in (_QUEBRAS.sub('', trecho), _ESPACOS.sub('', trecho)):
+            if _pix_valido(variante):
+                return Candidato("pix", variante, inicio, m_fim.end(), True)
+        if primeiro is None:
+            primeiro = Candidato("pix", _ESPACOS.sub('', trecho), inicio, m_fim.end(), False)
+    return primeiro
+
+
+def _linhas_do_trecho(texto, inicio, fim):
+    """
+    Procura linhas digitáveis dentro de um trecho numérico. Uma sequência que casa
+    mas não passa nos DVs não consome o trecho: a busca recomeça um caractere depois,
+    para não perder a linha real colada a um número qualquer.
+    """
+    pos = inicio
+    while True:
+        m = _LINHA.search(texto, pos, fim)
+        if not m:
+            return
+        grupo = m.lastgroup
+        linha = _NAO_DIGITO.sub('', m.group(grupo))
+        dados = decodificar_linha(linha)
+        yield Candidato(dados["tipo"], linha, m.start(), m.end(), dados["valido"],
+                        dados["valor"], dados["vencimento"])
+        pos = m.end() if dados["valido"] else m.start() + 1
+
+
+def escanear_texto(texto):
+    """
+    Varre o texto e devolve (candidatos, valores_rs):
+    - candidatos: linhas digitáveis e PIX com posição e validação, já ordenados
+      (válidos primeiro, depois os que trazem valor, depois a ordem no texto);
+    - valores_rs: valores "R$ x,xx" encontrados, na ordem do texto.
+    """
+    candidatos = []
+    if not texto:
+        return candidatos, []
+
+    for m in _TRECHO_NUMERICO.finditer(texto):
+        candidatos.extend(_linhas_do_trecho(texto, m.start(), m.end()))
+
+    for m in _PIX.finditer(texto):
+        candidato = _candidato_pix(texto, m.start(), m.end())
+        if candidato:
+            candidatos.append(candidato)
+
+    candidatos.sort(key=lambda c: (not c.valido, c.valor is None, c.inicio))
+    return candidatos, _VALOR_RS.findall(texto)
+
+
 def extrair_valor_da_linha(linha):
     """
     Decodifica o valor diretamente da linha digitável.
     Suporta Boletos Bancários (final da linha) e Contas de Consumo (início da linha).
     """
-    if not linha or len(linha) < 44:
+    if not linha:
         return None
-
     try:
-        # CASO 1: Contas de Consumo/Tributos (Começa com 8)
-        # O valor fica entre a 5ª e a 15ª posição
-        if linha.startswith('8'):
-            valor_str = linha[12:16]
-            valor_float = int(valor_str) / 100.0
-        # CASO 2: Boletos Bancários Comuns
-        # O valor está nos últimos 10 dígitos
-        else:
-            valor_str = linha[-10:]
-            valor_float = int(valor_str) / 100.0
-
-        if valor_float > 0:
-            # Retorna formatado com vírgula para o padrão brasileiro da planilha
-            return "{:.2f}".format(valor_float).replace('.', ',')
-
+        dados = decodificar_linha(_NAO_DIGITO.sub('', linha))
+        return dados["valor"] if dados else None
     except Exception as e:
         logger.error(f"Erro ao decodificar valor da linha: {e}")
         return None
-    return None
+
 
 def extrair_dados_de_texto(texto):
     """
     Inteligência central: recebe qualquer string e retorna
     um dicionário padronizado com linha digitável, PIX e valor.
+    Linhas com dígitos verificadores inválidos são descartadas.
     """
-    # Regexes otimizadas
-    regex_ld = r'(\d{5}[\.\s]?\d{5}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d[\.\s]?\d{14})|(\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d[\-\s]?\d{11}[\-\s]?\d)'
-    regex_pix = r'000201[\s\S]*?6304[A-Fa-f0-9]{4}'
-    regex_valor_rs = r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})'
-
     res = {"linha": None, "pix": None, "valor": None}
 
-    if not texto:
-        return res
-
-    # 1. Busca Linha Digitável
-    m_ld = re.search(regex_ld, texto)
-    if m_ld:
-        res["linha"] = re.sub(r'\D', '', m_ld.group(0))
-        # Tenta extrair o valor matemático embutido na linha
-        res["valor"] = extrair_valor_da_linha(res["linha"])
-
-    # 2. Busca Pix Copia e Cola
-    m_pix = re.search(regex_pix, texto)
-    if m_pix:
-        res["pix"] = re.sub(r'\s+', '', m_pix.group(0))
-
-    # 3. Busca Valor por extenso (R$) se a linha digitável não informou o valor
-    if not res["valor"]:
-        valores_encontrados = re.findall(regex_valor_rs, texto)
-        if valores_encontrados:
-            # Estratégia: assume o último valor (geralmente o Total) e limpa pontos
-            valor_final = valores_encontrados[-1].replace('.', '')
-            res["valor"] = valor_final
-
-    return res
\ No newline at end of file
+    candidatos, valores_rs = escanear_texto(texto)
+
+    # 1. Linha Digitável: a melhor classificada entre as válidas
+    linhas = [c for c in candidatos if c.tipo != "pix" and c.valido]
+    if linhas:
+        res["linha"] = linhas[0].codigo
+        # Valor matemático embutido na linha
+        res["valor"] = linhas[0].valor
+
+    # 2. Pix Copia e Cola (CRC válido tem prioridade)
+    pix = [c for c in candidatos if c.tipo == "pix"]
+    if pix:
+        res["pix"] = pix[0].codigo
+
+    # 3. Valor por extenso (R$) se a linha digitável não informou o valor
+    if not res["valor"] and valores_rs:
+        # Estratégia: assume o último valor (geralmente o Total) e limpa pontos
+        res["valor"] = valores_rs[-1].replace('.', '')
+
+    return res
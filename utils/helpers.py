@@ -1,3 +1,4 @@
+import html
 import re
 from datetime import datetime
 
@@ -32,20 +33,44 @@ def formatar_moeda_brasileira(valor_float):
     return "{:,.2f}".format(valor_float).replace(',', 'v').replace('.', ',').replace('v', '.')
 
 
-def formatar_mensagem_boleto(boleto):
-    """Lê os dados do dicionário/sqlite3.Row usando chaves."""
-    pago_via = "💠 PIX" if boleto['pix'] else "📑 Linha Digitável"
-    conteudo = boleto['pix'] if boleto['pix'] else boleto['linha_digitavel']
+def valor_para_centavos(valor):
+    """
+    Converte o valor textual do boleto ("1.234,56", "R$ 66,75", "123.45") em centavos.
+    Retorna None para vazio ou texto que não seja um valor.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return int(round(valor * 100))
+    texto = str(valor).replace('R$', '').replace('\xa0', '').replace(' ', '').strip()
+    if not texto:
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return int(round(float(texto) * 100))
+    except ValueError:
+        return None
+
 
-    return (
-        f"🚨 *Fatura Pendente Encontrada!* \n\n"
-        f"🏷️ *Origem:* {boleto['origem']}\n"
-        f"📝 *Título:* {boleto['titulo']}\n"
-        f"📄 *Mês Referência:* {boleto['mes_referencia']}\n"
-        f"💰 *Valor:* R$ {boleto['valor'] if boleto['valor'] else 'Não identificado'}\n"
-        f"💳 *Método:* {pago_via}\n\n"
-        f"`{conteudo}`"
+def centavos_para_valor(centavos):
+    """Centavos -> texto no formato usado na planilha e nas mensagens ("1234,56")."""
+    if centavos is None:
+        return None
+    return "{:.2f}".format(centavos / 100.0).replace('.', ',')
+
+
+def formatar_bloco_boleto(indice, boleto):
+    """Bloco HTML numerado de um Boleto, usado nas listas (notificação agrupada e pendentes)."""
+    bloco = (
+        f"<b>{indice}.</b> 📂 {html.escape(boleto.origem or '')} — {html.escape(boleto.titulo or '')}\n"
+        f"📅 {boleto.mes_referencia or '-'} · 💸 {boleto.valor if boleto.valor else 'Não identificado'}\n"
     )
+    codigo = boleto.pix or boleto.linha_digitavel
+    if codigo:
+        bloco += f"<code>{codigo}</code>\n"
+    return bloco + "\n"
+
 
 def extrair_mes_referencia(texto):
     """
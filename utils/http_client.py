@@ -0,0 +1,39 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Headers para mimetizar um navegador comum e evitar bloqueios
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+
+_sessao = None
+_trava = threading.Lock()
+
+
+def obter_sessao():
+    """
+    Retorna a sessão HTTP compartilhada do processo.
+    O pool de conexões (keep-alive) é reaproveitado entre scrapers e downloads,
+    com retentativas automáticas (só GET/HEAD) para falhas transitórias do servidor.
+    """
+    global _sessao
+    with _trava:
+        if _sessao is None:
+            retentativas = Retry(
+                total=2,
+                backoff_factor=0.5,
+                status_forcelist=(429, 502, 503, 504),
+                # POST (ex: login) não é repetido: não é idempotente e multiplicaria as falhas
+                allowed_methods=frozenset({"GET", "HEAD"}),
+            )
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retentativas)
+            sessao = requests.Session()
+            sessao.mount("https://", adaptador)
+            sessao.mount("http://", adaptador)
+            sessao.headers.update({'User-Agent': USER_AGENT})
+            _sessao = sessao
+        return _sessao
@@ -0,0 +1,175 @@
+import base64
+import quopri
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+_LITERAL = re.compile(rb'\{(\d+)\}$')
+
+
+@dataclass
+class ParteMensagem:
+    """Uma parte folha da BODYSTRUCTURE (texto, anexo...), sem o conteúdo."""
+    numero: str  # Seção IMAP, ex: "1", "1.2", "2"
+    tipo: str  # ex: "text/html", "application/pdf"
+    parametros: Dict[str, str] = field(default_factory=dict)
+    codificacao: str = "7bit"
+    tamanho: int = 0
+    nome_arquivo: Optional[str] = None
+
+    @property
+    def eh_texto(self):
+        return self.tipo in ("text/plain", "text/html") and not self.nome_arquivo
+
+    @property
+    def eh_pdf(self):
+        nome = (self.nome_arquivo or "").lower()
+        return self.tipo == "application/pdf" or nome.endswith(".pdf")
+
+
+def juntar_resposta(dados):
+    """
+    Reconstrói o buffer bruto de uma resposta do imaplib, que separa os literais
+    {n} em tuplas (prefixo, conteúdo).
+    """
+    buffer = bytearray()
+    for item in dados:
+        if isinstance(item, tuple):
+            buffer += item[0] + b"\r\n" + item[1]
+        elif item:
+            buffer += b" " + item
+    return bytes(buffer)
+
+
+def tokenizar(buffer):
+    """
+    Converte uma resposta IMAP em listas aninhadas.
+    Átomos viram str, NIL vira None, strings entre aspas viram str e literais viram bytes.
+    """
+    pilha = [[]]
+    pos, tamanho = 0, len(buffer)
+    while pos < tamanho:
+        c = buffer[pos:pos + 1]
+        if c in (b" ", b"\r", b"\n"):
+            pos += 1
+        elif c == b"(":
+            pilha.append([])
+            pos += 1
+        elif c == b")":
+            lista = pilha.pop()
+            pilha[-1].append(lista)
+            pos += 1
+        elif c == b'"':
+            pos += 1
+            valor = bytearray()
+            while pos < tamanho and buffer[pos:pos + 1] != b'"':
+                if buffer[pos:pos + 1] == b"\\":
+                    pos += 1
+                valor += buffer[pos:pos + 1]
+                pos += 1
+            pos += 1
+            pilha[-1].append(bytes(valor).decode("utf-8", errors="replace"))
+        elif c == b"{":
+            fim = buffer.index(b"}", pos)
+            n = int(buffer[pos + 1:fim])
+            pos = fim + 1
+            while buffer[pos:pos + 1] in (b"\r", b"\n"):
+                pos += 1
+            pilha[-1].append(buffer[pos:pos + n])
+            pos += n
+        else:
+            inicio = pos
+            while pos < tamanho and buffer[pos:pos + 1] not in (b" ", b"(", b")", b"\r", b"\n"):
+                # Seções como BODY[HEADER.FIELDS (SUBJECT DATE)] contêm parênteses dentro dos colchetes
+                if buffer[pos:pos + 1] == b"[":
+                    pos = buffer.index(b"]", pos)
+                pos += 1
+            atomo = buffer[inicio:pos].decode("ascii", errors="replace")
+            pilha[-1].append(None if atomo.upper() == "NIL" else atomo)
+    return pilha[0]
+
+
+def interpretar_fetch(dados):
+    """
+    Interpreta a resposta de um UID FETCH em {uid: {ITEM: valor}}.
+    Os nomes dos itens são normalizados em maiúsculas e sem o '.PEEK'.
+    """
+    tokens = tokenizar(juntar_resposta(dados))
+    mensagens = {}
+    for token in tokens:
+        if not isinstance(token, list):
+            continue
+        itens = {}
+        for i in range(0, len(token) - 1, 2):
+            chave = str(token[i]).upper().replace(".PEEK", "")
+            itens[chave] = token[i + 1]
+        if "UID" in itens:
+            mensagens[int(itens["UID"])] = itens
+    return mensagens
+
+
+def como_bytes(valor):
+    """
+    Conteúdo de um item do FETCH como bytes: o servidor pode mandar um literal {n} (bytes),
+    uma string entre aspas (str) ou NIL (None).
+    """
+    if valor is None:
+        return b""
+    if isinstance(valor, str):
+        return valor.encode("utf-8")
+    return bytes(valor)
+
+
+def _parametros(lista):
+    if not isinstance(lista, list):
+        return {}
+    return {str(lista[i]).lower(): lista[i + 1] for i in range(0, len(lista) - 1, 2)}
+
+
+def listar_partes(estrutura, prefixo=""):
+    """Achata a BODYSTRUCTURE numa lista de ParteMensagem com a numeração de seção do IMAP."""
+    if not isinstance(estrutura, list) or not estrutura:
+        return []
+
+    # Multipart: as subpartes são as listas iniciais, seguidas do subtipo e extensões
+    if isinstance(estrutura[0], list):
+        partes = []
+        for indice, sub in enumerate(estrutura, start=1):
+            if not isinstance(sub, list):
+                break
+            partes.extend(listar_partes(sub, f"{prefixo}.{indice}" if prefixo else str(indice)))
+        return partes
+
+    tipo = f"{str(estrutura[0]).lower()}/{str(estrutura[1]).lower()}"
+    parametros = _parametros(estrutura[2])
+    codificacao = str(estrutura[5] or "7bit").lower()
+    tamanho = int(estrutura[6]) if len(estrutura) > 6 and str(estrutura[6]).isdigit() else 0
+
+    # A disposição (attachment; filename=...) fica nas extensões; procura a primeira lista [tipo, params]
+    nome_arquivo = parametros.get("name")
+    for extra in estrutura[7:]:
+        if isinstance(extra, list) and len(extra) == 2 and isinstance(extra[0], str) and \
+                isinstance(extra[1], list):
+            nome_arquivo = _parametros(extra[1]).get("filename") or nome_arquivo
+            break
+
+    return [ParteMensagem(prefixo or "1", tipo, parametros, codificacao, tamanho, nome_arquivo)]
+
+
+def decodificar_parte(parte, conteudo):
+    """Decodifica o conteúdo transferido (base64/quoted-printable) de uma parte."""
+    conteudo = como_bytes(conteudo)
+    if parte.codificacao == "base64":
+        return base64.b64decode(conteudo)
+    if parte.codificacao == "quoted-printable":
+        return quopri.decodestring(conteudo)
+    return conteudo
+
+
+def decodificar_texto(parte, conteudo):
+    """Decodifica uma parte de texto respeitando o charset declarado."""
+    charset = parte.parametros.get("charset") or "utf-8"
+    try:
+        return decodificar_parte(parte, conteudo).decode(charset, errors="replace")
+    except LookupError:
+        return decodificar_parte(parte, conteudo).decode("utf-8", errors="replace")
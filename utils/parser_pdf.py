@@ -1,20 +1,173 @@
+import hashlib
+import sqlite3
+import threading
+
 import pdfplumber
-from utils.extractor import extrair_dados_de_texto
+import pypdfium2 as pdfium
+from core.config import Config
+from core.database import buscar_cache_pdf, salvar_cache_pdf, contar_cache_pdf
+from core.logger import logger
+from utils.extractor import extrair_dados_de_texto, VERSAO_EXTRATOR
+from utils.pdf_pool import criar_pool
+
+# Contadores de acerto/falha do cache (desde o início do processo)
+_estatisticas_cache = {"acertos": 0, "falhas": 0}
+_trava_estatisticas = threading.Lock()
+
+# O PDFium não é thread-safe: labels paralelas compartilham esta trava
+_trava_pdfium = threading.Lock()
+
+_RESULTADO_VAZIO = {"linha": None, "pix": None, "valor": None}
+
+# Caracteres do fim de cada página reexaminados com a seguinte (um PIX tem até ~500)
+TAMANHO_CAUDA = 1000
+
+# Processos que fazem a leitura de fato (os processos só sobem no primeiro uso)
+_pool_pdf = criar_pool(
+    tamanho=Config.PDF_WORKERS,
+    timeout=Config.PDF_TIMEOUT_SEGUNDOS,
+    max_tarefas=Config.PDF_WORKER_MAX_TAREFAS,
+    limite_rss_mb=Config.PDF_WORKER_LIMITE_RSS_MB,
+    limite_memoria_mb=Config.PDF_WORKER_LIMITE_MEMORIA_MB,
+)
+
+
+def _contar(evento):
+    with _trava_estatisticas:
+        _estatisticas_cache[evento] += 1
+
+
+def estatisticas_cache_pdf():
+    """Retorna acertos, falhas e entradas do cache de extração de PDFs."""
+    with _trava_estatisticas:
+        dados = dict(_estatisticas_cache)
+    dados["entradas"] = contar_cache_pdf()
+    return dados
 
 
 def extrair_dados_pdf(pdf_path, password=None):
     """
-    Abre o PDF, extrai o conteúdo textual e utiliza o extrator universal
-    para identificar Linha Digitável, PIX e Valor.
+    Retorna Linha Digitável, PIX e Valor do PDF.
+    O resultado fica em cache pelo SHA-256 do arquivo (e versão do extrator),
+    então o mesmo anexo visto em ciclos seguintes não é reaberto. A leitura em si
+    roda num processo isolado quando Config.PDF_PROCESSO_ISOLADO está ativo.
+    """
+    try:
+        with open(pdf_path, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+    except OSError as e:
+        logger.error(f"❌ Erro ao ler PDF {pdf_path}: {e}")
+        return dict(_RESULTADO_VAZIO)
+
+    # O cache é só atalho: base ocupada ("database is locked") não impede a extração
+    try:
+        em_cache = buscar_cache_pdf(sha256, VERSAO_EXTRATOR)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Cache de PDF indisponível na consulta, extraindo {pdf_path}: {e}")
+        em_cache = None
+    if em_cache:
+        _contar("acertos")
+        return em_cache
+
+    _contar("falhas")
+    if Config.PDF_PROCESSO_ISOLADO:
+        dados = _pool_pdf.extrair(pdf_path, password)
+    else:
+        dados = _extrair_dados_pdf_sem_cache(pdf_path, password)
+
+    # Falhas (senha errada, PDF corrompido) não entram no cache para serem tentadas de novo
+    if any(dados.values()):
+        try:
+            salvar_cache_pdf(sha256, VERSAO_EXTRATOR, dados, Config.CACHE_PDF_MAX_ENTRADAS)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Resultado de {pdf_path} não foi para o cache de PDF: {e}")
+    return dados
+
+
+def _paginas_pdfium(pdf_path, password=None):
+    """Gera o texto de cada página com o PDFium (rápido, sem análise de layout)."""
+    with _trava_pdfium:
+        doc = pdfium.PdfDocument(pdf_path, password=password)
+        try:
+            for i in range(len(doc)):
+                pagina = doc[i]
+                texto_pagina = pagina.get_textpage()
+                try:
+                    yield texto_pagina.get_text_bounded()
+                finally:
+                    texto_pagina.close()
+                    pagina.close()
+        finally:
+            doc.close()
+
+
+def _paginas_pdfplumber(pdf_path, password=None):
+    """Gera o texto de cada página com o pdfplumber (mais lento, respeita o layout)."""
+    with pdfplumber.open(pdf_path, password=password) as pdf:
+        for pagina in pdf.pages:
+            yield pagina.extract_text() or ""
+            # Libera os objetos da página já lida (PDFs longos incham a memória)
+            pagina.close()
+
+
+def _varrer_paginas(paginas):
+    """
+    Aplica o extrator a cada página assim que ela é lida (mais o fim da anterior, para
+    códigos quebrados na virada de página) e para assim que encontrar linha digitável
+    e PIX. Com apenas um dos dois, ainda lê Config.PDF_PAGINAS_APOS_ACHADO páginas
+    à procura do outro antes de parar.
     """
+    dados = dict(_RESULTADO_VAZIO)
+    valor_linha = valor_texto = None
+    cauda = ""
+    restantes = Config.PDF_PAGINAS_APOS_ACHADO
+
     try:
-        with pdfplumber.open(pdf_path, password=password) as pdf:
-            # Consolida o texto de todas as páginas do documento
-            texto_completo = "".join([p.extract_text() for p in pdf.pages if p.extract_text()])
+        for texto_pagina in paginas:
+            achados = extrair_dados_de_texto(cauda + "\n" + texto_pagina if cauda else texto_pagina)
+            cauda = texto_pagina[-TAMANHO_CAUDA:]
+
+            if achados["linha"] and not dados["linha"]:
+                dados["linha"], valor_linha = achados["linha"], achados["valor"]
+            elif not achados["linha"] and achados["valor"]:
+                # Sem linha, vale o último "R$" lido (geralmente o total)
+                valor_texto = achados["valor"]
+            if achados["pix"] and not dados["pix"]:
+                dados["pix"] = achados["pix"]
+
+            if dados["linha"] or dados["pix"]:
+                if (dados["linha"] and dados["pix"]) or restantes <= 0:
+                    break
+                restantes -= 1
+    finally:
+        # Fecha o documento (e libera a trava do PDFium) mesmo parando no meio
+        paginas.close()
+
+    dados["valor"] = valor_linha or valor_texto
+    return dados
+
+
+def _extrair_dados_pdf_sem_cache(pdf_path, password=None):
+    """
+    Lê o PDF página a página e utiliza o extrator universal para identificar
+    Linha Digitável, PIX e Valor, parando cedo quando possível.
+
+    Com Config.PDF_BACKEND = 'auto', tenta o PDFium primeiro e recorre ao
+    pdfplumber se ele falhar ou não encontrar dados de pagamento.
+    """
+    backends = {
+        "pdfium": [_paginas_pdfium],
+        "pdfplumber": [_paginas_pdfplumber],
+    }.get(Config.PDF_BACKEND, [_paginas_pdfium, _paginas_pdfplumber])
 
-            # Delega a inteligência de busca para o extrator central
-            return extrair_dados_de_texto(texto_completo)
+    dados = dict(_RESULTADO_VAZIO)
+    for backend in backends:
+        try:
+            dados = _varrer_paginas(backend(pdf_path, password))
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao ler PDF {pdf_path} com {backend.__name__}: {e}")
+            continue
+        if dados["linha"] or dados["pix"]:
+            break
 
-    except Exception as e:
-        print(f"❌ Erro ao ler PDF {pdf_path}: {e}")
-        return {"linha": None, "pix": None, "valor": None}
\ No newline at end of file
+    return dados
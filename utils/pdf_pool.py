@@ -0,0 +1,151 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+
+from core.logger import logger
+
+_RESULTADO_VAZIO = {"linha": None, "pix": None, "valor": None}
+
+
+def _rss_atual_mb():
+    """RSS do próprio processo em MB (Linux); 0 se o /proc não estiver disponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _loop_trabalhador(conexao, max_tarefas, limite_rss_mb, limite_memoria_mb):
+    """
+    Processo filho: recebe (caminho, senha), devolve (status, dados, continua).
+    Sai sozinho após `max_tarefas` PDFs ou quando o RSS passa de `limite_rss_mb`,
+    avisando o pai pelo campo `continua`.
+    """
+    # Import tardio: o forkserver já deixa o módulo pré-carregado
+    from utils.parser_pdf import _extrair_dados_pdf_sem_cache
+
+    if limite_memoria_mb:
+        # Teto rígido de espaço de endereçamento: um PDF patológico vira MemoryError, não OOM do bot
+        limite = int(limite_memoria_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+    for tarefas in range(1, max_tarefas + 1):
+        try:
+            tarefa = conexao.recv()
+        except EOFError:
+            return
+        if tarefa is None:
+            return
+
+        caminho, senha = tarefa
+        try:
+            resposta = ("ok", _extrair_dados_pdf_sem_cache(caminho, senha))
+        except BaseException as e:
+            resposta = ("erro", f"{type(e).__name__}: {e}")
+
+        continua = tarefas < max_tarefas and _rss_atual_mb() <= limite_rss_mb
+        conexao.send(resposta + (continua,))
+        if not continua:
+            return
+
+
+class _Trabalhador:
+    def __init__(self, contexto, max_tarefas, limite_rss_mb, limite_memoria_mb):
+        self.conexao, conexao_filho = contexto.Pipe()
+        self.processo = contexto.Process(
+            target=_loop_trabalhador,
+            args=(conexao_filho, max_tarefas, limite_rss_mb, limite_memoria_mb),
+            name="pdf-worker",
+            daemon=True,
+        )
+        self.processo.start()
+        conexao_filho.close()
+
+    def encerrar(self, forcar=False):
+        try:
+            if forcar:
+                self.processo.kill()
+            else:
+                self.conexao.send(None)
+            self.processo.join(timeout=5)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.conexao.close()
+
+
+class PoolPdf:
+    """
+    Pool pequeno de processos para ler PDFs isolado do bot.
+
+    Cada tarefa tem prazo próprio: se estourar, o processo é morto e substituído.
+    Um processo que morre (ex.: teto de memória) só custa aquela tarefa, que volta
+    como dicionário vazio. Os processos são reciclados após `max_tarefas` PDFs ou
+    quando o RSS passa de `limite_rss_mb`.
+    """
+
+    def __init__(self, tamanho=1, timeout=60, max_tarefas=20, limite_rss_mb=200, limite_memoria_mb=512):
+        self.timeout = timeout
+        self._parametros = (max_tarefas, limite_rss_mb, limite_memoria_mb)
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(max(1, tamanho))
+        self._contexto = None
+        self._trava = threading.Lock()
+
+    def _obter_contexto(self):
+        # forkserver: os filhos nascem de um processo limpo, sem herdar as threads do bot
+        with self._trava:
+            if self._contexto is None:
+                self._contexto = multiprocessing.get_context("forkserver")
+                self._contexto.set_forkserver_preload(["utils.parser_pdf"])
+            return self._contexto
+
+    def extrair(self, caminho, senha=None):
+        """Extrai {linha, pix, valor} do PDF num processo filho; falhas viram resultado vazio."""
+        with self._vagas:
+            try:
+                trabalhador = self._livres.get_nowait()
+            except queue.Empty:
+                trabalhador = _Trabalhador(self._obter_contexto(), *self._parametros)
+
+            try:
+                trabalhador.conexao.send((caminho, senha))
+                if not trabalhador.conexao.poll(self.timeout):
+                    logger.error(f"⏰ Leitura do PDF {caminho} passou de {self.timeout:.0f}s; processo encerrado.")
+                    trabalhador.encerrar(forcar=True)
+                    return dict(_RESULTADO_VAZIO)
+                status, dados, continua = trabalhador.conexao.recv()
+            except (EOFError, OSError) as e:
+                codigo = trabalhador.processo.exitcode
+                logger.error(f"💥 Processo de PDF morreu lendo {caminho} (código {codigo}): {e}")
+                trabalhador.encerrar(forcar=True)
+                return dict(_RESULTADO_VAZIO)
+
+            if continua:
+                self._livres.put(trabalhador)
+            else:
+                trabalhador.encerrar()
+
+            if status != "ok":
+                logger.error(f"❌ Erro ao ler PDF {caminho} no processo isolado: {dados}")
+                return dict(_RESULTADO_VAZIO)
+            return dados
+
+    def encerrar(self):
+        """Encerra os processos ociosos (chamado na saída do bot)."""
+        while True:
+            try:
+                self._livres.get_nowait().encerrar()
+            except queue.Empty:
+                return
+
+
+def criar_pool(**kwargs):
+    """Cria o pool de PDFs e garante o encerramento dos processos na saída."""
+    pool = PoolPdf(**kwargs)
+    atexit.register(pool.encerrar)
+    return pool